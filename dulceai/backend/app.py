@@ -1,37 +1,167 @@
 # DulceAI - Backend FastAPI
 # Archivo principal de la aplicación backend con integración completa de IA
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional
 import uvicorn
+import asyncio
 import os
+import json
+import threading
+import time
+import uuid
 from datetime import datetime
 import logging
 
-# Configurar logging PRIMERO
-logging.basicConfig(level=logging.INFO)
+# Configurar logging PRIMERO (escritura en hilo dedicado + muestreo por logger)
+from services.logging_setup import setup_logging, shutdown_logging
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Backend de estado compartido (sesiones del agente e historial de chat)
+from rag.config import AIConfig
+from rag.memory.state_backend import build_state_backend
+state_backend = build_state_backend(AIConfig.STATE_BACKEND_URL)
+
+# Nombres de los logs en el backend de estado (compartidos entre workers)
+CHAT_HISTORY_LOG = "chat_history"
+
+# Mensajes de contacto: se encolan y un hilo los guarda por lotes y avisa al equipo
+from services.contact_inbox import ContactInbox, ContactQueueFull, webhook_notifier
+contact_inbox = ContactInbox(
+    AIConfig.CONTACT_DB_PATH,
+    batch_size=AIConfig.CONTACT_BATCH_SIZE,
+    queue_size=AIConfig.CONTACT_QUEUE_SIZE,
+    notifier=webhook_notifier(AIConfig.CONTACT_NOTIFY_WEBHOOK) if AIConfig.CONTACT_NOTIFY_WEBHOOK else None
+).start()
+
+# Control de admisión de generaciones (por usuario, por IP y global)
+from services.rate_limiter import AdmissionController, build_bucket_store
+admission = AdmissionController(
+    build_bucket_store(state_backend),
+    per_user=AIConfig.RATE_LIMIT_PER_USER,
+    per_ip=AIConfig.RATE_LIMIT_PER_IP,
+    global_budget=AIConfig.RATE_LIMIT_GLOBAL,
+    enabled=AIConfig.RATE_LIMIT_ENABLED
+)
+
+def admit_generation() -> bool:
+    """Presupuesto global: lo consume el agente justo antes de llamar al LLM"""
+    return admission.admit_generation().allowed
+
+# Sesiones de chat firmadas (id estable por navegador, emitido por el servidor)
+from services.session_tokens import SessionTokens
+session_tokens = SessionTokens(AIConfig.SESSION_SECRET, ttl=AIConfig.SESSION_TTL_SECONDS,
+                               store=state_backend)
+
+# Cancelación de generaciones (cliente desconectado o mensaje reemplazado)
+from rag.llm.cancellation import CancelToken, GenerationCancelled
+from rag.planning.deadline import Deadline
+
+# Idempotency-Key: los reintentos del cliente no vuelven a generar ni duplican la memoria
+from services.idempotency import IdempotencyTable, IdempotencyConflict
+idempotency = IdempotencyTable(AIConfig.IDEMPOTENCY_TTL_SECONDS, AIConfig.IDEMPOTENCY_MAX_KEYS,
+                               store=state_backend)
+
+# Índice facetado del catálogo del agente (categoría, precio y alérgenos como bitsets)
+from rag.tools.catalog_search import CatalogSearchIndex
+catalog_index = CatalogSearchIndex(AIConfig.PRODUCTS, AIConfig.RECOMMENDER_PRICE_BANDS)
+
 # Importar sistema de IA
 try:
-    from ia_placeholder import initialize_ai_system, process_chat_message, get_ai_status
+    from ia_placeholder import (initialize_ai_system, process_chat_message, get_ai_status,
+                                learn_from_chat_history, is_ai_initialized, is_degraded_available,
+                                set_llm_health, report_backend_health, get_order, list_orders,
+                                shutdown_ai_system)
     AI_AVAILABLE = True
     logger.info("✅ Sistema de IA disponible")
 except ImportError as e:
     AI_AVAILABLE = False
-    logger.error(f"❌ Sistema de IA no disponible: {e}")
+    logger.error("❌ Sistema de IA no disponible: %s", e)
 
 # Inicializar IA al importar el módulo
 if AI_AVAILABLE:
     try:
-        initialize_ai_system()
+        initialize_ai_system(state_backend, admit_generation)
         logger.info("✅ IA inicializada al importar")
+        learn_from_chat_history(state_backend.read_log(CHAT_HISTORY_LOG, AIConfig.RECOMMENDER_LOG_WINDOW))
     except Exception as e:
-        logger.error(f"❌ Error inicializando IA: {e}")
+        logger.error("❌ Error inicializando IA: %s", e)
+
+# Salud de Ollama: un hilo por instancia sondea Ollama y deja listo el JSON de /api/ai/status,
+# así los handlers solo leen referencias ya construidas
+from rag.llm.health import OllamaHealthProber
+from rag.llm.backend_pool import parse_backends
+_last_ai_reinit = 0.0
+# Cada instancia tiene su hilo de sondeo: solo uno reintenta la inicialización a la vez
+_ai_reinit_lock = threading.Lock()
+
+def ollama_snapshot():
+    """Instantánea representativa del pool: la primera instancia sana (o la primera si no hay)"""
+    snapshots = [prober.snapshot for prober in ollama_probers]
+    return next((snapshot for snapshot in snapshots if snapshot.healthy), snapshots[0])
+
+def build_status_payload() -> bytes:
+    """Estado de la IA serializado una vez por sondeo"""
+    snapshot = ollama_snapshot()
+    if AI_AVAILABLE:
+        status = dict(get_ai_status(), ai_available=True, rate_limiting=admission.get_stats())
+    else:
+        status = {"ai_available": False, "initialized": False, "error": "Sistema de IA no disponible"}
+    status["ollama"] = snapshot.to_dict()
+    if len(ollama_probers) > 1:
+        status["ollama_instances"] = {prober.base_url: prober.snapshot.to_dict() for prober in ollama_probers}
+    status["ready"] = bool(status.get("initialized")) and snapshot.healthy
+    # Sin LLM el chat sigue respondiendo con el catálogo (motor degradado)
+    status["degraded_mode"] = not status["ready"] and AI_AVAILABLE and is_degraded_available()
+    status["timestamp"] = datetime.now().isoformat()
+    return json.dumps(status, default=str, ensure_ascii=False).encode("utf-8")
+
+def on_ollama_probe(url: str, snapshot):
+    """Tras cada sondeo: actualizar el pool, reintentar la inicialización si Ollama volvió y publicar el estado"""
+    global ai_status_payload, _last_ai_reinit
+    if AI_AVAILABLE:
+        # Para el balanceo basta con que responda: los modelos que le falten se filtran por modelo
+        report_backend_health(url, snapshot.healthy or snapshot.version is not None,
+                              snapshot.models if snapshot.version is not None else None,
+                              snapshot.loaded_models)
+    healthy = ollama_snapshot().healthy
+    # Si otro sondeo ya está reintentando, este no espera ni repite la inicialización
+    if AI_AVAILABLE and healthy and not is_ai_initialized() and _ai_reinit_lock.acquire(blocking=False):
+        try:
+            if not is_ai_initialized() and time.monotonic() - _last_ai_reinit >= AIConfig.AI_REINIT_INTERVAL:
+                _last_ai_reinit = time.monotonic()
+                logger.info("🔄 Ollama disponible: reintentando inicializar la IA")
+                if initialize_ai_system(state_backend, admit_generation):
+                    learn_from_chat_history(state_backend.read_log(CHAT_HISTORY_LOG,
+                                                                   AIConfig.RECOMMENDER_LOG_WINDOW))
+        finally:
+            _ai_reinit_lock.release()
+    if AI_AVAILABLE:
+        set_llm_health(healthy)
+    ai_status_payload = build_status_payload()
+
+ollama_probers = [
+    OllamaHealthProber(
+        url,
+        models=[AIConfig.MODEL_NAME] + [profile["model"] for profile in AIConfig.MODEL_PROFILES.values()],
+        # Sin un modelo de perfil opcional se sigue sano: el router usa el perfil por defecto
+        required_models=[AIConfig.MODEL_NAME],
+        interval=AIConfig.OLLAMA_HEALTH_INTERVAL,
+        unhealthy_interval=AIConfig.OLLAMA_HEALTH_UNHEALTHY_INTERVAL,
+        timeout=AIConfig.OLLAMA_HEALTH_TIMEOUT,
+        failure_threshold=AIConfig.OLLAMA_HEALTH_FAILURES,
+        on_probe=lambda snapshot, url=url: on_ollama_probe(url, snapshot)
+    )
+    for url, _ in parse_backends(AIConfig.OLLAMA_BACKENDS, AIConfig.OLLAMA_BASE_URL)
+]
+ai_status_payload = build_status_payload()
 
 # Crear instancia de FastAPI
 app = FastAPI(
@@ -49,6 +179,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # El frontend corre en otro origen (:3000): sin esto no puede leer Retry-After de un 429/503
+    expose_headers=["Retry-After", "Idempotent-Replayed"],
 )
 
 # Modelos Pydantic
@@ -57,10 +189,21 @@ class ChatMessage(BaseModel):
     user_id: Optional[str] = None
     timestamp: Optional[datetime] = None
 
+class SessionRequest(BaseModel):
+    token: Optional[str] = None
+
+class SessionResponse(BaseModel):
+    session_id: str
+    token: str
+    expires_in: int
+    resumed: bool
+
 class ChatResponse(BaseModel):
     response: str
     timestamp: datetime
     message_id: str
+    degraded: bool = False  # respuesta sin LLM porque el plazo no alcanzaba
+    degraded_reason: Optional[str] = None
 
 class Product(BaseModel):
     id: int
@@ -129,12 +272,6 @@ products_db = [
     )
 ]
 
-# Almacenamiento temporal para mensajes de chat
-chat_history = []
-
-# Almacenamiento temporal para mensajes de contacto
-contact_messages = []
-
 # Rutas principales
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
@@ -177,7 +314,9 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.now(),
         "service": "DulceAI Backend",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "pid": os.getpid(),
+        "ollama": "up" if ollama_snapshot().healthy else "down"
     }
 
 # Rutas de productos
@@ -186,6 +325,21 @@ async def get_products():
     """Obtener todos los productos disponibles"""
     return products_db
 
+@app.get("/api/products/search")
+async def search_products(q: str = "", category: Optional[str] = None,
+                          min_price: Optional[float] = None, max_price: Optional[float] = None,
+                          without: Optional[str] = None, sort: str = "default",
+                          page: int = 1, page_size: int = 10):
+    """
+    Búsqueda facetada del catálogo
+    Ejemplo: /api/products/search?q=chocolate&without=gluten,nueces&max_price=25000
+    """
+    if sort not in ("default", "price_asc", "price_desc", "name"):
+        raise HTTPException(status_code=400, detail="Orden no válido")
+    allergens = [value for value in (without or "").split(",") if value.strip()]
+    return catalog_index.search(q, category=category, min_price=min_price, max_price=max_price,
+                                without=allergens, sort=sort, page=page, page_size=page_size)
+
 @app.get("/api/products/{product_id}", response_model=Product)
 async def get_product(product_id: int):
     """Obtener un producto específico por ID"""
@@ -200,15 +354,77 @@ async def get_products_by_category(category: str):
     filtered_products = [p for p in products_db if p.category == category]
     return filtered_products
 
+def get_client_ip(request: Request) -> Optional[str]:
+    """IP del cliente (X-Forwarded-For solo si se confía en el proxy)"""
+    if AIConfig.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+def resolve_session_id(request: Request, message: "ChatMessage") -> Optional[str]:
+    """
+    Id de sesión del mensaje
+    Con X-Session-Token se usa el id firmado; los clientes sin sesión conservan su user_id
+    en un espacio propio para que no puedan usar el id de una sesión emitida
+    """
+    token = request.headers.get("x-session-token")
+    if token:
+        session_id = session_tokens.verify(token)
+        if session_id is None:
+            raise HTTPException(status_code=401, detail="Sesión inválida o expirada")
+        return session_id
+    return f"anon:{message.user_id}" if message.user_id else None
+
+def idempotency_key(request: Request, session_id: Optional[str]) -> Optional[str]:
+    """
+    Clave de idempotencia del mensaje, acotada a la sesión (o a la IP sin sesión)
+    para que una clave no dé acceso a la respuesta de otro usuario
+    """
+    key = request.headers.get("idempotency-key")
+    if not key:
+        return None
+    if len(key) > IdempotencyTable.KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key demasiado larga")
+    return f"{session_id or get_client_ip(request)}:{key}"
+
+async def run_until_disconnect(request: Request, cancel: CancelToken, fn, *args, keep_alive=None):
+    """
+    Ejecutar fn en el threadpool cancelando su generación si el cliente se desconecta
+    Se espera a que fn termine (rápido tras cancelar) para no dejar trabajo huérfano;
+    keep_alive() = True la mantiene aunque el cliente se vaya (un reintento espera el resultado)
+    """
+    work = asyncio.ensure_future(run_in_threadpool(fn, *args))
+    while True:
+        done, _ = await asyncio.wait({work}, timeout=AIConfig.CHAT_DISCONNECT_POLL_INTERVAL)
+        if done:
+            return work.result()
+        if not cancel.cancelled and await request.is_disconnected():
+            if keep_alive is not None and keep_alive():
+                continue
+            if cancel.cancel("disconnect"):
+                logger.info("🔌 Cliente desconectado: cancelando generación")
+
+# Rutas de sesión
+@app.post("/api/session", response_model=SessionResponse)
+async def create_session(body: Optional[SessionRequest] = None):
+    """
+    Obtener una sesión de chat
+    Con un token válido se continúa la misma sesión (token renovado); si no, se emite una nueva
+    """
+    return session_tokens.resume(body.token if body else None)
+
 # Rutas de chat (integración completa con IA)
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_with_ai(message: ChatMessage):
+async def chat_with_ai(message: ChatMessage, request: Request):
     """
     Endpoint para chat con IA usando RAG completo
     Integra: LangChain + Ollama + ChromaDB + LangSmith
     
     IMPORTANTE: Devuelve 503 si la IA no está disponible o no está inicializada
     """
+    # El plazo corre desde que llega la petición (incluye la espera del threadpool)
+    deadline = Deadline(AIConfig.CHAT_DEADLINE_SECONDS)
     try:
         if not AI_AVAILABLE:
             raise HTTPException(
@@ -216,96 +432,134 @@ async def chat_with_ai(message: ChatMessage):
                 detail="Sistema de IA no disponible. Verifique las dependencias."
             )
         
-        # Verificar estado de la IA antes de procesar
-        ai_status = get_ai_status()
-        if not ai_status.get("initialized", False):
+        # Verificar estado de la IA antes de procesar (lecturas sin construir el estado completo);
+        # con Ollama caído o sin inicializar el LLM responde el motor degradado
+        if not is_ai_initialized() and not is_degraded_available():
             raise HTTPException(
                 status_code=503,
-                detail="Sistema de IA no está inicializado. El chatbot no está disponible."
+                detail="Sistema de IA no está inicializado. El chatbot no está disponible.",
+                headers={"Retry-After": str(int(AIConfig.OLLAMA_HEALTH_INTERVAL))}
             )
         
-        # Procesar mensaje con RAG completo
-        try:
-            response_text = process_chat_message(message.message, message.user_id)
-        except RuntimeError as e:
-            # Si la IA no está disponible, devolver 503
-            logger.error(f"❌ IA no disponible: {str(e)}")
-            raise HTTPException(
-                status_code=503,
-                detail=f"Sistema de IA no disponible: {str(e)}"
-            )
+        session_id = resolve_session_id(request, message)
         
-        # Verificar si hay errores en la respuesta
-        if response_text.startswith("❌ Error del sistema:"):
-            error_detail = response_text.replace("❌ Error del sistema: ", "")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error del sistema de IA: {error_detail}"
-            )
-        
-        # Crear respuesta exitosa
-        response = ChatResponse(
-            response=response_text,
-            timestamp=datetime.now(),
-            message_id=f"msg_{len(chat_history)}_{datetime.now().timestamp()}"
-        )
+        # Reintento con la misma Idempotency-Key: esperar la generación en curso o repetir la respuesta
+        idem_key = idempotency_key(request, session_id)
+        if idem_key:
+            fingerprint = IdempotencyTable.fingerprint(message.message)
+            try:
+                previous = await idempotency.lookup(idem_key, fingerprint)
+            except IdempotencyConflict:
+                raise HTTPException(status_code=422, detail="Idempotency-Key ya usada con otro mensaje")
+            if previous is not None:
+                return JSONResponse(content=await asyncio.shield(previous),
+                                    headers={"Idempotent-Replayed": "true"})
         
-        # Guardar en historial
-        chat_history.append({
-            "user_message": message.message,
-            "ai_response": response_text,
-            "timestamp": datetime.now(),
-            "user_id": message.user_id
-        })
-        
-        logger.info(f"✅ Mensaje procesado exitosamente: {message.message[:50]}...")
+        # Registrar la clave antes de cualquier await: un reintento simultáneo se une a esta petición
+        cancel = CancelToken()
+        entry = idempotency.claim(idem_key, fingerprint, cancel) if idem_key else None
+        try:
+            # Control de admisión por usuario e IP (el presupuesto global se cobra al generar);
+            # con Redis es un round-trip bloqueante: va al threadpool, no al event loop
+            decision = await run_in_threadpool(admission.check, session_id, get_client_ip(request))
+            if not decision.allowed:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Demasiados mensajes. Intenta de nuevo en unos segundos.",
+                    headers={"Retry-After": decision.retry_after_header}
+                )
+            response = await answer_chat_message(message, request, session_id, cancel, deadline, entry)
+        except BaseException as e:
+            # Los reintentos en espera reciben el mismo error; la clave queda libre para otro intento
+            if entry is not None:
+                idempotency.fail(idem_key, entry, e)
+            raise
+        if entry is not None:
+            if isinstance(response, ChatResponse):
+                await idempotency.complete(idem_key, entry, jsonable_encoder(response))
+            else:
+                idempotency.fail(idem_key, entry, GenerationCancelled(cancel.reason or "disconnect"))
         return response
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Error procesando mensaje de chat: {str(e)}")
+        logger.error("❌ Error procesando mensaje de chat: %s", e)
         raise HTTPException(status_code=503, detail=f"Sistema de IA no disponible: {str(e)}")
 
+async def answer_chat_message(message: ChatMessage, request: Request, session_id: Optional[str],
+                              cancel: CancelToken, deadline: Deadline, entry=None):
+    """Generar la respuesta de un mensaje ya admitido y guardarla en el historial"""
+    # Procesar mensaje con RAG completo (en el threadpool: no bloquea el event loop)
+    keep_alive = (lambda: idempotency.has_joiners(entry)) if entry is not None else None
+    try:
+        response_text = await run_until_disconnect(
+            request, cancel, process_chat_message, message.message, session_id, cancel, deadline,
+            keep_alive=keep_alive)
+    except GenerationCancelled as e:
+        if e.reason == "superseded":
+            raise HTTPException(status_code=409, detail="Reemplazado por un mensaje más reciente")
+        # El cliente ya no está: el estado solo queda registrado en las métricas
+        return Response(status_code=499)
+    except RuntimeError as e:
+        # Si la IA no está disponible, devolver 503
+        logger.error("❌ IA no disponible: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Sistema de IA no disponible: {str(e)}"
+        )
+    
+    # Verificar si hay errores en la respuesta
+    if response_text.startswith("❌ Error del sistema:"):
+        error_detail = response_text.replace("❌ Error del sistema: ", "")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error del sistema de IA: {error_detail}"
+        )
+    
+    # Crear respuesta exitosa
+    response = ChatResponse(
+        response=response_text,
+        timestamp=datetime.now(),
+        message_id=f"msg_{uuid.uuid4().hex[:12]}_{datetime.now().timestamp()}",
+        degraded=deadline.degraded is not None,
+        degraded_reason=deadline.degraded
+    )
+    
+    # Guardar en historial (con Redis es un round-trip: en el threadpool, no en el event loop)
+    await run_in_threadpool(state_backend.append_log, CHAT_HISTORY_LOG, {
+        "user_message": message.message,
+        "ai_response": response_text,
+        "timestamp": datetime.now().isoformat(),
+        "user_id": session_id
+    }, max_len=AIConfig.CHAT_LOG_MAX_ENTRIES)
+    
+    logger.info("✅ Mensaje procesado exitosamente: %.50s...", message.message)
+    return response
+
 @app.get("/api/ai/status")
 async def get_ai_system_status():
     """
     Obtener estado detallado del sistema de IA
+    Devuelve la instantánea del último sondeo de Ollama (se actualiza cada OLLAMA_HEALTH_INTERVAL)
     """
-    try:
-        if not AI_AVAILABLE:
-            return {
-                "ai_available": False,
-                "error": "Sistema de IA no disponible",
-                "timestamp": datetime.now()
-            }
-        
-        status = get_ai_status()
-        status["ai_available"] = True
-        return status
-        
-    except Exception as e:
-        logger.error(f"❌ Error obteniendo estado de IA: {str(e)}")
-        return {
-            "ai_available": False,
-            "error": str(e),
-            "timestamp": datetime.now()
-        }
+    return Response(content=ai_status_payload, media_type="application/json")
 
 @app.get("/api/chat/history")
 async def get_chat_history(limit: int = 50):
     """Obtener historial de chat"""
-    return chat_history[-limit:]
+    return await run_in_threadpool(state_backend.read_log, CHAT_HISTORY_LOG, limit)
 
 # Rutas de contacto
 @app.post("/api/contact")
 async def send_contact_message(contact: ContactMessage):
-    """Enviar mensaje de contacto"""
+    """Enviar mensaje de contacto (se guarda en segundo plano; 503 si la cola está llena)"""
     try:
         contact.timestamp = datetime.now()
-        contact_messages.append(contact.dict())
+        contact_inbox.submit(contact.name, contact.email, contact.message,
+                             contact.timestamp.isoformat(timespec="seconds"))
         
-        logger.info(f"Contact message received from: {contact.email}")
+        logger.info("Contact message received from: %s", contact.email)
         
         return {
             "status": "success",
@@ -313,14 +567,37 @@ async def send_contact_message(contact: ContactMessage):
             "timestamp": contact.timestamp
         }
         
+    except ContactQueueFull:
+        logger.warning("⚠️ Cola de contacto llena: mensaje de %s rechazado", contact.email)
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Recibimos muchos mensajes en este momento, intenta de nuevo en unos segundos"},
+            headers={"Retry-After": "2"}
+        )
     except Exception as e:
-        logger.error(f"Error processing contact message: {str(e)}")
+        logger.error("Error processing contact message: %s", e)
         raise HTTPException(status_code=500, detail="Error procesando mensaje de contacto")
 
 @app.get("/api/contact/messages")
-async def get_contact_messages(limit: int = 100):
-    """Obtener mensajes de contacto (solo para administradores)"""
-    return contact_messages[-limit:]
+async def get_contact_messages(limit: int = 100, cursor: Optional[int] = None):
+    """Obtener mensajes de contacto (solo para administradores); la siguiente página con cursor=next_cursor"""
+    return await run_in_threadpool(contact_inbox.page, limit, cursor)
+
+# Rutas de pedidos (registrados desde el chat)
+@app.get("/api/orders")
+async def get_orders(limit: int = 50):
+    """Últimos pedidos (solo para administradores)"""
+    if not AI_AVAILABLE:
+        return []
+    return await run_in_threadpool(list_orders, limit)
+
+@app.get("/api/orders/{order_id}")
+async def get_order_detail(order_id: str):
+    """Pedido con sus líneas (404 si no existe o aún no se escribió)"""
+    order = await run_in_threadpool(get_order, order_id) if AI_AVAILABLE else None
+    if order is None:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    return order
 
 # Función para simular respuesta de IA (placeholder)
 async def simulate_ai_response(user_message: str) -> str:
@@ -369,8 +646,12 @@ async def get_stats():
     """Obtener estadísticas del sistema"""
     return {
         "total_products": len(products_db),
-        "total_chat_messages": len(chat_history),
-        "total_contact_messages": len(contact_messages),
+        "total_chat_messages": state_backend.log_length(CHAT_HISTORY_LOG),
+        "total_contact_messages": await run_in_threadpool(contact_inbox.count),
+        "contact_inbox": contact_inbox.get_stats(),
+        "rate_limiting": admission.get_stats(),
+        "sessions": session_tokens.get_stats(),
+        "idempotency": idempotency.get_stats(),
         "uptime": "Activo",
         "timestamp": datetime.now()
     }
@@ -395,6 +676,22 @@ async def internal_error_handler(request, exc):
         content={"error": "Error interno del servidor", "status_code": 500}
     )
 
+@app.on_event("startup")
+async def start_health_probe():
+    """Arrancar el sondeo de cada instancia de Ollama (el primer sondeo es síncrono)"""
+    for prober in ollama_probers:
+        await run_in_threadpool(prober.start)
+
+@app.on_event("shutdown")
+async def flush_logs():
+    """Detener el sondeo de Ollama, escribir los pedidos y mensajes pendientes y vaciar la cola de logs"""
+    for prober in ollama_probers:
+        prober.stop()
+    contact_inbox.close()
+    if AI_AVAILABLE:
+        shutdown_ai_system()
+    shutdown_logging()
+
 # Función principal para ejecutar el servidor
 if __name__ == "__main__":
     logger.info("🍰 Iniciando servidor DulceAI Backend...")
@@ -402,7 +699,7 @@ if __name__ == "__main__":
     # Inicializar sistema de IA si está disponible
     if AI_AVAILABLE:
         logger.info("🤖 Inicializando sistema de IA...")
-        ai_success = initialize_ai_system()
+        ai_success = initialize_ai_system(state_backend, admit_generation)
         
         if ai_success:
             logger.info("✅ Sistema de IA inicializado correctamente")
@@ -13,37 +13,113 @@ try:
     logger.info("✅ Importando agente desde estructura modular RAG")
 except ImportError as e:
     logger = logging.getLogger(__name__)
-    logger.error(f"❌ Error importando agente modular: {e}")
+    logger.error("❌ Error importando agente modular: %s", e)
     DulceAIAgent = None
     AIConfig = None
 
 # Instancia global del agente
 ai_system = None
 
-def initialize_ai_system() -> bool:
+def initialize_ai_system(state_backend=None, generation_gate=None) -> bool:
     """
     Inicializar el sistema de IA global
     Mantiene compatibilidad con código existente
+    
+    Args:
+        state_backend: Backend de estado compartido con la aplicación (opcional)
+        generation_gate: () -> bool, presupuesto global de generaciones (opcional)
     """
     global ai_system
     
     if DulceAIAgent is None:
         return False
     
-    ai_system = DulceAIAgent()
-    return ai_system.initialize()
+    # Un reintento arma el agente nuevo aparte (heredando el estado del anterior) y solo lo publica
+    # ya inicializado: mientras tanto el anterior sigue respondiendo, aunque sea en modo degradado.
+    # No se cierra el anterior: su escritor de pedidos pasa al nuevo
+    previous = ai_system
+    agent = DulceAIAgent(state_backend=state_backend, previous=previous)
+    agent.generation_gate = generation_gate
+    success = agent.initialize()
+    if success or previous is None or previous.degraded is None:
+        ai_system = agent
+    return success
 
-def process_chat_message(message: str, user_id: str = None) -> str:
+def learn_from_chat_history(entries) -> int:
+    """
+    Alimentar el recomendador con el historial de chat guardado
+    
+    Args:
+        entries: Entradas del historial de chat
+    """
+    global ai_system
+    
+    if ai_system is None:
+        return 0
+    
+    return ai_system.learn_from_chat_log(entries)
+
+def process_chat_message(message: str, user_id: str = None, cancel=None, deadline=None) -> str:
     """
     Procesar mensaje de chat usando el agente
     Mantiene compatibilidad con código existente
+    
+    Args:
+        cancel: CancelToken de la petición (opcional); si se activa se lanza GenerationCancelled
+        deadline: Deadline de la petición (opcional); deadline.degraded indica si se respondió sin LLM
     """
     global ai_system
     
     if ai_system is None:
         return "❌ Error: Sistema de IA no inicializado"
     
-    return ai_system.process_message(message, user_id)
+    return ai_system.process_message(message, user_id, cancel, deadline)
+
+def is_ai_initialized() -> bool:
+    """Estado de inicialización sin construir el estado completo"""
+    return ai_system is not None and ai_system.is_initialized
+
+def is_degraded_available() -> bool:
+    """El motor degradado puede responder aunque el LLM no esté disponible"""
+    return ai_system is not None and ai_system.degraded is not None
+
+def set_llm_health(healthy: bool):
+    """
+    Informar al agente la salud de Ollama (sondeo en segundo plano)
+    Con Ollama caído el circuito del LLM queda abierto y se responde en modo degradado
+    """
+    if ai_system is not None:
+        ai_system.breaker.force_open(not healthy)
+
+def report_backend_health(url: str, healthy: bool, models=None, loaded=()):
+    """
+    Informar al agente el sondeo de una instancia de Ollama (balanceo entre instancias)
+    
+    Args:
+        url: URL de la instancia
+        healthy: La instancia responde
+        models: Modelos descargados (None si no se pudieron leer)
+        loaded: Modelos en memoria
+    """
+    if ai_system is not None:
+        ai_system.backends.update_health(url, healthy, models, loaded)
+
+def get_order(order_id: str):
+    """Pedido registrado desde el chat (None si no existe o aún no se escribió)"""
+    if ai_system is None or ai_system.orders is None:
+        return None
+    return ai_system.orders.get(order_id)
+
+def list_orders(limit: int = 50):
+    """Últimos pedidos registrados desde el chat"""
+    if ai_system is None or ai_system.orders is None:
+        return []
+    return ai_system.orders.list_recent(limit)
+
+def shutdown_ai_system():
+    """Detener el agente escribiendo lo pendiente (al apagar el servidor)"""
+    if ai_system is not None:
+        ai_system.close()
 
 def get_ai_status() -> dict:
     """
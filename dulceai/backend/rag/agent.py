@@ -3,8 +3,12 @@ Agente principal de DulceAI
 Orquesta memoria, herramientas y planificación
 """
 
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Dict, Any, Optional
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -15,16 +19,34 @@ from .config import AIConfig
 # Importar módulos de arquitectura
 from .memory.conversation_memory import ConversationMemory
 from .memory.user_context import UserContext
+from .memory.state_backend import StateBackend, build_state_backend
+from .memory.session_locks import SessionLocks, SessionTurnTimeout
+from .memory.order_store import OrderStore
 from .tools.product_tools import ProductTools
 from .tools.business_tools import BusinessTools
+from .tools.registry import ToolRegistry, build_tool_registry
+from .tools.catalog_search import CatalogSearchIndex
+from .tools.order_tools import OrderTools
 from .planning.task_planner import TaskPlanner
 from .planning.decision_maker import DecisionMaker
+from .planning.fast_path import FastPathPolicy
+from .planning.plan_executor import PlanExecutor
+from .planning.deadline import Deadline, DeadlineStats
+from .planning.degraded_engine import DegradedResponder
+from .llm.single_flight import SingleFlight
+from .llm.cancellation import CancelToken, GenerationCancelled, InFlightGenerations
+from .llm.circuit_breaker import CircuitBreaker
+from .llm.model_router import ModelProfile, ModelRouter
+from .llm.backend_pool import BackendPool, parse_backends
+from .knowledge.embedder import HashingEmbedder
+from .knowledge.store import KnowledgeIndex
 
 # Importar dependencias de LangChain
 DEPENDENCIES_AVAILABLE = False
 ChatOllama = None
 HumanMessage = None
 AIMessage = None
+SystemMessage = None
 
 try:
     # Intentar importar ChatOllama primero
@@ -36,32 +58,34 @@ try:
         # Usar importación directa para evitar problemas con __getattr__
         from langchain_core.messages.human import HumanMessage
         from langchain_core.messages.ai import AIMessage
+        from langchain_core.messages.system import SystemMessage
         logger.info("✅ Importado desde langchain_core.messages (submódulos)")
     except ImportError as e1:
-        logger.warning(f"⚠️ No se pudo importar desde submódulos: {e1}")
+        logger.warning("⚠️ No se pudo importar desde submódulos: %s", e1)
         try:
             # Intentar importación desde el módulo principal usando __getattr__
             import langchain_core.messages as lcm
             # Acceder a las clases directamente (esto activará __getattr__)
             HumanMessage = lcm.HumanMessage
             AIMessage = lcm.AIMessage
+            SystemMessage = lcm.SystemMessage
             logger.info("✅ Importado desde langchain_core.messages")
         except (ImportError, AttributeError, Exception) as e2:
-            logger.warning(f"⚠️ No se pudo importar desde langchain_core.messages: {e2}")
+            logger.warning("⚠️ No se pudo importar desde langchain_core.messages: %s", e2)
             try:
-                from langchain.schema.messages import HumanMessage, AIMessage
+                from langchain.schema.messages import HumanMessage, AIMessage, SystemMessage
                 logger.info("✅ Importado desde langchain.schema.messages")
             except ImportError as e3:
-                logger.warning(f"⚠️ No se pudo importar desde langchain.schema.messages: {e3}")
+                logger.warning("⚠️ No se pudo importar desde langchain.schema.messages: %s", e3)
                 try:
-                    from langchain.schema import HumanMessage, AIMessage
+                    from langchain.schema import HumanMessage, AIMessage, SystemMessage
                     logger.info("✅ Importado desde langchain.schema")
                 except ImportError as e4:
-                    logger.error(f"❌ No se pudieron importar mensajes: {e4}")
-                    HumanMessage = AIMessage = None
+                    logger.error("❌ No se pudieron importar mensajes: %s", e4)
+                    HumanMessage = AIMessage = SystemMessage = None
     
     # Verificar que todas las dependencias críticas estén disponibles
-    if ChatOllama and HumanMessage and AIMessage:
+    if ChatOllama and HumanMessage and AIMessage and SystemMessage:
         DEPENDENCIES_AVAILABLE = True
         logger.info("✅ Todas las dependencias de LangChain están disponibles")
     else:
@@ -69,12 +93,12 @@ try:
         DEPENDENCIES_AVAILABLE = False
         
 except ImportError as e:
-    logger.error(f"❌ Error importando dependencias de LangChain: {e}")
+    logger.error("❌ Error importando dependencias de LangChain: %s", e)
     DEPENDENCIES_AVAILABLE = False
 except Exception as e:
-    logger.error(f"❌ Error inesperado importando dependencias: {e}")
+    logger.error("❌ Error inesperado importando dependencias: %s", e)
     import traceback
-    logger.error(f"   Traceback: {traceback.format_exc()}")
+    logger.error("   Traceback: %s", traceback.format_exc())
     DEPENDENCIES_AVAILABLE = False
 
 class DulceAIAgent:
@@ -86,20 +110,90 @@ class DulceAIAgent:
     - Planificación y toma de decisiones adaptativas
     """
     
-    def __init__(self):
-        """Inicializar agente completo"""
+    # Encabezado de las respuestas sin LLM (plazo agotado, Ollama caído o sobrecargado)
+    DEGRADED_NOTE = "⏳ Hay mucha demanda en este momento, así que te respondo con la información disponible."
+    
+    # Instrucciones de estilo (van en el último mensaje, no en el prompt del sistema)
+    STYLE_INSTRUCTIONS = {
+        "detailed": "Sé detallado y completo en tu respuesta.",
+        "brief": "Sé conciso pero útil.",
+        "personalized": "Personaliza tu respuesta usando el nombre del usuario."
+    }
+    
+    def __init__(self, state_backend: Optional[StateBackend] = None,
+                 previous: Optional["DulceAIAgent"] = None):
+        """
+        Inicializar agente completo
+        
+        Args:
+            state_backend: Backend de estado compartido (por defecto según STATE_BACKEND_URL)
+            previous: Agente al que reemplaza (reintento de inicialización); se heredan sus turnos
+                      en curso, generaciones, circuito, instancias de Ollama y escritor de pedidos
+        """
         self.llm = None
         self.config = AIConfig()
         self.is_initialized = False
         self.error_status = None
         
+        # Estado de sesiones (memoria + contexto) compartido entre workers
+        self.state = state_backend or build_state_backend(self.config.STATE_BACKEND_URL)
+        
+        # Turnos por sesión: los mensajes de un usuario se procesan en orden, uno a la vez
+        self.session_locks = SessionLocks()
+        
+        # Generaciones en curso por sesión (cancelación por desconexión o mensaje más nuevo)
+        self.in_flight = InFlightGenerations(supersede=self.config.CANCEL_SUPERSEDED)
+        
+        # Peticiones con plazo y respuestas degradadas por motivo
+        self.deadlines = DeadlineStats()
+        
+        # Circuito del LLM: tras fallos seguidos (o con Ollama caído) se responde en modo degradado
+        self.breaker = CircuitBreaker(self.config.LLM_BREAKER_FAILURES, self.config.LLM_BREAKER_RESET)
+        
+        # Instancias de Ollama (el sondeo de salud las actualiza antes de inicializar)
+        self.backends = BackendPool(
+            parse_backends(self.config.OLLAMA_BACKENDS, self.config.OLLAMA_BASE_URL),
+            sticky=self.config.OLLAMA_STICKY_SESSIONS,
+            failure_threshold=self.config.OLLAMA_BACKEND_FAILURES,
+            eject_seconds=self.config.OLLAMA_BACKEND_EJECT_SECONDS
+        )
+        
+        # Coalescencia de generaciones idénticas concurrentes
+        self.generations = SingleFlight()
+        
+        # Presupuesto global de generaciones (control de admisión de la app): () -> True si hay token
+        self.generation_gate: Optional[Callable[[], bool]] = None
+        
+        # Variantes de contexto por sesión: (user_id, versión, estilo) -> bloque de texto
+        self._context_blocks: "OrderedDict[tuple, str]" = OrderedDict()
+        self._context_lock = threading.Lock()
+        self.context_block_hits = 0
+        self.context_block_misses = 0
+        
         # Módulos del agente
-        self.memories: Dict[str, ConversationMemory] = {}
-        self.user_contexts: Dict[str, UserContext] = {}
         self.product_tools: Optional[ProductTools] = None
         self.business_tools: Optional[BusinessTools] = None
+        self.tools: Optional[ToolRegistry] = None
         self.planner: Optional[TaskPlanner] = None
         self.decision_maker: Optional[DecisionMaker] = None
+        self.fast_path: Optional[FastPathPolicy] = None
+        self.router: Optional[ModelRouter] = None
+        self.plan_executor: Optional[PlanExecutor] = None
+        self.knowledge: Optional[KnowledgeIndex] = None
+        self.degraded: Optional[DegradedResponder] = None
+        self.orders: Optional[OrderStore] = None
+        self.order_tools: Optional[OrderTools] = None
+        
+        # Los turnos del agente anterior pueden seguir en curso: compartir su estado en vez de perderlo
+        if previous is not None:
+            self.state = state_backend or previous.state
+            self.session_locks = previous.session_locks
+            self.in_flight = previous.in_flight
+            self.deadlines = previous.deadlines
+            self.breaker = previous.breaker
+            self.backends = previous.backends
+            self.generations = previous.generations
+            self.orders = previous.orders
         
         logger.info("🤖 DulceAI Agent inicializado")
     
@@ -110,41 +204,75 @@ class DulceAIAgent:
         Returns:
             True si se inicializó correctamente, False si hubo errores
         """
-        if not DEPENDENCIES_AVAILABLE:
-            logger.error("❌ Dependencias no disponibles")
-            return False
-        
         try:
             logger.info("🚀 Inicializando agente DulceAI con arquitectura completa...")
             
-            # Inicializar LLM
-            logger.info(f"📡 Conectando con Ollama ({self.config.MODEL_NAME})...")
-            self.llm = ChatOllama(
-                model=self.config.MODEL_NAME,
-                base_url=self.config.OLLAMA_BASE_URL,
-                temperature=self.config.MODEL_TEMPERATURE
-            )
-            
-            # Verificar conexión
-            try:
-                test_response = self.llm.invoke([HumanMessage(content="Hola")])
-                logger.info("✅ Conexión con Ollama establecida")
-                logger.info(f"📝 Respuesta de prueba: {test_response.content[:50]}...")
-            except Exception as e:
-                logger.error(f"❌ Error conectando con Ollama: {e}")
-                self.error_status = f"OLLAMA_ERROR: {str(e)}"
-                return False
-            
             # Inicializar herramientas
             self.product_tools = ProductTools(self.config)
             self.business_tools = BusinessTools(self.config)
+            self.knowledge = self._load_knowledge()
+            if self.orders is None:
+                self.orders = OrderStore(self.config.ORDERS_DB_PATH, batch_size=self.config.ORDERS_BATCH_SIZE,
+                                         queue_size=self.config.ORDERS_QUEUE_SIZE).start()
+            self.order_tools = OrderTools(self.product_tools, self.business_tools, self.orders)
+            self.tools = build_tool_registry(self.product_tools, self.business_tools,
+                                             default_timeout=self.config.PLAN_STEP_TIMEOUT,
+                                             knowledge=self.knowledge,
+                                             knowledge_top_k=self.config.KNOWLEDGE_TOP_K,
+                                             knowledge_min_score=self.config.KNOWLEDGE_MIN_SCORE,
+                                             order_tools=self.order_tools)
             logger.info("🔧 Herramientas inicializadas")
             
             # Inicializar planificación
             self.planner = TaskPlanner()
-            self.decision_maker = DecisionMaker()
+            self.decision_maker = DecisionMaker(tool_keywords=self.tools.keywords())
+            self.fast_path = FastPathPolicy(
+                enabled=self.config.FAST_PATH_ENABLED,
+                tools=self.config.FAST_PATH_TOOLS,
+                min_confidence=self.config.FAST_PATH_MIN_CONFIDENCE
+            )
+            self.plan_executor = PlanExecutor(
+                max_workers=self.config.PLAN_EXECUTOR_WORKERS,
+                step_timeout=self.config.PLAN_STEP_TIMEOUT,
+                timeout_for=self.tools.timeout_for
+            )
             logger.info("📋 Planificación inicializada")
             
+            # Motor degradado: no depende de Ollama ni de LangChain, queda listo aunque el LLM falle
+            self.degraded = DegradedResponder(
+                self.product_tools, self.business_tools,
+                CatalogSearchIndex(self.config.PRODUCTS, self.config.RECOMMENDER_PRICE_BANDS),
+                knowledge=self.knowledge, knowledge_min_score=self.config.KNOWLEDGE_MIN_SCORE
+            )
+            logger.info("🛟 Motor de respuestas degradado listo")
+            
+            if not DEPENDENCIES_AVAILABLE:
+                logger.error("❌ Dependencias no disponibles")
+                self.error_status = "DEPENDENCIES_MISSING"
+                return False
+            
+            # Inicializar LLM (un cliente por perfil de generación e instancia de Ollama)
+            logger.info("📡 Conectando con Ollama (%s, %d instancias)...", self.config.MODEL_NAME, len(self.backends))
+            self.router = ModelRouter(
+                profiles=self.config.MODEL_PROFILES,
+                order=self.config.MODEL_PROFILE_ORDER,
+                intent_routes=self.config.MODEL_ROUTES,
+                default_profile=self.config.MODEL_DEFAULT_PROFILE,
+                llm_factory=self._create_llm,
+                pool=self.backends
+            )
+            
+            # Verificar conexión
+            try:
+                test_response = self.router.invoke(self.router.profiles[self.config.MODEL_DEFAULT_PROFILE],
+                                                   [HumanMessage(content="Hola")])
+                logger.info("✅ Conexión con Ollama establecida")
+                logger.info("📝 Respuesta de prueba: %.50s...", test_response.content)
+            except Exception as e:
+                logger.error("❌ Error conectando con Ollama: %s", e)
+                self.error_status = f"OLLAMA_ERROR: {str(e)}"
+                return False
+            
             self.is_initialized = True
             logger.info("✅ Agente DulceAI completamente inicializado")
             logger.info("📋 Tecnologías activas:")
@@ -155,133 +283,301 @@ class DulceAIAgent:
             return True
             
         except Exception as e:
-            logger.error(f"❌ Error inicializando agente: {str(e)}")
+            logger.error("❌ Error inicializando agente: %s", e)
             self.error_status = f"INIT_ERROR: {str(e)}"
             return False
     
-    def process_message(self, message: str, user_id: str = None) -> str:
+    def _create_llm(self, profile: ModelProfile, base_url: Optional[str] = None):
+        """Crear cliente de Ollama para un perfil de generación (en una instancia del pool)"""
+        return ChatOllama(
+            model=profile.model,
+            base_url=base_url or self.config.OLLAMA_BASE_URL,
+            temperature=profile.temperature,
+            num_predict=profile.num_predict,
+            num_ctx=profile.num_ctx,
+            keep_alive=self.config.OLLAMA_KEEP_ALIVE
+        )
+    
+    def process_message(self, message: str, user_id: str = None, cancel: Optional[CancelToken] = None,
+                        deadline: Optional[Deadline] = None) -> str:
         """
         Procesar mensaje con arquitectura completa
         
         Args:
             message: Mensaje del usuario
             user_id: Identificador del usuario
+            cancel: Señal de cancelación de la petición (desconexión del cliente); un mensaje
+                más nuevo de la misma sesión también la activa
+            deadline: Plazo de la petición; si no alcanza para generar se responde sin LLM
+                y deadline.degraded queda con el motivo
             
         Returns:
             Respuesta generada por el agente
+            
+        Raises:
+            GenerationCancelled: Si la petición se canceló antes de terminar (no se guarda nada en memoria)
         """
-        if not self.is_initialized:
-            logger.warning("⚠️ Usando respuestas predefinidas")
-            return self._get_fallback_response(message)
+        if not self.is_initialized and self.degraded is None:
+            logger.warning("⚠️ LLM no disponible: respuesta del motor degradado")
+            if deadline is not None:
+                deadline.degraded = "unavailable"
+            return self._degraded_response(message, reason="unavailable")
         
+        user_id = user_id or "anonymous"
+        if cancel is not None:
+            self.in_flight.begin(user_id, cancel)
         try:
-            user_id = user_id or "anonymous"
-            
-            # Obtener o crear memoria y contexto del usuario
-            memory = self._get_user_memory(user_id)
-            user_context = self._get_user_context(user_id)
-            
-            # Actualizar última visita
-            user_context.update_last_visit()
-            
-            # Extraer información importante del mensaje
-            extracted_info = self.decision_maker.extract_important_info(message)
-            
-            # Actualizar contexto si es necesario
-            if "name" in extracted_info:
-                user_context.update_name(extracted_info["name"])
-            
-            if "mentioned_products" in extracted_info:
-                for product in extracted_info["mentioned_products"]:
-                    user_context.add_recent_product(product)
-            
-            # Planificar respuesta
-            context = user_context.get_context_summary()
-            plan = self.planner.plan_conversation(message, context)
-            
-            logger.info(f"📋 Plan: {len(plan)} pasos, Contexto: {len(memory.get_history())} msgs")
-            
-            # Decidir estilo de respuesta
-            response_style = self.decision_maker.decide_response_style(context)
-            
-            # Construir prompt del sistema
-            system_prompt = self._build_system_prompt(user_context, response_style)
-            
-            # Construir historial de conversación
-            chat_history = self._build_chat_history(memory, user_context)
-            
-            # Determinar si usar herramientas
-            available_tools = ["BuscarProducto", "ConsultarHorario", "ConsultarContacto", "ProcesarPedido"]
-            tool_to_use = self.decision_maker.should_use_tool(message, available_tools)
-            
-            # Ejecutar herramienta si es necesario
-            tool_result = ""
-            if tool_to_use:
-                tool_result = self._execute_tool(tool_to_use, message, extracted_info)
-            
-            # Construir mensaje completo
-            full_message = self._build_full_message(message, tool_result, user_context)
-            
-            # Invocar LLM
-            logger.info(f"🤖 Procesando con LLM ({len(chat_history)} msgs en historial)...")
-            response = self.llm.invoke(chat_history + [HumanMessage(content=full_message)])
-            
-            # Extraer contenido de respuesta (compatible con diferentes versiones)
-            response_content = getattr(response, 'content', None) or getattr(response, 'text', None) or str(response)
-            
-            # Guardar en memoria
-            memory.add_user_message(message)
-            memory.add_ai_message(response_content)
-            
-            logger.info("✅ Respuesta generada y guardada")
-            
-            return response_content.strip()
+            # Leer-responder-guardar dentro del turno de la sesión: dos mensajes concurrentes
+            # del mismo usuario no intercalan su historial ni pisan el guardado del otro
+            queue_timeout = deadline.share(self.config.DEADLINE_QUEUE_SHARE) if deadline is not None else None
+            with self.session_locks.hold(user_id, queue_timeout):
+                # Un mensaje más nuevo pudo reemplazar a este mientras esperaba su turno
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                
+                # Obtener o crear memoria y contexto del usuario (una sola lectura)
+                memory, user_context = self._load_session(user_id)
+                
+                # Actualizar última visita
+                user_context.update_last_visit()
+                
+                # Extraer información importante del mensaje
+                extracted_info = self.decision_maker.extract_important_info(message)
+                
+                # Actualizar contexto si es necesario
+                if "name" in extracted_info:
+                    user_context.update_name(extracted_info["name"])
+                
+                if "mentioned_products" in extracted_info:
+                    for product in extracted_info["mentioned_products"]:
+                        user_context.add_recent_product(product)
+                
+                # Productos consultados antes (semillas del recomendador)
+                extracted_info["recent_products"] = list(user_context.recent_products)
+                
+                # Pedido del mensaje: se prepara ahora y se registra solo al guardar el turno
+                order_step = self._prepare_order(message, user_id, user_context)
+                if order_step is not None:
+                    extracted_info["order_step"] = order_step
+                
+                # Camino rápido: intención de alta confianza que solo necesita herramientas
+                fast = self.fast_path.evaluate(message, extracted_info) if order_step is None else None
+                if fast:
+                    tool_outputs = [self._execute_tool(tool, message, extracted_info) for tool in fast.tools]
+                    response_content = self.fast_path.render(tool_outputs, user_context.name)
+                    self._commit_turn(user_id, memory, user_context, message, response_content, extracted_info,
+                                      metadata={"fast_path": fast.tools})
+                    logger.info("⚡ Respuesta por camino rápido: %s", fast.tools)
+                    return response_content
+                
+                # Circuito abierto (Ollama caído o fallando) o demasiadas generaciones en curso:
+                # responder con el catálogo sin encolar otra generación (también si el LLM nunca arrancó)
+                shed = "unavailable" if not self.is_initialized else self._shed_reason()
+                if shed:
+                    return self._save_degraded(user_id, memory, user_context, message, extracted_info,
+                                               [], shed, deadline)
+                
+                # Planificar respuesta
+                context = user_context.get_context_summary()
+                context["message_count"] = len(memory.messages)
+                plan = self.planner.plan_conversation(message, context)
+                
+                logger.info("📋 Plan: %d pasos, Contexto: %d msgs", len(plan), len(memory.messages))
+                
+                # Decidir estilo de respuesta
+                response_style = self.decision_maker.decide_response_style(context)
+                
+                # Prompt del sistema estático: prefijo idéntico entre peticiones (caché KV de Ollama)
+                system_prompt = self._build_system_prompt()
+                
+                # Construir historial de conversación
+                chat_history = self._build_chat_history(memory, user_context)
+                
+                # Producto escrito con errores: las palabras clave no lo detectan, el índice difuso sí
+                if not extracted_info.get("mentioned_products") and "BuscarProducto" not in [
+                        s["tool"] for s in self.plan_executor.tools_for(plan)]:
+                    if self.product_tools.fuzzy_match(message, limit=1):
+                        plan.add({"action": "search_product", "tool": "BuscarProducto", "priority": 1})
+                
+                # Si el plan no pide herramientas, usar la selección por palabras clave
+                if not self.plan_executor.tools_for(plan):
+                    tool_to_use = self.decision_maker.should_use_tool(message, self.tools.names())
+                    if tool_to_use:
+                        plan.add({"action": "use_tool", "tool": tool_to_use, "priority": 1})
+                
+                # El pedido preparado llega al prompt por ProcesarPedido aunque el plan no lo pidiera
+                if order_step is not None and "ProcesarPedido" not in [
+                        s["tool"] for s in self.plan_executor.tools_for(plan)]:
+                    plan.add({"action": "process_order", "tool": "ProcesarPedido", "priority": 1})
+                
+                # Base de conocimiento: se consulta en paralelo con los demás pasos y solo
+                # aporta texto si algún fragmento supera la similitud mínima
+                if self.knowledge is not None and extracted_info.get("intent") != "greeting" and \
+                        "ConsultarConocimiento" not in [s["tool"] for s in self.plan_executor.tools_for(plan)]:
+                    plan.add({"action": "consult_knowledge", "tool": "ConsultarConocimiento", "priority": 2})
+                
+                # Ejecutar los pasos del plan en paralelo y unir sus resultados
+                tools_budget = deadline.share(self.config.DEADLINE_TOOLS_SHARE) if deadline is not None else None
+                plan_result = self.plan_executor.execute(
+                    plan, lambda tool: self._execute_tool(tool, message, extracted_info), tools_budget)
+                tool_result = plan_result.merged()
+                
+                # Construir mensaje completo (lo variable por usuario va al final)
+                context_block = self._get_context_block(user_id, user_context, response_style)
+                full_message = self._build_full_message(message, tool_result, context_block)
+                
+                # Elegir perfil de generación según intención, estilo y estrategia
+                profile = self.router.select(extracted_info, response_style, self.decision_maker.strategy)
+                
+                # Sin plazo suficiente para una generación típica del perfil: responder ya, sin LLM
+                if deadline is not None:
+                    needed = max(self.router.expected_latency(profile) or 0.0, self.config.DEADLINE_MIN_GENERATION)
+                    if deadline.remaining() < needed:
+                        return self._save_degraded(user_id, memory, user_context, message, extracted_info,
+                                                   plan_result.outputs, "budget", deadline)
+                
+                # Presupuesto global agotado: se gasta solo aquí, cuando el mensaje sí necesita el LLM
+                if self.generation_gate is not None and not self.generation_gate():
+                    return self._save_degraded(user_id, memory, user_context, message, extracted_info,
+                                               plan_result.outputs, "overload", deadline)
+                
+                # Invocar LLM (prompts idénticos concurrentes comparten una generación)
+                logger.info("🤖 Procesando con LLM [%s] (%d msgs en historial)...", profile.name, len(chat_history))
+                llm_messages = ([SystemMessage(content=system_prompt)] + chat_history +
+                                [HumanMessage(content=full_message)])
+                prompt_key = self._prompt_key(profile, llm_messages)
+                caller_stop = should_stop = None
+                if cancel is not None or deadline is not None:
+                    if cancel is not None:
+                        cancel.raise_if_cancelled()
+                    # Esta petición ya no usará la respuesta (desconexión, reemplazo o plazo agotado)
+                    caller_stop = lambda: ((cancel is not None and cancel.cancelled) or
+                                           (deadline is not None and deadline.expired))
+                    # Una generación compartida sigue mientras otra petición la espere
+                    should_stop = lambda: caller_stop() and not self.generations.waiters(prompt_key)
+                try:
+                    # Si otra petición ya la está generando, se espera solo mientras caller_stop() sea False
+                    response, shared = self.generations.do(
+                        prompt_key, lambda: self._generate(profile, llm_messages, should_stop, user_id),
+                        should_stop=caller_stop)
+                except GenerationCancelled:
+                    if deadline is None or not deadline.expired or (cancel is not None and cancel.cancelled):
+                        raise
+                    # Se agotó el plazo generando: responder con lo que ya dieron las herramientas
+                    return self._save_degraded(user_id, memory, user_context, message, extracted_info,
+                                               plan_result.outputs, "generation_timeout", deadline)
+                except Exception as e:
+                    logger.error("❌ Error del LLM: %s", e)
+                    return self._save_degraded(user_id, memory, user_context, message, extracted_info,
+                                               plan_result.outputs, "llm_error", deadline)
+                if shared:
+                    logger.info("🔗 Respuesta compartida con una generación idéntica en curso")
+                
+                # Extraer contenido de respuesta (compatible con diferentes versiones)
+                response_content = getattr(response, 'content', None) or getattr(response, 'text', None) or str(response)
+                
+                # Guardar en memoria y registrar el pedido (ya no hay puntos de cancelación)
+                response_content = self._commit_turn(user_id, memory, user_context, message,
+                                                     response_content, extracted_info)
+                
+                logger.info("✅ Respuesta generada y guardada")
+                
+                return response_content.strip()
             
+        except SessionTurnTimeout:
+            # Mensajes anteriores de la sesión ocupan el plazo: responder sin estado de sesión
+            deadline.degraded = "queue"
+            logger.warning("⏳ Respuesta degradada (queue) para %s", user_id)
+            return self._degraded_response(message, reason="queue")
+        except GenerationCancelled as e:
+            if cancel is None or not cancel.cancelled:
+                # Generación compartida abandonada por quien la ejecutaba
+                logger.error("❌ Error procesando mensaje: %s", e)
+                return self._get_fallback_response(message)
+            self.in_flight.record(cancel.reason)
+            logger.info("🛑 Generación cancelada (%s) para %s", cancel.reason, user_id)
+            raise GenerationCancelled(cancel.reason) from None
         except Exception as e:
-            logger.error(f"❌ Error procesando mensaje: {str(e)}")
-            return self._get_fallback_response(message)
+            logger.error("❌ Error procesando mensaje: %s", e)
+            return self._degraded_response(message, reason="error")
+        finally:
+            if cancel is not None:
+                self.in_flight.end(user_id, cancel)
+            if deadline is not None:
+                self.deadlines.record(deadline)
     
-    def _get_user_memory(self, user_id: str) -> ConversationMemory:
-        """Obtener o crear memoria para usuario"""
-        if user_id not in self.memories:
-            self.memories[user_id] = ConversationMemory(
-                max_messages=self.config.MEMORY_MAX_MESSAGES
-            )
-            logger.debug(f"💾 Nueva memoria creada para: {user_id}")
-        return self.memories[user_id]
+    def _load_session(self, user_id: str):
+        """Obtener o crear memoria y contexto del usuario desde el backend de estado"""
+        memory_key, context_key = "memory:" + user_id, "context:" + user_id
+        stored = self.state.get_many([memory_key, context_key])
+        
+        if stored[memory_key]:
+            memory = ConversationMemory.from_dict(json.loads(stored[memory_key]))
+            memory.max_messages = self.config.MEMORY_MAX_MESSAGES
+        else:
+            memory = ConversationMemory(max_messages=self.config.MEMORY_MAX_MESSAGES)
+            logger.debug("💾 Nueva memoria creada para: %s", user_id)
+        
+        if stored[context_key]:
+            user_context = UserContext.from_dict(json.loads(stored[context_key]))
+        else:
+            user_context = UserContext(user_id)
+            self.state.add_session(user_id, ttl=self.config.SESSION_TTL_SECONDS)
+            logger.debug("👤 Nuevo contexto creado para: %s", user_id)
+        
+        return memory, user_context
     
-    def _get_user_context(self, user_id: str) -> UserContext:
-        """Obtener o crear contexto para usuario"""
-        if user_id not in self.user_contexts:
-            self.user_contexts[user_id] = UserContext(user_id)
-            logger.debug(f"👤 Nuevo contexto creado para: {user_id}")
-        return self.user_contexts[user_id]
+    def _save_session(self, user_id: str, memory: ConversationMemory, user_context: UserContext):
+        """Persistir memoria y contexto del usuario en una sola escritura"""
+        self.state.set_many({
+            "memory:" + user_id: json.dumps(memory.to_dict(), ensure_ascii=False),
+            "context:" + user_id: json.dumps(user_context.to_dict(), ensure_ascii=False)
+        }, ttl=self.config.SESSION_TTL_SECONDS)
     
-    def _build_system_prompt(self, user_context: UserContext, style: str) -> str:
-        """Construir prompt del sistema personalizado"""
-        base_prompt = self.config.SYSTEM_PROMPT
+    def _build_system_prompt(self) -> str:
+        """
+        Prompt del sistema estático
+        Debe ser byte a byte idéntico entre peticiones para que Ollama reutilice el prefill
+        """
+        return self.config.SYSTEM_PROMPT
+    
+    def _get_context_block(self, user_id: str, user_context: UserContext, style: str) -> str:
+        """
+        Contexto del usuario + instrucción de estilo, cacheado por sesión
+        La clave incluye la versión del contexto, que cambia cuando UserContext se marca dirty
+        """
+        key = (user_id, user_context.version, style)
+        with self._context_lock:
+            block = self._context_blocks.get(key)
+            if block is not None:
+                self._context_blocks.move_to_end(key)
+                self.context_block_hits += 1
+                return block
+            self.context_block_misses += 1
         
-        # Agregar contexto personalizado
+        parts = []
         personalized = user_context.build_personalized_prompt()
         if personalized:
-            base_prompt += f"\n\nCONTEXTO DEL USUARIO:\n{personalized}"
+            parts.append(f"CONTEXTO DEL USUARIO:\n{personalized}")
         
-        # Agregar estilo de respuesta
-        if style == "detailed":
-            base_prompt += "\n\nINSTRUCCIÓN: Sé detallado y completo en tu respuesta."
-        elif style == "brief":
-            base_prompt += "\n\nINSTRUCCIÓN: Sé conciso pero útil."
-        elif style == "personalized":
-            base_prompt += "\n\nINSTRUCCIÓN: Personaliza tu respuesta usando el nombre del usuario."
+        instruction = self.STYLE_INSTRUCTIONS.get(style)
+        if instruction:
+            parts.append(f"INSTRUCCIÓN: {instruction}")
         
-        return base_prompt
+        block = "\n\n".join(parts)
+        with self._context_lock:
+            self._context_blocks[key] = block
+            while len(self._context_blocks) > self.config.PROMPT_CACHE_SIZE:
+                self._context_blocks.popitem(last=False)
+        return block
     
     def _build_chat_history(self, memory: ConversationMemory, user_context: UserContext) -> List:
         """Construir historial de conversación para el LLM"""
         history = []
         
-        # Agregar mensajes previos (máx 8 para no sobrepasar tokens)
-        for msg in memory.get_history(limit=8):
+        # Agregar mensajes previos (máx HISTORY_WINDOW para no sobrepasar tokens);
+        # la ventana avanza por bloques para no romper el prefijo cacheado en cada turno
+        for msg in memory.get_history(limit=self.config.HISTORY_WINDOW, step=self.config.HISTORY_WINDOW_STEP):
             role = msg["role"]
             content = msg["content"]
             
@@ -292,39 +588,162 @@ class DulceAIAgent:
         
         return history
     
+    def _load_knowledge(self) -> Optional[KnowledgeIndex]:
+        """Cargar el índice de la base de conocimiento (None si está desactivada o vacía)"""
+        if not self.config.KNOWLEDGE_ENABLED:
+            return None
+        try:
+            index = KnowledgeIndex(self.config.KNOWLEDGE_INDEX_PATH,
+                                   HashingEmbedder(self.config.KNOWLEDGE_EMBEDDING_DIM)).load()
+        except Exception as e:
+            logger.warning("⚠️ Base de conocimiento no disponible: %s", e)
+            return None
+        return index if len(index) else None
+    
     def _execute_tool(self, tool_name: str, message: str, info: Dict) -> str:
-        """Ejecutar herramienta específica"""
-        logger.info(f"🛠️ Ejecutando herramienta: {tool_name}")
-        
-        if tool_name == "BuscarProducto":
-            # Buscar producto mencionado
-            products_mentioned = info.get("mentioned_products", [])
-            if products_mentioned:
-                result = self.product_tools.search_product(products_mentioned[0])
-            else:
-                result = self.product_tools.search_product(message)
-            return result.get("message", "")
-        
-        elif tool_name == "ConsultarHorario":
-            return self.business_tools.get_hours()
-        
-        elif tool_name == "ConsultarContacto":
-            return self.business_tools.get_contact_info()
-        
-        elif tool_name == "ProcesarPedido":
-            return self.business_tools.format_order_confirmation({"message": f"Pedido: {message}"})
-        
-        return ""
+        """Ejecutar herramienta específica (despacho y memoización en el registro)"""
+        return self.tools.call(tool_name, message, info)
     
-    def _build_full_message(self, message: str, tool_result: str, user_context: UserContext) -> str:
-        """Construir mensaje completo con contexto de herramientas"""
+    def _build_full_message(self, message: str, tool_result: str, context_block: str = "") -> str:
+        """
+        Construir mensaje completo con contexto de herramientas
+        El mensaje del usuario va primero; herramientas y contexto del usuario al final
+        """
         full_message = message
         
         if tool_result:
             full_message += f"\n\nINFORMACIÓN DISPONIBLE:\n{tool_result}\n\nUsa esta información para responder."
         
+        if context_block:
+            full_message += f"\n\n{context_block}"
+        
         return full_message
     
+    def _prompt_key(self, profile: ModelProfile, messages: List) -> str:
+        """Hash del prompt completo (perfil + sistema + historial + mensaje)"""
+        digest = hashlib.sha256()
+        digest.update(f"{profile.name}:{profile.model}".encode("utf-8"))
+        for msg in messages:
+            digest.update(b"\x00")
+            digest.update(type(msg).__name__.encode("utf-8"))
+            digest.update(b"\x01")
+            digest.update(msg.content.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def _generate(self, profile: ModelProfile, messages: List, should_stop=None,
+                  session_id: Optional[str] = None):
+        """Generar con el LLM registrando el resultado en el circuito"""
+        try:
+            response = self.router.invoke(profile, messages, should_stop, session_id)
+        except GenerationCancelled:
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return response
+    
+    def _prepare_order(self, message: str, user_id: str, user_context: UserContext) -> Optional[Dict[str, Any]]:
+        """Interpretar el pedido del mensaje sin registrarlo (la propuesta pendiente vale un solo turno)"""
+        if self.order_tools is None:
+            return None
+        try:
+            step = self.order_tools.prepare(message, user_id, user_context.pending_order)
+        except Exception as e:
+            logger.error("❌ Error interpretando pedido: %s", e)
+            step = None
+        user_context.set_pending_order(step["pending"] if step is not None and step["status"] == "confirm" else None)
+        return step
+    
+    def _commit_turn(self, user_id: str, memory: ConversationMemory, user_context: UserContext, message: str,
+                     response_content: str, info: Dict[str, Any], metadata: Optional[Dict] = None) -> str:
+        """
+        Cerrar el turno: registrar el pedido listo y guardar la memoria y el contexto
+        Se llama después del último punto de cancelación; si el turno no se puede guardar,
+        el pedido registrado se marca cancelado (el cliente no vio su número)
+        
+        Returns:
+            Respuesta final (con el número de pedido, o el aviso si no se pudo registrar)
+        """
+        step = info.get("order_step")
+        order = step["order"] if step is not None and step["status"] == "ready" else None
+        if order is not None:
+            if self.order_tools.commit(order):
+                user_context.add_order({
+                    "order_id": order["id"],
+                    "items": [{"product": item["product_key"], "quantity": item["quantity"]}
+                              for item in order["items"]],
+                    "total": order["total"]
+                })
+                # El número de pedido no puede depender de que el modelo lo repita
+                if order["id"] not in response_content:
+                    response_content = (f"{response_content.rstrip()}\n\n🧾 Número de pedido: {order['id']} "
+                                        f"(total ${order['total']:,})")
+            else:
+                order = None
+                response_content = self.order_tools.unavailable_text()
+        elif step is not None and step["status"] == "confirm" and step["text"] not in response_content:
+            # El cliente tiene que ver qué confirma con su "sí" del turno siguiente
+            response_content = f"{response_content.rstrip()}\n\n{step['text']}"
+        
+        memory.add_user_message(message)
+        memory.add_ai_message(response_content, metadata=metadata)
+        try:
+            self._save_session(user_id, memory, user_context)
+        except Exception:
+            if order is not None:
+                self.order_tools.cancel(order)
+            raise
+        return response_content
+    
+    def _shed_reason(self) -> Optional[str]:
+        """Motivo para no generar ahora (None = se puede usar el LLM)"""
+        limit = self.config.DEGRADED_MAX_GENERATIONS
+        if limit and self.generations.in_flight() >= limit:
+            return "overload"
+        if not self.breaker.allow():
+            return "breaker_open"
+        return None
+    
+    def _degraded_response(self, message: str, info: Optional[Dict[str, Any]] = None,
+                           tool_outputs: Optional[List[str]] = None, name: Optional[str] = None,
+                           reason: str = "degraded") -> str:
+        """
+        Respuesta sin LLM
+        Usa la salida de las herramientas si ya se ejecutaron; si no, el motor degradado
+        (catálogo, plantillas del negocio y base de conocimiento)
+        """
+        outputs = [output for output in tool_outputs or [] if output]
+        try:
+            if outputs:
+                text = self.fast_path.render(outputs, name)
+            elif self.degraded is not None:
+                if info is None:
+                    info = self.decision_maker.extract_important_info(message)
+                text = self.degraded.respond(message, info, name, reason)
+            else:
+                return self._get_fallback_response(message)
+        except Exception as e:
+            logger.error("❌ Error en el motor degradado: %s", e)
+            return self._get_fallback_response(message)
+        return self.DEGRADED_NOTE + "\n\n" + text
+    
+    def _save_degraded(self, user_id: str, memory: ConversationMemory, user_context: UserContext,
+                       message: str, info: Dict[str, Any], tool_outputs: List[str], reason: str,
+                       deadline: Optional[Deadline] = None) -> str:
+        """Guardar en memoria una respuesta degradada (el historial queda igual que con el LLM)"""
+        if deadline is not None:
+            deadline.degraded = reason
+        step = info.get("order_step")
+        if step is not None and step["text"] not in tool_outputs:
+            # Sin plan ejecutado (circuito abierto, LLM caído): el pedido igual se confirma o propone
+            tool_outputs = [step["text"]] + list(tool_outputs)
+        response_content = self._degraded_response(message, info, tool_outputs, user_context.name, reason)
+        response_content = self._commit_turn(user_id, memory, user_context, message, response_content, info,
+                                             metadata={"degraded": reason})
+        logger.warning("⏳ Respuesta degradada (%s) para %s", reason, user_id)
+        return response_content
+    
     def _get_fallback_response(self, message: str) -> str:
         """Respuestas de fallback cuando la IA no está disponible"""
         import random
@@ -345,6 +764,37 @@ class DulceAIAgent:
         
         return "Interesante consulta. ¿Podrías ser más específico?"
     
+    def learn_from_chat_log(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Aprender co-ocurrencia de productos del historial de chat
+        
+        Args:
+            entries: Entradas del historial (user_id, user_message)
+            
+        Returns:
+            Número de conversaciones utilizadas
+        """
+        if not self.product_tools or not self.product_tools.recommender:
+            return 0
+        return self.product_tools.recommender.fit_from_chat_log(entries)
+    
+    def _get_prompt_cache_stats(self) -> Dict[str, Any]:
+        """Métricas de la caché de variantes de contexto"""
+        with self._context_lock:
+            lookups = self.context_block_hits + self.context_block_misses
+            return {
+                "keep_alive": self.config.OLLAMA_KEEP_ALIVE,
+                "entries": len(self._context_blocks),
+                "hits": self.context_block_hits,
+                "misses": self.context_block_misses,
+                "hit_rate": round(self.context_block_hits / lookups, 4) if lookups else 0.0
+            }
+    
+    def close(self):
+        """Liberar recursos en segundo plano (escribir los pedidos pendientes)"""
+        if self.orders is not None:
+            self.orders.close()
+    
     def get_status(self) -> Dict[str, Any]:
         """Obtener estado completo del agente"""
         return {
@@ -352,13 +802,25 @@ class DulceAIAgent:
             "model_name": self.config.MODEL_NAME,
             "ollama_url": self.config.OLLAMA_BASE_URL,
             "memory_enabled": self.config.MEMORY_ENABLED,
-            "active_users": len(self.memories),
-            "tools_available": [
-                "BuscarProducto",
-                "ConsultarHorario",
-                "ConsultarContacto",
-                "ProcesarPedido"
-            ],
+            "active_users": self.state.count_sessions(),
+            "state_backend": self.state.describe(),
+            "session_locks": self.session_locks.get_stats(),
+            "cancellation": self.in_flight.get_stats(),
+            "deadlines": self.deadlines.get_stats(),
+            "llm_breaker": self.breaker.get_stats(),
+            "ollama_backends": self.backends.get_stats(),
+            "orders": self.orders.get_stats() if self.orders else None,
+            "degraded_mode": self.degraded.get_stats() if self.degraded else None,
+            "tools_available": self.tools.names() if self.tools else [],
+            "tools": self.tools.get_stats() if self.tools else None,
+            "recommender": (self.product_tools.recommender.get_stats()
+                            if self.product_tools and self.product_tools.recommender else None),
+            "knowledge": self.knowledge.get_stats() if self.knowledge else None,
+            "plan_execution": self.plan_executor.get_stats() if self.plan_executor else None,
+            "generation": self.generations.get_stats(),
+            "fast_path": self.fast_path.get_stats() if self.fast_path else None,
+            "prompt_cache": self._get_prompt_cache_stats(),
+            "model_profiles": self.router.get_stats() if self.router else None,
             "error_status": self.error_status,
             "dependencies_available": DEPENDENCIES_AVAILABLE,
             "architecture": "Agentes LLM con Memoria y Planificación",
@@ -4,6 +4,7 @@ Contiene todas las configuraciones necesarias para el agente
 """
 
 import logging
+import os
 from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
@@ -16,11 +17,144 @@ class AIConfig:
     MODEL_TEMPERATURE = 0.7
     MODEL_MAX_TOKENS = 2000
     OLLAMA_BASE_URL = "http://localhost:11434"
+    # Varias instancias de Ollama: "url" o "url=peso" separadas por comas (vacío = solo OLLAMA_BASE_URL)
+    OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "")
+    # Mantener cada conversación en la misma instancia (reutiliza su caché KV)
+    OLLAMA_STICKY_SESSIONS = os.getenv("OLLAMA_STICKY_SESSIONS", "true").lower() != "false"
+    OLLAMA_BACKEND_FAILURES = 2  # errores de generación seguidos para expulsar una instancia
+    OLLAMA_BACKEND_EJECT_SECONDS = 10.0  # segundos fuera del pool tras la expulsión
+    # Mantener el modelo (y su caché de prefijo) cargado entre peticiones
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # Sondeo de salud de Ollama (/api/version y /api/tags, sin generar)
+    OLLAMA_HEALTH_INTERVAL = 5.0  # segundos entre sondeos con Ollama sano
+    OLLAMA_HEALTH_UNHEALTHY_INTERVAL = 1.0  # segundos entre sondeos con Ollama caído
+    OLLAMA_HEALTH_TIMEOUT = 1.0
+    OLLAMA_HEALTH_FAILURES = 2  # fallos seguidos para marcarlo caído
+    AI_REINIT_INTERVAL = 30.0  # reintento de inicialización del agente cuando Ollama vuelve
+    # Cancelación de generaciones: cliente desconectado o mensaje más nuevo de la misma sesión
+    CHAT_DISCONNECT_POLL_INTERVAL = 0.25  # segundos entre comprobaciones de desconexión
+    CANCEL_SUPERSEDED = os.getenv("CANCEL_SUPERSEDED", "true").lower() != "false"
+    # Plazo total de /api/chat; al no alcanzar para generar se responde en modo degradado
+    # (salida de herramientas o base de conocimiento, sin LLM)
+    CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "25"))
+    DEADLINE_QUEUE_SHARE = 0.3  # fracción máxima del plazo esperando el turno de la sesión
+    DEADLINE_TOOLS_SHARE = 0.2  # fracción máxima del plazo para las herramientas
+    DEADLINE_MIN_GENERATION = 2.0  # segundos mínimos para intentar generar (sin historial de latencia)
+    # Modo degradado (respuestas del catálogo sin LLM): circuito abierto o demasiadas generaciones en curso
+    LLM_BREAKER_FAILURES = 3  # fallos seguidos del LLM para abrir el circuito
+    LLM_BREAKER_RESET = 15.0  # segundos abierto antes de probar de nuevo
+    DEGRADED_MAX_GENERATIONS = int(os.getenv("DEGRADED_MAX_GENERATIONS", "4"))  # 0 = sin límite
+    # Variantes de contexto de usuario cacheadas (usuario, versión, estilo)
+    PROMPT_CACHE_SIZE = 2048
+    
+    # Perfiles de generación, de menor a mayor costo
+    # MODEL_QUICK_NAME permite usar un modelo pequeño (p. ej. qwen2.5:0.5b) para saludos y horarios
+    MODEL_PROFILES = {
+        "quick": {
+            "model": os.getenv("MODEL_QUICK_NAME", MODEL_NAME),
+            "num_predict": 160,
+            "temperature": 0.5,
+            "num_ctx": 2048
+        },
+        "standard": {
+            "model": MODEL_NAME,
+            "num_predict": 512,
+            "temperature": MODEL_TEMPERATURE,
+            "num_ctx": 4096
+        },
+        "advisor": {
+            "model": os.getenv("MODEL_ADVISOR_NAME", MODEL_NAME),
+            "num_predict": MODEL_MAX_TOKENS,
+            "temperature": MODEL_TEMPERATURE,
+            "num_ctx": 8192
+        }
+    }
+    MODEL_PROFILE_ORDER = ["quick", "standard", "advisor"]
+    # Intención (DecisionMaker.extract_important_info) -> perfil
+    MODEL_ROUTES = {
+        "greeting": "quick",
+        "hours_inquiry": "quick",
+        "contact_inquiry": "quick",
+        "price_inquiry": "standard",
+        "purchase": "advisor",
+        "product_advice": "advisor"
+    }
+    MODEL_DEFAULT_PROFILE = "standard"
     
     # Configuración de memoria
     MEMORY_MAX_MESSAGES = 10  # Máximo de mensajes a recordar por conversación
+    HISTORY_WINDOW = 8  # Mensajes de historial enviados al LLM
+    HISTORY_WINDOW_STEP = 4  # La ventana avanza de 4 en 4 (prefijo estable para la caché KV)
     MEMORY_ENABLED = True
     
+    # Camino rápido: intenciones que solo requieren herramientas se responden sin LLM
+    FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() != "false"
+    FAST_PATH_TOOLS = ["ConsultarHorario", "ConsultarContacto"]
+    FAST_PATH_MIN_CONFIDENCE = 0.8
+    
+    # Ejecución de planes: pasos independientes en paralelo con timeout por paso
+    PLAN_EXECUTOR_WORKERS = 4
+    PLAN_STEP_TIMEOUT = 2.0  # segundos
+    
+    # Búsqueda aproximada de productos: puntaje mínimo (0-1) para aceptar un candidato
+    FUZZY_MIN_SCORE = 0.75
+    
+    # Recomendador ítem-ítem: rangos de precio y peso de la co-ocurrencia en conversaciones
+    RECOMMENDER_PRICE_BANDS = (15000, 25000)
+    RECOMMENDER_COOCCURRENCE_WEIGHT = 0.3
+    RECOMMENDER_LOG_WINDOW = 5000  # Entradas del historial de chat usadas al iniciar
+    
+    # Base de conocimiento (políticas de entrega, pedidos personalizados, menús de temporada)
+    # Se construye con: python -m rag.knowledge.ingest <carpetas o archivos>
+    KNOWLEDGE_ENABLED = os.getenv("KNOWLEDGE_ENABLED", "true").lower() != "false"
+    KNOWLEDGE_INDEX_PATH = os.getenv(
+        "KNOWLEDGE_INDEX_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "knowledge")
+    )
+    KNOWLEDGE_EMBEDDING_DIM = 1024
+    KNOWLEDGE_CHUNK_CHARS = 800
+    KNOWLEDGE_CHUNK_OVERLAP = 120
+    KNOWLEDGE_INGEST_BATCH = 64
+    KNOWLEDGE_TOP_K = 3
+    KNOWLEDGE_MIN_SCORE = 0.15  # Similitud coseno mínima para usar un fragmento
+    
+    # Pedidos del chat: SQLite en modo WAL, escritos por lotes en segundo plano
+    ORDERS_DB_PATH = os.getenv(
+        "ORDERS_DB_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "orders.db")
+    )
+    ORDERS_BATCH_SIZE = 256  # pedidos máximos por commit
+    ORDERS_QUEUE_SIZE = 10000  # pedidos pendientes de escribir antes de rechazar
+    # Mensajes de contacto: SQLite (solo inserciones) escrito por lotes; aviso al equipo por webhook opcional
+    CONTACT_DB_PATH = os.getenv(
+        "CONTACT_DB_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "contact.db")
+    )
+    CONTACT_BATCH_SIZE = 200  # mensajes máximos por commit
+    CONTACT_QUEUE_SIZE = 5000  # mensajes pendientes de escribir antes de responder 503
+    CONTACT_NOTIFY_WEBHOOK = os.getenv("CONTACT_NOTIFY_WEBHOOK", "")
+    
+    # Configuración de estado compartido (sesiones y logs entre workers)
+    # "memory://" = local al proceso; "redis://host:6379/0" = compartido
+    STATE_BACKEND_URL = os.getenv("STATE_BACKEND_URL", os.getenv("REDIS_URL", "memory://"))
+    SESSION_TTL_SECONDS = 7 * 24 * 3600  # Expiración de sesiones inactivas
+    # Clave de firma de los tokens de /api/session (igual en todos los workers;
+    # si no está definida, start_services.py genera una para sus workers y con Redis
+    # el primer worker guarda una en el backend de estado para los demás)
+    SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+    CHAT_LOG_MAX_ENTRIES = 10000  # Tamaño máximo del historial global de chat
+    # Idempotency-Key de /api/chat: los reintentos reciben la misma respuesta sin generar de nuevo
+    IDEMPOTENCY_TTL_SECONDS = 600
+    IDEMPOTENCY_MAX_KEYS = 10000
+    
+    # Control de admisión de /api/chat: (ráfaga, tokens por segundo)
+    # Compartido entre workers cuando el backend de estado es Redis
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+    RATE_LIMIT_PER_USER = (5, 0.2)  # 5 mensajes seguidos, luego 1 cada 5s
+    RATE_LIMIT_PER_IP = (20, 1.0)  # Varios usuarios detrás de la misma IP
+    RATE_LIMIT_GLOBAL = (8, 0.5)  # Presupuesto global de generaciones de Ollama
+    RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+    
     # Configuración de prompt del sistema
     SYSTEM_PROMPT = """Eres DulceAI, un asistente virtual experto en pastelería y repostería artesanal. Eres el asistente perfecto para nuestra tienda online de pastelería.
 
@@ -242,11 +376,15 @@ IMPORTANTE:
                 "name": cls.MODEL_NAME,
                 "temperature": cls.MODEL_TEMPERATURE,
                 "max_tokens": cls.MODEL_MAX_TOKENS,
-                "base_url": cls.OLLAMA_BASE_URL
+                "base_url": cls.OLLAMA_BASE_URL,
+                "backends": cls.OLLAMA_BACKENDS,
+                "keep_alive": cls.OLLAMA_KEEP_ALIVE,
+                "profiles": cls.MODEL_PROFILES
             },
             "memory": {
                 "max_messages": cls.MEMORY_MAX_MESSAGES,
-                "enabled": cls.MEMORY_ENABLED
+                "enabled": cls.MEMORY_ENABLED,
+                "state_backend": cls.STATE_BACKEND_URL.split("@")[-1]
             },
             "business": cls.BUSINESS_INFO,
             "products_count": len(cls.PRODUCTS)
@@ -0,0 +1,7 @@
+# Módulo de base de conocimiento
+# Ingesta de documentos (PDF/HTML/Markdown) a un índice local y recuperación para el agente
+from .chunker import Chunk, chunk_document
+from .embedder import HashingEmbedder
+from .store import KnowledgeIndex
+
+__all__ = ['Chunk', 'chunk_document', 'HashingEmbedder', 'KnowledgeIndex']
@@ -0,0 +1,98 @@
+"""
+Fragmentación de documentos
+Divide secciones en fragmentos de tamaño acotado por párrafos y oraciones, con solapamiento
+"""
+
+import hashlib
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+class Chunk:
+    """Fragmento de un documento listo para indexar"""
+
+    __slots__ = ("source", "title", "text", "content_hash")
+
+    def __init__(self, source: str, title: str, text: str):
+        self.source = source
+        self.title = title
+        self.text = text
+        self.content_hash = content_hash(title, text)
+
+    def to_dict(self) -> dict:
+        return {"source": self.source, "title": self.title, "text": self.text, "hash": self.content_hash}
+
+
+def content_hash(title: str, text: str) -> str:
+    """Hash del contenido normalizado (espacios colapsados): clave del fragmento en el índice"""
+    normalized = " ".join(title.split()) + "\n" + " ".join(text.split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _units(text: str, max_chars: int) -> Iterator[str]:
+    """Párrafos; los que superan max_chars se parten por oraciones y, en último caso, por longitud"""
+    for paragraph in _PARAGRAPH.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                yield sentence[:cut]
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                yield sentence
+
+
+def chunk_section(text: str, max_chars: int = 800, overlap: int = 120) -> List[str]:
+    """
+    Agrupar párrafos de una sección en fragmentos
+
+    Args:
+        text: Texto de la sección
+        max_chars: Tamaño máximo de un fragmento
+        overlap: Caracteres finales de un fragmento que se repiten al inicio del siguiente
+
+    Returns:
+        Lista de fragmentos de texto
+    """
+    chunks, current = [], ""
+    for unit in _units(text, max_chars):
+        if current and len(current) + 1 + len(unit) > max_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            # Empezar el solapamiento en un límite de palabra
+            if tail and " " in tail:
+                tail = tail[tail.index(" ") + 1:]
+            current = f"{tail} {unit}".strip() if len(tail) + 1 + len(unit) <= max_chars else unit
+        else:
+            current = f"{current} {unit}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_document(source: str, sections: Iterable[Tuple[str, str]],
+                   max_chars: int = 800, overlap: int = 120) -> Iterator[Chunk]:
+    """
+    Fragmentos de un documento, sección por sección
+
+    Args:
+        source: Identificador del documento (ruta relativa)
+        sections: (título, texto) producidos por loaders.iter_sections
+        max_chars: Tamaño máximo de un fragmento
+        overlap: Solapamiento entre fragmentos consecutivos
+
+    Returns:
+        Iterador de Chunk
+    """
+    for title, text in sections:
+        for piece in chunk_section(text, max_chars, overlap):
+            yield Chunk(source, title, piece)
@@ -0,0 +1,111 @@
+"""
+Embeddings deterministas sin conexión
+Hashing de palabras y trigramas de caracteres a un vector de dimensión fija (no requiere modelo)
+"""
+
+import hashlib
+import logging
+import math
+from collections import Counter
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from ..tools.fuzzy_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# NumPy es opcional: sin él la base de conocimiento queda desactivada
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    """Índice y signo de una característica (blake2b: estable entre procesos, a diferencia de hash())"""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+# Peso de cada tipo de característica
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.5
+
+
+@lru_cache(maxsize=65536)
+def _token_features(token: str, dim: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """
+    Posiciones y pesos con signo de un token: la palabra y sus trigramas
+    (los trigramas toleran plurales y errores leves); el vocabulario se repite mucho,
+    así que se calcula una vez por token
+    """
+    features = [("w:" + token, WORD_WEIGHT)]
+    padded = f"^{token}$"
+    features += [("g:" + padded[i:i + 3], TRIGRAM_WEIGHT) for i in range(len(padded) - 2)]
+    indexes, weights = [], []
+    for feature, weight in features:
+        index, sign = _bucket(feature, dim)
+        indexes.append(index)
+        weights.append(sign * weight)
+    return tuple(indexes), tuple(weights)
+
+
+def embed_texts(texts: Sequence[str], dim: int):
+    """
+    Embeddings de una lista de textos (función de módulo: se puede enviar a un ProcessPoolExecutor)
+
+    Args:
+        texts: Textos a vectorizar
+        dim: Dimensión del vector
+
+    Returns:
+        Matriz float32 (len(texts), dim) con filas de norma 1
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        indexes: List[int] = []
+        weights: List[float] = []
+        for token, count in Counter(tokenize(text)).items():
+            token_indexes, token_weights = _token_features(token, dim)
+            # tf sublineal: una palabra repetida no domina el fragmento
+            tf = 1.0 + math.log(count)
+            indexes.extend(token_indexes)
+            weights.extend(w * tf for w in token_weights)
+        if not indexes:
+            continue
+        vector = np.bincount(indexes, weights=weights, minlength=dim)
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            matrix[row] = vector / norm
+    return matrix
+
+
+class HashingEmbedder:
+    """
+    Embedder determinista: el mismo texto produce siempre el mismo vector
+    en cualquier proceso o máquina, sin descargar modelos
+    """
+
+    VERSION = "hashing-v1"
+
+    def __init__(self, dim: int = 1024):
+        """
+        Args:
+            dim: Dimensión de los vectores
+        """
+        if not NUMPY_AVAILABLE:
+            raise ImportError("numpy no está instalado")
+        self.dim = dim
+
+    @property
+    def name(self) -> str:
+        """Identificador guardado en el índice: si cambia, hay que re-vectorizar todo"""
+        return f"{self.VERSION}:{self.dim}"
+
+    def embed(self, texts: List[str]):
+        return embed_texts(texts, self.dim)
+
+    def embed_query(self, text: str):
+        return embed_texts([text], self.dim)[0]
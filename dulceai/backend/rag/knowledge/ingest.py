@@ -0,0 +1,153 @@
+"""
+Ingesta de la base de conocimiento
+Lee PDF/HTML/Markdown en streaming, fragmenta, vectoriza en un pool de procesos
+y actualiza el índice local saltando los fragmentos que no cambiaron
+
+Uso (desde backend/):
+    python -m rag.knowledge.ingest docs/politicas docs/menu_temporada.pdf
+    python -m rag.knowledge.ingest docs/ --workers 4 --prune
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from ..config import AIConfig
+from .chunker import Chunk, chunk_document
+from .embedder import HashingEmbedder, embed_texts
+from .loaders import iter_files, iter_sections
+from .store import KnowledgeIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _source_name(path: Path, roots: List[Path]) -> str:
+    """Ruta del documento relativa a la carpeta indicada (estable aunque cambie el directorio actual)"""
+    resolved = path.resolve()
+    for root in roots:
+        if root.is_dir():
+            try:
+                return f"{root.name}/{resolved.relative_to(root).as_posix()}"
+            except ValueError:
+                continue
+    return path.name
+
+
+def ingest(paths: Iterable[str], index: KnowledgeIndex, workers: int = 0, batch_size: int = 64,
+           max_chars: int = 800, overlap: int = 120, prune_missing: bool = False) -> Dict[str, Any]:
+    """
+    Ingerir documentos en el índice
+
+    Los fragmentos se producen documento a documento; los que ya están en el índice
+    (mismo hash de contenido) se cuentan como omitidos sin vectorizarse. Los nuevos se
+    agrupan en lotes que se vectorizan en paralelo, con un máximo de lotes en vuelo para
+    acotar la memoria.
+
+    Args:
+        paths: Archivos o directorios
+        index: Índice cargado
+        workers: Procesos para vectorizar (0 = en el proceso actual)
+        batch_size: Fragmentos por lote
+        max_chars: Tamaño máximo de fragmento
+        overlap: Solapamiento entre fragmentos
+        prune_missing: Eliminar también los documentos que ya no están en las rutas
+
+    Returns:
+        Estadísticas de la ingesta
+    """
+    paths = list(paths)
+    roots = [Path(p).resolve() for p in paths]
+    dim = index.embedder.dim
+    stats = {"documents": 0, "chunks": 0, "skipped": 0, "embedded": 0, "added": 0, "removed": 0}
+    seen_hashes = set()
+    seen_sources = set()
+    start = time.perf_counter()
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    in_flight: Deque[Tuple[List[Chunk], Future]] = deque()
+    max_in_flight = max(1, workers) * 2
+
+    def drain(limit: int):
+        while len(in_flight) > limit:
+            batch, future = in_flight.popleft()
+            stats["added"] += index.upsert(batch, future.result())
+
+    def submit(batch: List[Chunk]):
+        stats["embedded"] += len(batch)
+        texts = [f"{chunk.title}\n{chunk.text}" for chunk in batch]
+        if pool is None:
+            stats["added"] += index.upsert(batch, embed_texts(texts, dim))
+            return
+        in_flight.append((batch, pool.submit(embed_texts, texts, dim)))
+        drain(max_in_flight)
+
+    try:
+        batch: List[Chunk] = []
+        for path in iter_files(paths):
+            source = _source_name(path, roots)
+            seen_sources.add(source)
+            stats["documents"] += 1
+            for chunk in chunk_document(source, iter_sections(path), max_chars, overlap):
+                stats["chunks"] += 1
+                if chunk.content_hash in seen_hashes or index.contains(chunk.content_hash):
+                    seen_hashes.add(chunk.content_hash)
+                    stats["skipped"] += 1
+                    continue
+                seen_hashes.add(chunk.content_hash)
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    submit(batch)
+                    batch = []
+        if batch:
+            submit(batch)
+        drain(0)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Fragmentos que ya no aparecen en ningún documento procesado (documentos editados);
+    # un fragmento repetido en otro documento se conserva
+    stats["removed"] += index.prune(seen_hashes, sources=seen_sources)
+    if prune_missing:
+        # Documentos borrados: sus fragmentos se van salvo los que siguen en un documento vigente
+        missing = index.sources() - seen_sources
+        if missing:
+            stats["removed"] += index.prune(seen_hashes, sources=missing)
+
+    index.save()
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info("📚 Ingesta: %d documentos, %d fragmentos (%d nuevos, %d sin cambios, %d eliminados) en %.2fs",
+                stats["documents"], stats["chunks"], stats["added"], stats["skipped"],
+                stats["removed"], stats["seconds"])
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingesta de documentos a la base de conocimiento de DulceAI")
+    parser.add_argument("paths", nargs="+", help="Archivos o carpetas (PDF, HTML, Markdown, texto)")
+    parser.add_argument("--index", default=AIConfig.KNOWLEDGE_INDEX_PATH, help="Directorio del índice")
+    cpus = os.cpu_count() or 1
+    parser.add_argument("--workers", type=int, default=min(4, cpus) if cpus > 1 else 0,
+                        help="Procesos para vectorizar (0 = sin pool)")
+    parser.add_argument("--batch-size", type=int, default=AIConfig.KNOWLEDGE_INGEST_BATCH)
+    parser.add_argument("--chunk-chars", type=int, default=AIConfig.KNOWLEDGE_CHUNK_CHARS)
+    parser.add_argument("--overlap", type=int, default=AIConfig.KNOWLEDGE_CHUNK_OVERLAP)
+    parser.add_argument("--prune", action="store_true",
+                        help="Eliminar del índice los documentos que ya no están en las rutas")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    index = KnowledgeIndex(args.index, HashingEmbedder(AIConfig.KNOWLEDGE_EMBEDDING_DIM)).load()
+    ingest(args.paths, index, workers=args.workers, batch_size=args.batch_size,
+           max_chars=args.chunk_chars, overlap=args.overlap, prune_missing=args.prune)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
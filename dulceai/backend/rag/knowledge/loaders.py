@@ -0,0 +1,175 @@
+"""
+Lectores de documentos para la ingesta
+Cada lector produce el texto por partes (páginas, secciones) para no cargar documentos completos en memoria
+"""
+
+import logging
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# pypdf y beautifulsoup4 son opcionales (requirements.txt); sin ellos se omiten PDF
+# y el HTML se lee con el parser de la biblioteca estándar
+try:
+    from pypdf import PdfReader
+    PDF_AVAILABLE = True
+except ImportError:
+    PdfReader = None
+    PDF_AVAILABLE = False
+
+try:
+    from bs4 import BeautifulSoup
+    BS4_AVAILABLE = True
+except ImportError:
+    BeautifulSoup = None
+    BS4_AVAILABLE = False
+
+# Extensiones soportadas
+MARKDOWN_EXTENSIONS = {".md", ".markdown", ".txt"}
+HTML_EXTENSIONS = {".html", ".htm"}
+PDF_EXTENSIONS = {".pdf"}
+SUPPORTED_EXTENSIONS = MARKDOWN_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[Path]:
+    """Archivos soportados bajo las rutas dadas (archivos o directorios), en orden estable"""
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.is_file() and child.suffix.lower() in SUPPORTED_EXTENSIONS:
+                    yield child
+        elif path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS:
+            yield path
+        else:
+            logger.warning("⚠️ Ruta ignorada (no existe o formato no soportado): %s", path)
+
+
+def iter_sections(path: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Secciones de un documento
+
+    Args:
+        path: Archivo Markdown, HTML o PDF
+
+    Returns:
+        Iterador de (título de la sección, texto)
+    """
+    suffix = path.suffix.lower()
+    if suffix in MARKDOWN_EXTENSIONS:
+        yield from _markdown_sections(path)
+    elif suffix in HTML_EXTENSIONS:
+        yield from _html_sections(path)
+    elif suffix in PDF_EXTENSIONS:
+        yield from _pdf_sections(path)
+
+
+def _markdown_sections(path: Path) -> Iterator[Tuple[str, str]]:
+    """Secciones por encabezado, leyendo el archivo línea a línea"""
+    title, lines = path.stem, []
+    with path.open(encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            match = _HEADING.match(line.strip())
+            if match:
+                if lines:
+                    yield title, "".join(lines)
+                title, lines = match.group(2).strip(), []
+            else:
+                lines.append(line)
+    if lines:
+        yield title, "".join(lines)
+
+
+class _TextExtractor(HTMLParser):
+    """Texto visible de un HTML separado por encabezados (respaldo sin beautifulsoup4)"""
+
+    SKIP = {"script", "style", "nav", "footer", "head"}
+    HEADINGS = {"h1", "h2", "h3", "h4"}
+    BLOCKS = {"p", "li", "div", "br", "tr", "section", "article"}
+
+    def __init__(self, default_title: str):
+        super().__init__()
+        self.sections: List[Tuple[str, str]] = []
+        self._title = default_title
+        self._parts: List[str] = []
+        self._heading: List[str] = []
+        self._skip = 0
+        self._in_heading = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.HEADINGS:
+            self._flush()
+            self._in_heading, self._heading = True, []
+        elif tag in self.BLOCKS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skip:
+            self._skip -= 1
+        elif tag in self.HEADINGS and self._in_heading:
+            self._in_heading = False
+            self._title = " ".join("".join(self._heading).split()) or self._title
+        elif tag in self.BLOCKS:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        (self._heading if self._in_heading else self._parts).append(data)
+
+    def _flush(self):
+        text = "".join(self._parts)
+        if text.strip():
+            self.sections.append((self._title, text))
+        self._parts = []
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def _html_sections(path: Path) -> Iterator[Tuple[str, str]]:
+    html = path.read_text(encoding="utf-8", errors="replace")
+    if BS4_AVAILABLE:
+        soup = BeautifulSoup(html, "html.parser")
+        for tag in soup(["script", "style", "nav", "footer"]):
+            tag.decompose()
+        # Reinsertar el texto como pseudo-Markdown para reutilizar la separación por encabezados
+        for heading in soup.find_all(["h1", "h2", "h3", "h4"]):
+            heading.replace_with(f"\n# {heading.get_text(' ', strip=True)}\n")
+        title, lines = path.stem, []
+        for line in soup.get_text("\n").splitlines():
+            match = _HEADING.match(line.strip())
+            if match:
+                if "".join(lines).strip():
+                    yield title, "\n".join(lines)
+                title, lines = match.group(2).strip(), []
+            else:
+                lines.append(line)
+        if "".join(lines).strip():
+            yield title, "\n".join(lines)
+        return
+
+    parser = _TextExtractor(path.stem)
+    parser.feed(html)
+    parser.close()
+    yield from parser.sections
+
+
+def _pdf_sections(path: Path) -> Iterator[Tuple[str, str]]:
+    """Una sección por página; pypdf extrae las páginas bajo demanda"""
+    if not PDF_AVAILABLE:
+        logger.warning("⚠️ pypdf no está instalado, se omite %s", path.name)
+        return
+    reader = PdfReader(str(path))
+    for number, page in enumerate(reader.pages, start=1):
+        text = page.extract_text() or ""
+        if text.strip():
+            yield f"{path.stem} (página {number})", text
@@ -0,0 +1,206 @@
+"""
+Índice local de la base de conocimiento
+Fragmentos indexados por hash de contenido, con sus vectores en una matriz persistida en disco
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .chunker import Chunk
+from .embedder import HashingEmbedder, NUMPY_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+
+class KnowledgeIndex:
+    """
+    Índice de fragmentos persistido en un directorio:
+    - chunks.json: metadatos de cada fragmento (hash, fuente, título, texto) y el embedder usado
+    - vectors.npy: matriz float32 alineada con los fragmentos
+
+    Un fragmento cuyo hash ya está en el índice no se vuelve a vectorizar
+    """
+
+    META_FILE = "chunks.json"
+    VECTORS_FILE = "vectors.npy"
+
+    def __init__(self, path: str, embedder: Optional[HashingEmbedder] = None):
+        """
+        Args:
+            path: Directorio del índice
+            embedder: Embedder de consultas y fragmentos (por defecto HashingEmbedder)
+        """
+        self.path = Path(path)
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.Lock()
+        self._chunks: List[Dict[str, str]] = []
+        self._positions: Dict[str, int] = {}
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        # Bloques agregados desde la última consolidación (evita copiar la matriz en cada lote)
+        self._pending: List[Any] = []
+        self.searches = 0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def load(self) -> "KnowledgeIndex":
+        """Cargar el índice desde disco (si no existe, queda vacío)"""
+        meta_path = self.path / self.META_FILE
+        vectors_path = self.path / self.VECTORS_FILE
+        if not meta_path.exists() or not vectors_path.exists():
+            logger.info("📚 Base de conocimiento vacía (%s)", self.path)
+            return self
+
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("embedder") != self.embedder.name:
+            # Vectores de otro embedder: no son comparables con las consultas actuales
+            logger.warning("⚠️ Índice creado con %s (actual %s), se descarta",
+                           meta.get("embedder"), self.embedder.name)
+            return self
+
+        vectors = np.load(vectors_path)
+        chunks = meta.get("chunks", [])
+        if len(vectors) != len(chunks):
+            logger.warning("⚠️ Índice inconsistente (%d fragmentos, %d vectores), se descarta",
+                           len(chunks), len(vectors))
+            return self
+
+        with self._lock:
+            self._chunks = chunks
+            self._positions = {chunk["hash"]: i for i, chunk in enumerate(chunks)}
+            self._vectors = vectors.astype(np.float32, copy=False)
+            self._pending = []
+        logger.info("📚 Base de conocimiento cargada: %d fragmentos de %d documentos",
+                    len(chunks), len(self.sources()))
+        return self
+
+    def save(self):
+        """Guardar en disco (escritura en archivos temporales + os.replace: nunca queda a medias)"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            meta = {"embedder": self.embedder.name, "chunks": list(self._chunks)}
+            vectors = self._consolidate()
+
+        vectors_tmp = self.path / (self.VECTORS_FILE + ".tmp")
+        with open(vectors_tmp, "wb") as handle:
+            np.save(handle, vectors)
+        meta_tmp = self.path / (self.META_FILE + ".tmp")
+        meta_tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        # Vectores primero: un lector que vea los metadatos nuevos ya encuentra sus vectores
+        os.replace(vectors_tmp, self.path / self.VECTORS_FILE)
+        os.replace(meta_tmp, self.path / self.META_FILE)
+        logger.info("💾 Base de conocimiento guardada: %d fragmentos", len(meta["chunks"]))
+
+    # ------------------------------------------------------------------
+    # Actualización
+    # ------------------------------------------------------------------
+
+    def contains(self, content_hash: str) -> bool:
+        return content_hash in self._positions
+
+    def sources(self) -> Set[str]:
+        return {chunk["source"] for chunk in self._chunks}
+
+    def upsert(self, chunks: List[Chunk], vectors) -> int:
+        """
+        Agregar fragmentos nuevos con sus vectores
+
+        Args:
+            chunks: Fragmentos (los que ya están en el índice se ignoran)
+            vectors: Matriz (len(chunks), dim) en el mismo orden
+
+        Returns:
+            Número de fragmentos agregados
+        """
+        with self._lock:
+            rows = []
+            for row, chunk in enumerate(chunks):
+                if chunk.content_hash in self._positions:
+                    continue
+                self._positions[chunk.content_hash] = len(self._chunks)
+                self._chunks.append(chunk.to_dict())
+                rows.append(row)
+            if rows:
+                self._pending.append(np.asarray(vectors, dtype=np.float32)[rows])
+            return len(rows)
+
+    def _consolidate(self):
+        """Unir los bloques pendientes a la matriz (llamar con el lock tomado)"""
+        if self._pending:
+            self._vectors = np.concatenate([self._vectors] + self._pending)
+            self._pending = []
+        return self._vectors
+
+    def prune(self, keep: Iterable[str], sources: Optional[Iterable[str]] = None) -> int:
+        """
+        Eliminar fragmentos que ya no existen en los documentos
+
+        Args:
+            keep: Hashes vigentes
+            sources: Limitar la poda a estas fuentes (None = todo el índice)
+
+        Returns:
+            Número de fragmentos eliminados
+        """
+        keep = set(keep)
+        scope = None if sources is None else set(sources)
+        with self._lock:
+            kept_rows = [i for i, chunk in enumerate(self._chunks)
+                         if chunk["hash"] in keep or (scope is not None and chunk["source"] not in scope)]
+            removed = len(self._chunks) - len(kept_rows)
+            if removed:
+                self._chunks = [self._chunks[i] for i in kept_rows]
+                self._vectors = self._consolidate()[kept_rows]
+                self._positions = {chunk["hash"]: i for i, chunk in enumerate(self._chunks)}
+            return removed
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Fragmentos más similares a la consulta (similitud coseno)
+
+        Args:
+            query: Texto del cliente
+            k: Máximo de fragmentos
+            min_score: Similitud mínima
+
+        Returns:
+            Lista de fragmentos con su puntaje, de mayor a menor
+        """
+        with self._lock:
+            self.searches += 1
+            # La lista de fragmentos solo crece al final (o se reemplaza en prune):
+            # las filas de esta matriz siguen siendo válidas sin copiarla
+            chunks, vectors = self._chunks, self._consolidate()
+        if not len(vectors) or not query.strip():
+            return []
+
+        scores = vectors @ self.embedder.embed_query(query)
+        k = min(k, len(vectors))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [dict(chunks[i], score=round(float(scores[i]), 4)) for i in top if scores[i] >= min_score]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "embedder": self.embedder.name,
+                "chunks": len(self._chunks),
+                "documents": len({chunk["source"] for chunk in self._chunks}),
+                "searches": self.searches
+            }
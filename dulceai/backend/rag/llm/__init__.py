@@ -0,0 +1,12 @@
+# Módulo de acceso al LLM
+# Coalescencia de generaciones y utilidades de invocación de Ollama
+from .single_flight import SingleFlight
+from .model_router import ModelProfile, ModelRouter
+from .health import HealthSnapshot, OllamaHealthProber
+from .cancellation import CancelToken, GenerationCancelled, InFlightGenerations
+from .circuit_breaker import CircuitBreaker
+from .backend_pool import BackendPool, NoBackendAvailable, parse_backends
+
+__all__ = ['SingleFlight', 'ModelProfile', 'ModelRouter', 'HealthSnapshot', 'OllamaHealthProber',
+           'CancelToken', 'GenerationCancelled', 'InFlightGenerations', 'CircuitBreaker',
+           'BackendPool', 'NoBackendAvailable', 'parse_backends']
@@ -0,0 +1,239 @@
+"""
+Pool de instancias de Ollama
+Cada generación va a la instancia sana con menos peticiones en curso (ponderado por peso)
+que tenga el modelo cargado; las instancias que fallan se expulsan un tiempo
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_backends(spec: str, default_url: str) -> List[Tuple[str, float]]:
+    """
+    Leer la lista de instancias
+
+    Args:
+        spec: "url" o "url=peso" separadas por comas (p. ej. "http://gpu1:11434=2,http://gpu2:11434")
+        default_url: Instancia única si spec está vacío
+
+    Returns:
+        Lista de (url, peso)
+    """
+    backends: List[Tuple[str, float]] = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.partition("=")
+        try:
+            backends.append((url.strip().rstrip("/"), max(0.1, float(weight)) if weight else 1.0))
+        except ValueError:
+            logger.warning("⚠️ Peso inválido para %s, se usa 1", url)
+            backends.append((url.strip().rstrip("/"), 1.0))
+    return backends or [(default_url.rstrip("/"), 1.0)]
+
+
+class NoBackendAvailable(RuntimeError):
+    """Ninguna instancia sana tiene el modelo"""
+
+
+class OllamaBackend:
+    """Una instancia de Ollama con su carga y estado de salud"""
+
+    __slots__ = ("url", "weight", "outstanding", "healthy", "models", "loaded",
+                 "failures", "ejected_until", "requests", "errors", "ejections")
+
+    def __init__(self, url: str, weight: float = 1.0):
+        self.url = url
+        self.weight = weight
+        self.outstanding = 0
+        # Hasta el primer sondeo se asume sana y con todos los modelos
+        self.healthy = True
+        self.models: Optional[Tuple[str, ...]] = None
+        self.loaded: Tuple[str, ...] = ()
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def load(self) -> float:
+        """Peticiones en curso relativas al peso (contando la que se va a enviar)"""
+        return (self.outstanding + 1) / self.weight
+
+    def has_model(self, model: str) -> bool:
+        return self.models is None or _model_in(model, self.models)
+
+    def has_loaded(self, model: str) -> bool:
+        return _model_in(model, self.loaded)
+
+
+def _model_in(model: str, names: Iterable[str]) -> bool:
+    # "gemma2:2b" coincide tal cual; "llama3" equivale a "llama3:latest"
+    return model in names or (":" not in model and f"{model}:latest" in names)
+
+
+class BackendPool:
+    """
+    Balanceo de generaciones entre instancias de Ollama
+
+    - Menos peticiones en curso por peso, prefiriendo las que ya tienen el modelo en memoria
+      (sin recarga) sobre las que solo lo tienen descargado, salvo que estén mucho más cargadas
+    - Salud activa: update_health() con el resultado del sondeo de cada instancia
+    - Salud pasiva: `failure_threshold` errores seguidos la expulsan `eject_seconds`
+    - Sesiones fijas (opcional): una conversación vuelve a su instancia para reutilizar la
+      caché KV del prefijo, salvo que esté `sticky_slack` peticiones más cargada que la mejor
+    """
+
+    def __init__(self, backends: List[Tuple[str, float]], sticky: bool = True, failure_threshold: int = 2,
+                 eject_seconds: float = 10.0, sticky_slack: float = 2.0, cold_penalty: float = 1.0,
+                 max_sessions: int = 10000):
+        """
+        Args:
+            backends: Lista de (url, peso)
+            sticky: Mantener cada sesión en la misma instancia
+            failure_threshold: Errores de generación seguidos para expulsar una instancia
+            eject_seconds: Segundos fuera del pool tras la expulsión
+            sticky_slack: Desbalance tolerado (peticiones por peso) antes de mover una sesión
+            cold_penalty: Carga extra de una instancia sin el modelo en memoria
+            max_sessions: Sesiones fijas recordadas (LRU)
+        """
+        self.backends = [OllamaBackend(url, weight) for url, weight in backends]
+        self._by_url = {backend.url: backend for backend in self.backends}
+        self.sticky = sticky
+        self.failure_threshold = max(1, failure_threshold)
+        self.eject_seconds = eject_seconds
+        self.sticky_slack = sticky_slack
+        self.cold_penalty = cold_penalty
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, OllamaBackend]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.sticky_hits = 0
+        self.sticky_moves = 0
+        self.unavailable = 0
+
+        logger.info("🖧 Pool de Ollama: %s", ", ".join(f"{b.url} (peso {b.weight:g})" for b in self.backends))
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def acquire(self, model: str, session_id: Optional[str] = None,
+                exclude: Iterable[OllamaBackend] = ()) -> OllamaBackend:
+        """
+        Elegir instancia para una generación (hay que llamar a release() al terminar)
+
+        Args:
+            model: Modelo del perfil
+            session_id: Sesión de la conversación (para fijarla a una instancia)
+            exclude: Instancias ya intentadas en esta generación
+
+        Returns:
+            Instancia elegida (con la petición ya contada como en curso)
+
+        Raises:
+            NoBackendAvailable: Ninguna instancia sana tiene el modelo
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [b for b in self.backends
+                          if b not in exclude and b.healthy and b.ejected_until <= now and b.has_model(model)]
+            if not candidates:
+                self.unavailable += 1
+                raise NoBackendAvailable(f"Ninguna instancia de Ollama disponible con {model}")
+
+            # Cargar el modelo en otra instancia cuesta unos segundos: equivale a `cold_penalty` peticiones
+            best = min(candidates, key=lambda b: b.load() + (0.0 if b.has_loaded(model) else self.cold_penalty))
+            chosen = best
+
+            if self.sticky and session_id:
+                pinned = self._sessions.get(session_id)
+                if pinned is not None and pinned in candidates:
+                    if pinned.load() - best.load() <= self.sticky_slack:
+                        chosen = pinned
+                        self.sticky_hits += 1
+                    else:
+                        self.sticky_moves += 1
+                self._sessions[session_id] = chosen
+                self._sessions.move_to_end(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, backend: OllamaBackend, ok: Optional[bool] = True):
+        """
+        Terminar una generación
+
+        Args:
+            backend: Instancia devuelta por acquire()
+            ok: True si respondió, False si falló, None si se canceló (no cuenta para la salud)
+        """
+        with self._lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.failures = 0
+            elif ok is False:
+                backend.errors += 1
+                backend.failures += 1
+                if backend.failures >= self.failure_threshold and backend.ejected_until <= time.monotonic():
+                    backend.ejected_until = time.monotonic() + self.eject_seconds
+                    backend.ejections += 1
+                    logger.error("⛔ Ollama %s expulsado del pool por %.0fs tras %d errores",
+                                 backend.url, self.eject_seconds, backend.failures)
+
+    def update_health(self, url: str, healthy: bool, models: Optional[Iterable[str]] = None,
+                      loaded: Iterable[str] = ()):
+        """
+        Resultado del sondeo activo de una instancia
+
+        Args:
+            url: URL de la instancia
+            healthy: Estado según el sondeo
+            models: Modelos descargados (/api/tags); None si no se pudieron leer
+            loaded: Modelos en memoria (/api/ps)
+        """
+        backend = self._by_url.get(url.rstrip("/"))
+        if backend is None:
+            return
+        with self._lock:
+            if healthy != backend.healthy:
+                logger.info("🖧 Ollama %s %s", url, "vuelve al pool" if healthy else "sale del pool")
+            backend.healthy = healthy
+            if healthy:
+                # La expulsión pasiva se mantiene: responder al sondeo no prueba que genere bien
+                if models is not None:
+                    backend.models = tuple(models)
+                backend.loaded = tuple(loaded)
+
+    def any_available(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            return any(b.healthy and b.ejected_until <= now for b in self.backends)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "backends": [{
+                    "url": b.url,
+                    "weight": b.weight,
+                    "healthy": b.healthy,
+                    "ejected": b.ejected_until > now,
+                    "outstanding": b.outstanding,
+                    "requests": b.requests,
+                    "errors": b.errors,
+                    "ejections": b.ejections,
+                    "loaded": list(b.loaded)
+                } for b in self.backends],
+                "sticky_sessions": len(self._sessions) if self.sticky else None,
+                "sticky_hits": self.sticky_hits,
+                "sticky_moves": self.sticky_moves,
+                "unavailable": self.unavailable
+            }
@@ -0,0 +1,101 @@
+"""
+Cancelación de generaciones
+Una generación se cancela si el cliente se desconecta o si llega un mensaje más nuevo de la misma sesión
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCancelled(Exception):
+    """La generación se abandonó porque su resultado ya no se va a usar"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Generación cancelada ({reason})")
+        self.reason = reason
+
+
+class CancelToken:
+    """Señal de cancelación de una petición (se activa una sola vez)"""
+
+    __slots__ = ("_event", "reason")
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str) -> bool:
+        """
+        Cancelar la petición
+
+        Args:
+            reason: Motivo ("disconnect", "superseded")
+
+        Returns:
+            True si esta llamada la canceló (False si ya estaba cancelada)
+        """
+        if self._event.is_set():
+            return False
+        self.reason = reason
+        self._event.set()
+        return True
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GenerationCancelled(self.reason or "cancelled")
+
+
+class InFlightGenerations:
+    """
+    Peticiones en curso por sesión
+    Registrar una petición nueva cancela la anterior de la misma sesión (su respuesta ya no se mostrará)
+    """
+
+    REASONS = ("disconnect", "superseded")
+
+    def __init__(self, supersede: bool = True):
+        """
+        Args:
+            supersede: Cancelar la petición anterior de la sesión al llegar una nueva
+        """
+        self.supersede = supersede
+        self._current: Dict[str, CancelToken] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.cancelled = {reason: 0 for reason in self.REASONS}
+
+    def begin(self, session_id: str, token: CancelToken):
+        """Registrar la petición de la sesión (cancela la anterior si sigue en curso)"""
+        with self._lock:
+            self.started += 1
+            previous = self._current.get(session_id)
+            self._current[session_id] = token
+        if self.supersede and previous is not None and previous.cancel("superseded"):
+            logger.info("⏭️ Sesión %s: mensaje nuevo, se cancela la generación anterior", session_id)
+
+    def end(self, session_id: str, token: CancelToken):
+        """Quitar la petición del registro (si una más nueva no la reemplazó ya)"""
+        with self._lock:
+            if self._current.get(session_id) is token:
+                del self._current[session_id]
+
+    def record(self, reason: str):
+        """Contar una generación que efectivamente se abandonó"""
+        with self._lock:
+            self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "in_flight": len(self._current),
+                "cancelled": dict(self.cancelled),
+                "cancelled_total": sum(self.cancelled.values())
+            }
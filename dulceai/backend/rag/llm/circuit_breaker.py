@@ -0,0 +1,98 @@
+"""
+Circuit breaker del LLM
+Tras varios fallos seguidos deja de enviar generaciones a Ollama durante un tiempo
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Estados:
+    - closed: las generaciones pasan
+    - open: se rechazan hasta que pasa reset_timeout (o mientras el sondeo de salud lo fuerce)
+    - half_open: pasa una generación de prueba; si sale bien se cierra, si falla se vuelve a abrir
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 15.0):
+        """
+        Args:
+            failure_threshold: Fallos seguidos para abrirlo
+            reset_timeout: Segundos abierto antes de dejar pasar una prueba
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started = 0.0
+        self._forced_open = False
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return "open" if self._forced_open else self._state
+
+    def allow(self) -> bool:
+        """¿Se puede enviar una generación ahora?"""
+        now = time.monotonic()
+        with self._lock:
+            if self._forced_open:
+                self.rejected += 1
+                return False
+            if self._state == "closed":
+                return True
+            if self._state == "open" and now - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"
+                self._trial_started = now
+                logger.info("🟡 Circuito del LLM semiabierto: generación de prueba")
+                return True
+            if self._state == "half_open" and now - self._trial_started >= self.reset_timeout:
+                # La prueba anterior no reportó resultado (p. ej. se canceló): otra oportunidad
+                self._trial_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != "closed":
+                self._state = "closed"
+                logger.info("🟢 Circuito del LLM cerrado")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or (self._state == "closed" and
+                                               self._failures >= self.failure_threshold):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                logger.error("🔴 Circuito del LLM abierto tras %d fallos (%.0fs)",
+                             self._failures, self.reset_timeout)
+
+    def force_open(self, forced: bool):
+        """Mantenerlo abierto por una señal externa (sondeo de salud de Ollama)"""
+        with self._lock:
+            if forced != self._forced_open:
+                logger.info("🩺 Circuito del LLM %s por el sondeo de salud", "abierto" if forced else "liberado")
+            self._forced_open = forced
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": "open" if self._forced_open else self._state,
+                "forced_open": self._forced_open,
+                "consecutive_failures": self._failures,
+                "trips": self.trips,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,170 @@
+"""
+Sondeo de salud de Ollama en segundo plano
+Un hilo consulta /api/version, /api/tags y /api/ps (sin generar) y publica una instantánea inmutable del estado
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class HealthSnapshot(NamedTuple):
+    """Estado de Ollama en el último sondeo (inmutable: se reemplaza, nunca se modifica)"""
+
+    healthy: bool
+    checked_at: float
+    latency_ms: float
+    version: Optional[str]
+    models: Tuple[str, ...]
+    missing_models: Tuple[str, ...]
+    consecutive_failures: int
+    changed_at: float
+    error: Optional[str]
+    loaded_models: Tuple[str, ...] = ()  # modelos en memoria (/api/ps)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self._asdict()
+        data["models"] = list(self.models)
+        data["missing_models"] = list(self.missing_models)
+        data["loaded_models"] = list(self.loaded_models)
+        return data
+
+
+class OllamaHealthProber:
+    """
+    Sondeo periódico de Ollama
+    Los handlers leen `snapshot` (una referencia, sin trabajo por petición). Ollama se marca
+    caído tras `failure_threshold` fallos seguidos y vuelve a sano con el primer sondeo correcto;
+    tras un fallo o con Ollama caído se sondea más seguido. Solo la falta de un modelo requerido
+    lo marca caído; los demás faltantes se informan en missing_models
+    """
+
+    def __init__(self, base_url: str, models: Iterable[str] = (), interval: float = 5.0,
+                 unhealthy_interval: float = 1.0, timeout: float = 1.0, failure_threshold: int = 2,
+                 on_probe: Optional[Callable[[HealthSnapshot], None]] = None,
+                 required_models: Optional[Iterable[str]] = None):
+        """
+        Args:
+            base_url: URL de la instancia de Ollama
+            models: Modelos que se esperan descargados (los que falten se informan en missing_models)
+            interval: Segundos entre sondeos con Ollama sano
+            unhealthy_interval: Segundos entre sondeos con Ollama caído
+            timeout: Timeout de cada petición del sondeo
+            failure_threshold: Fallos seguidos para marcarlo caído
+            on_probe: Llamada tras cada sondeo con la nueva instantánea (en el hilo del sondeo)
+            required_models: Modelos sin los que Ollama se considera caído (por defecto, todos los de `models`)
+        """
+        self.base_url = base_url.rstrip("/")
+        self.models = tuple(dict.fromkeys(models))
+        self.required_models = self.models if required_models is None else tuple(required_models)
+        self.interval = interval
+        self.unhealthy_interval = unhealthy_interval
+        self.timeout = timeout
+        self.failure_threshold = max(1, failure_threshold)
+        self.on_probe = on_probe
+        self.probes = 0
+        self.transitions = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        now = time.time()
+        self.snapshot = HealthSnapshot(False, 0.0, 0.0, None, (), self.models, 0, now, "Sin sondear")
+
+    def _get_json(self, path: str) -> Dict[str, Any]:
+        with urllib.request.urlopen(self.base_url + path, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    @staticmethod
+    def _has_model(model: str, available: Tuple[str, ...]) -> bool:
+        # "gemma2:2b" coincide tal cual; "llama3" equivale a "llama3:latest"
+        return model in available or (":" not in model and f"{model}:latest" in available)
+
+    def probe_once(self) -> HealthSnapshot:
+        """Sondear Ollama una vez y publicar la instantánea resultante"""
+        previous = self.snapshot
+        start = time.perf_counter()
+        version, models, missing, loaded, error = None, (), self.models, (), None
+        try:
+            version = self._get_json("/api/version").get("version")
+            models = tuple(m.get("name", "") for m in self._get_json("/api/tags").get("models", []))
+            missing = tuple(m for m in self.models if not self._has_model(m, models))
+            required_missing = [m for m in self.required_models if not self._has_model(m, models)]
+            if required_missing:
+                error = "Modelos no descargados: " + ", ".join(required_missing)
+            elif missing and missing != previous.missing_models:
+                logger.warning("⚠️ Ollama %s sin los modelos opcionales %s (sus perfiles usan el modelo principal)",
+                               self.base_url, ", ".join(missing))
+            try:
+                loaded = tuple(m.get("name", "") for m in self._get_json("/api/ps").get("models", []))
+            except Exception:
+                pass  # versiones antiguas de Ollama sin /api/ps
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        failures = 0 if error is None else previous.consecutive_failures + 1
+        if error is None:
+            healthy = True
+        elif previous.checked_at and previous.healthy and failures < self.failure_threshold:
+            # Un fallo aislado no cambia el estado
+            healthy = True
+        else:
+            healthy = False
+
+        now = time.time()
+        changed_at = previous.changed_at if healthy == previous.healthy else now
+        snapshot = HealthSnapshot(healthy, now, latency_ms, version, models, missing, failures, changed_at, error,
+                                  loaded)
+        self.snapshot = snapshot
+        self.probes += 1
+
+        if healthy != previous.healthy:
+            self.transitions += 1
+            if healthy:
+                logger.info("✅ Ollama %s disponible (versión %s, %.1fms)", self.base_url, version, latency_ms)
+            else:
+                logger.error("❌ Ollama %s no disponible: %s", self.base_url, error)
+        elif error and healthy:
+            logger.warning("⚠️ Sondeo de Ollama %s falló (%d/%d): %s", self.base_url, failures,
+                           self.failure_threshold, error)
+
+        if self.on_probe:
+            try:
+                self.on_probe(snapshot)
+            except Exception as e:
+                logger.error("❌ Error tras sondeo de Ollama: %s", e)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Tras un fallo se confirma enseguida (caída) y mientras está caído se detecta la vuelta
+            snapshot = self.snapshot
+            wait = self.interval if snapshot.healthy and not snapshot.consecutive_failures else self.unhealthy_interval
+            if self._stop.wait(wait):
+                return
+            self.probe_once()
+
+    def start(self) -> HealthSnapshot:
+        """Sondear una vez (el estado inicial queda disponible) y arrancar el hilo"""
+        snapshot = self.probe_once()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"ollama-health-{self.base_url}", daemon=True)
+            self._thread.start()
+            logger.info("🩺 Sondeo de Ollama %s cada %.1fs (%.1fs si está caído)",
+                        self.base_url, self.interval, self.unhealthy_interval)
+        return snapshot
+
+    def stop(self):
+        """Detener el hilo de sondeo"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.snapshot.to_dict(), probes=self.probes, transitions=self.transitions)
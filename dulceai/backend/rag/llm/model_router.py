@@ -0,0 +1,260 @@
+"""
+Enrutamiento de modelos por intención
+Asigna a cada mensaje un perfil de generación (modelo, presupuesto de tokens, temperatura, contexto)
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .backend_pool import BackendPool, NoBackendAvailable, OllamaBackend
+from .cancellation import GenerationCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class ModelProfile:
+    """Perfil de generación para Ollama"""
+
+    __slots__ = ("name", "model", "num_predict", "temperature", "num_ctx")
+
+    def __init__(self, name: str, model: str, num_predict: int, temperature: float, num_ctx: int):
+        self.name = name
+        self.model = model
+        self.num_predict = num_predict
+        self.temperature = temperature
+        self.num_ctx = num_ctx
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "num_predict": self.num_predict,
+            "temperature": self.temperature,
+            "num_ctx": self.num_ctx
+        }
+
+
+class _ProfileStats:
+    """Latencias recientes de un perfil"""
+
+    __slots__ = ("requests", "errors", "cancelled", "fallbacks", "latencies")
+
+    def __init__(self, window: int):
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.fallbacks = 0
+        self.latencies = deque(maxlen=window)
+
+
+class ModelRouter:
+    """
+    Router de modelos
+    Los perfiles van ordenados de menor a mayor costo; la intención elige un nivel base
+    y la estrategia del DecisionMaker y el estilo de respuesta lo ajustan
+    """
+
+    def __init__(self, profiles: Dict[str, Dict[str, Any]], order: List[str],
+                 intent_routes: Dict[str, str], default_profile: str,
+                 llm_factory: Callable[..., Any], latency_window: int = 500,
+                 pool: Optional[BackendPool] = None, max_attempts: int = 2):
+        """
+        Inicializar router
+
+        Args:
+            profiles: nombre -> {model, num_predict, temperature, num_ctx}
+            order: Nombres de perfil de menor a mayor costo
+            intent_routes: intención -> nombre de perfil
+            default_profile: Perfil para mensajes sin intención reconocida
+            llm_factory: Crea el cliente LLM de un perfil: llm_factory(profile), o
+                llm_factory(profile, base_url) con pool
+            latency_window: Número de latencias recientes guardadas por perfil
+            pool: Instancias de Ollama entre las que se reparten las generaciones (opcional)
+            max_attempts: Instancias a intentar por generación si la elegida falla
+        """
+        self.profiles = {name: ModelProfile(name, **spec) for name, spec in profiles.items()}
+        self.order = [name for name in order if name in self.profiles]
+        self.intent_routes = intent_routes
+        self.default_profile = default_profile
+        self.llm_factory = llm_factory
+        self.pool = pool
+        self.max_attempts = max(1, max_attempts)
+
+        # Un cliente por perfil (y por instancia con pool), creado la primera vez que se usa
+        self._clients: Dict[Any, Any] = {}
+        self._stats = {name: _ProfileStats(latency_window) for name in self.profiles}
+        self._lock = threading.Lock()
+
+        logger.info("🧭 Router de modelos: %s",
+                    ", ".join(f"{p.name}={p.model}" for p in self.profiles.values()))
+
+    def select(self, info: Dict[str, Any], style: str, strategy: str = "balanced") -> ModelProfile:
+        """
+        Elegir perfil para un mensaje
+
+        Args:
+            info: Información extraída por DecisionMaker (intent, mentioned_products)
+            style: Estilo de respuesta decidido
+            strategy: Estrategia del DecisionMaker (balanced, thorough, quick)
+
+        Returns:
+            Perfil de generación
+        """
+        intent = info.get("intent")
+        if intent is None and info.get("mentioned_products"):
+            intent = "product_advice"
+        level = self.order.index(self.intent_routes.get(intent, self.default_profile))
+
+        if strategy == "quick":
+            level -= 1
+        elif strategy == "thorough":
+            level += 1
+
+        # Una respuesta breve no necesita el perfil más caro
+        if style == "brief":
+            level = min(level, len(self.order) - 2)
+
+        profile = self.profiles[self.order[max(0, min(level, len(self.order) - 1))]]
+        logger.debug("🧭 Perfil %s (intención=%s, estilo=%s, estrategia=%s)",
+                     profile.name, intent, style, strategy)
+        return profile
+
+    def get_llm(self, profile: ModelProfile, backend: Optional[OllamaBackend] = None):
+        """Cliente LLM del perfil (uno por perfil e instancia, reutilizado entre peticiones)"""
+        key = profile.name if backend is None else (profile.name, backend.url)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = (self.llm_factory(profile) if backend is None
+                                                   else self.llm_factory(profile, backend.url))
+        return client
+
+    def invoke(self, profile: ModelProfile, messages: List,
+               should_stop: Optional[Callable[[], bool]] = None, session_id: Optional[str] = None):
+        """
+        Invocar el LLM del perfil registrando latencia y errores
+        Si ninguna instancia sana tiene el modelo del perfil (un modelo opcional sin descargar),
+        se genera con el perfil por defecto
+
+        Args:
+            profile: Perfil elegido con select()
+            messages: Mensajes para el LLM
+            should_stop: Consultada entre tokens; si devuelve True se corta la generación
+                (cerrar el stream cierra la conexión y Ollama deja de generar)
+            session_id: Sesión de la conversación (para mantenerla en la misma instancia)
+
+        Returns:
+            Respuesta del LLM
+        """
+        if self.pool is None:
+            return self._invoke_client(profile, self.get_llm(profile), messages, should_stop)
+
+        tried: List[OllamaBackend] = []
+        while True:
+            try:
+                backend = self.pool.acquire(profile.model, session_id, exclude=tried)
+            except NoBackendAvailable:
+                if tried:
+                    raise last_error
+                fallback = self.profiles.get(self.default_profile)
+                if fallback is None or fallback.model == profile.model:
+                    raise
+                with self._lock:
+                    self._stats[profile.name].fallbacks += 1
+                logger.debug("🧭 %s no disponible: perfil %s -> %s", profile.model, profile.name, fallback.name)
+                profile = fallback
+                continue
+            tried.append(backend)
+            try:
+                response = self._invoke_client(profile, self.get_llm(profile, backend), messages, should_stop)
+            except GenerationCancelled:
+                self.pool.release(backend, ok=None)
+                raise
+            except Exception as e:
+                self.pool.release(backend, ok=False)
+                if len(tried) >= self.max_attempts:
+                    raise
+                last_error = e
+                logger.warning("⚠️ Ollama %s falló (%s): se intenta otra instancia", backend.url, e)
+                continue
+            self.pool.release(backend, ok=True)
+            return response
+
+    def _invoke_client(self, profile: ModelProfile, llm, messages: List,
+                       should_stop: Optional[Callable[[], bool]]):
+        start = time.perf_counter()
+        try:
+            if should_stop is None or not hasattr(llm, "stream"):
+                response = llm.invoke(messages)
+            else:
+                response = self._stream(llm, messages, should_stop)
+        except GenerationCancelled:
+            with self._lock:
+                self._stats[profile.name].cancelled += 1
+            raise
+        except Exception:
+            with self._lock:
+                self._stats[profile.name].errors += 1
+            raise
+        else:
+            with self._lock:
+                self._stats[profile.name].latencies.append(time.perf_counter() - start)
+            return response
+        finally:
+            with self._lock:
+                self._stats[profile.name].requests += 1
+
+    def expected_latency(self, profile: ModelProfile) -> Optional[float]:
+        """Mediana reciente de la generación del perfil en segundos (None sin historial)"""
+        with self._lock:
+            latencies = sorted(self._stats[profile.name].latencies)
+        return latencies[len(latencies) // 2] if latencies else None
+
+    @staticmethod
+    def _stream(llm, messages: List, should_stop: Callable[[], bool]):
+        """
+        Generar por stream comprobando should_stop entre fragmentos; devuelve el mensaje completo
+
+        Raises:
+            GenerationCancelled: should_stop devolvió True
+            RuntimeError: El stream terminó sin fragmentos (se trata como fallo de la instancia)
+        """
+        if should_stop():
+            raise GenerationCancelled("cancelled")
+        response = None
+        stream = llm.stream(messages)
+        try:
+            for chunk in stream:
+                response = chunk if response is None else response + chunk
+                if should_stop():
+                    raise GenerationCancelled("cancelled")
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        if response is None:
+            raise RuntimeError("El LLM terminó el stream sin generar respuesta")
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Latencia por perfil (promedio, p50, p95 sobre la ventana reciente)"""
+        with self._lock:
+            snapshot = {name: (s.requests, s.errors, s.cancelled, s.fallbacks, sorted(s.latencies))
+                        for name, s in self._stats.items()}
+
+        result = {}
+        for name, (requests, errors, cancelled, fallbacks, latencies) in snapshot.items():
+            entry = self.profiles[name].to_dict()
+            entry.update({"requests": requests, "errors": errors, "cancelled": cancelled, "fallbacks": fallbacks})
+            if latencies:
+                entry.update({
+                    "avg_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+                    "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+                    "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+                })
+            result[name] = entry
+        return result
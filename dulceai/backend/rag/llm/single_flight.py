@@ -0,0 +1,120 @@
+"""
+Coalescencia de llamadas idénticas concurrentes (single-flight)
+Las peticiones con la misma clave comparten una sola ejecución en curso
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .cancellation import GenerationCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Ejecución en curso compartida por varios llamadores"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Grupo single-flight
+    Solo coalesce mientras la ejecución está en curso; no es una caché
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def do(self, key: str, fn: Callable[[], Any], should_stop: Optional[Callable[[], bool]] = None,
+           poll_interval: float = 0.05) -> Tuple[Any, bool]:
+        """
+        Ejecutar fn una sola vez por clave entre llamadores concurrentes
+
+        Args:
+            key: Clave de coalescencia (p. ej. hash del prompt completo)
+            fn: Función a ejecutar
+            should_stop: Consultada mientras se espera la ejecución de otro llamador; si devuelve True
+                este llamador deja de esperar (la ejecución sigue para quien la haya iniciado)
+            poll_interval: Segundos entre consultas de should_stop
+
+        Returns:
+            (resultado, compartido) donde compartido indica que se reutilizó otra ejecución
+
+        Raises:
+            GenerationCancelled: should_stop devolvió True antes de que terminara la ejecución compartida
+        """
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            logger.debug("🔗 Generación compartida: %.12s", key)
+            try:
+                while not call.done.wait(poll_interval if should_stop is not None else None):
+                    if should_stop():
+                        with self._lock:
+                            self.abandoned += 1
+                        raise GenerationCancelled("cancelled")
+            finally:
+                # Quien deja de esperar ya no retiene la ejecución (waiters() la libera para cancelarse)
+                with self._lock:
+                    call.waiters -= 1
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        return call.result, False
+
+    def waiters(self, key: str) -> int:
+        """Llamadores que esperan la ejecución en curso de la clave (sin contar al que la ejecuta)"""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call is not None else 0
+
+    def in_flight(self) -> int:
+        """Número de ejecuciones en curso"""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de coalescencia"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "abandoned": self.abandoned,
+                "coalescing_ratio": round(self.coalesced / self.requests, 4) if self.requests else 0.0,
+                "in_flight": len(self._calls)
+            }
@@ -1,7 +1,14 @@
 # Módulo de memoria conversacional
 from .conversation_memory import ConversationMemory
 from .user_context import UserContext
+from .state_backend import StateBackend, InMemoryStateBackend, RedisStateBackend, build_state_backend
+from .session_locks import SessionLocks, SessionTurnTimeout
+from .order_store import OrderStore, OrderQueueFull
 
-__all__ = ['ConversationMemory', 'UserContext']
-
+__all__ = [
+    'ConversationMemory', 'UserContext',
+    'StateBackend', 'InMemoryStateBackend', 'RedisStateBackend', 'build_state_backend',
+    'SessionLocks', 'SessionTurnTimeout',
+    'OrderStore', 'OrderQueueFull'
+]
 
@@ -25,7 +25,9 @@ class ConversationMemory:
         """
         self.messages: List[Dict[str, Any]] = []
         self.max_messages = max_messages
-        logger.info(f"💾 Memoria conversacional inicializada (max: {max_messages})")
+        # Total de mensajes agregados desde el inicio (no baja al recortar)
+        self.total_added = 0
+        logger.info("💾 Memoria conversacional inicializada (max: %s)", max_messages)
     
     def add_user_message(self, content: str, metadata: Optional[Dict] = None):
         """
@@ -45,8 +47,9 @@ class ConversationMemory:
             message["metadata"] = metadata
         
         self.messages.append(message)
+        self.total_added += 1
         self._trim_messages()
-        logger.debug(f"➕ Mensaje de usuario agregado: {content[:50]}...")
+        logger.debug("➕ Mensaje de usuario agregado: %.50s...", content)
     
     def add_ai_message(self, content: str, metadata: Optional[Dict] = None):
         """
@@ -66,29 +69,37 @@ class ConversationMemory:
             message["metadata"] = metadata
         
         self.messages.append(message)
+        self.total_added += 1
         self._trim_messages()
-        logger.debug(f"➕ Mensaje de IA agregado: {content[:50]}...")
+        logger.debug("➕ Mensaje de IA agregado: %.50s...", content)
     
     def _trim_messages(self):
         """Mantener solo los últimos N mensajes"""
         if len(self.messages) > self.max_messages:
             removed = self.messages[:-self.max_messages]
             self.messages = self.messages[-self.max_messages:]
-            logger.debug(f"✂️ Mensajes antiguos removidos: {len(removed)}")
+            logger.debug("✂️ Mensajes antiguos removidos: %d", len(removed))
     
-    def get_history(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def get_history(self, limit: Optional[int] = None, step: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Obtener historial de conversación
         
         Args:
             limit: Número máximo de mensajes a retornar
+            step: Si se indica, el inicio de la ventana avanza en saltos de `step` mensajes
+                  en lugar de uno a uno, para que el prefijo enviado al LLM se mantenga estable
             
         Returns:
             Lista de mensajes ordenados cronológicamente
         """
         history = self.messages.copy()
         
-        if limit:
+        if limit and step:
+            # Inicio alineado a múltiplos de step en la numeración absoluta de mensajes
+            first = self.total_added - len(history)
+            start = max(first, -(-(self.total_added - limit) // step) * step)
+            history = history[start - first:]
+        elif limit:
             history = history[-limit:]
         
         return history
@@ -124,7 +135,7 @@ class ConversationMemory:
         """Limpiar toda la memoria"""
         count = len(self.messages)
         self.messages = []
-        logger.info(f"🗑️ Memoria limpiada ({count} mensajes eliminados)")
+        logger.info("🗑️ Memoria limpiada (%s mensajes eliminados)", count)
     
     def export(self) -> str:
         """Exportar memoria como JSON"""
@@ -133,11 +144,26 @@ class ConversationMemory:
             "summary": self.get_conversation_summary()
         }, indent=2)
     
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar memoria para el backend de estado"""
+        return {"messages": self.messages, "max_messages": self.max_messages,
+                "total_added": self.total_added}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationMemory":
+        """Reconstruir memoria desde el backend de estado"""
+        # Sin __init__: se rehidrata en cada turno y no es una memoria nueva (no se registra en el log)
+        memory = cls.__new__(cls)
+        memory.max_messages = data.get("max_messages", 10)
+        memory.messages = data.get("messages", [])
+        memory.total_added = data.get("total_added", len(memory.messages))
+        return memory
+    
     def import_from_json(self, json_data: str):
         """Importar memoria desde JSON"""
         data = json.loads(json_data)
         self.messages = data.get("messages", [])
-        logger.info(f"📥 Memoria importada ({len(self.messages)} mensajes)")
+        logger.info("📥 Memoria importada (%d mensajes)", len(self.messages))
 
 
 
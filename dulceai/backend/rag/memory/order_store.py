@@ -0,0 +1,274 @@
+"""
+Almacén de pedidos en SQLite (modo WAL)
+Los pedidos se confirman con su id al encolarse; un hilo escritor los inserta por lotes
+con un solo commit por lote (group commit), así el chat no espera al disco
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OrderQueueFull(RuntimeError):
+    """La cola de escritura está llena (el disco no da abasto)"""
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    message TEXT
+);
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT NOT NULL REFERENCES orders(id),
+    product_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_session ON orders(session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
+"""
+
+
+class OrderStore:
+    """
+    Pedidos persistentes con escritura en segundo plano
+
+    - new_order(): arma el pedido con su id sin escribir nada (se puede mostrar antes de confirmar el turno)
+    - submit(): encola el pedido y vuelve enseguida; cancel(): lo marca cancelado si el turno se perdió
+    - El escritor toma lo que haya en la cola (hasta `batch_size`) y lo inserta en una transacción
+    - WAL + synchronous=NORMAL: las lecturas no bloquean al escritor y cada commit no espera fsync
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, queue_size: int = 10000,
+                 put_timeout: float = 1.0):
+        """
+        Args:
+            path: Archivo SQLite (se crea con su carpeta si no existe)
+            batch_size: Pedidos máximos por transacción
+            queue_size: Pedidos máximos pendientes de escribir
+            put_timeout: Segundos que submit() espera si la cola está llena
+        """
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.put_timeout = put_timeout
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.write_errors = 0
+        self.cancelled = 0
+        self._commit_seconds = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def start(self) -> "OrderStore":
+        """Arrancar el hilo escritor"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+            self._thread.start()
+            logger.info("🧾 Pedidos en %s (lotes de hasta %d)", self.path, self.batch_size)
+        return self
+
+    @staticmethod
+    def new_order(items: List[Dict[str, Any]], session_id: Optional[str] = None,
+                  message: str = "") -> Dict[str, Any]:
+        """
+        Armar un pedido sin registrarlo
+
+        Args:
+            items: Líneas con product_key, name, quantity y unit_price
+            session_id: Sesión del cliente
+            message: Mensaje original del cliente
+
+        Returns:
+            Pedido (id, total, líneas, fecha) listo para submit()
+        """
+        return {
+            "id": "PED-" + uuid.uuid4().hex[:10].upper(),
+            "session_id": session_id,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "status": "recibido",
+            "total": sum(item["quantity"] * item["unit_price"] for item in items),
+            "items": items,
+            "message": message
+        }
+
+    def submit(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Registrar un pedido de new_order() (se escribe en segundo plano)
+
+        Raises:
+            OrderQueueFull: La cola siguió llena durante put_timeout
+        """
+        try:
+            self._queue.put(order, timeout=self.put_timeout)
+        except queue.Full:
+            raise OrderQueueFull("Cola de pedidos llena") from None
+        with self._lock:
+            self.submitted += 1
+        return order
+
+    def cancel(self, order_id: str):
+        """Marcar cancelado un pedido ya encolado (se aplica después de su inserción)"""
+        try:
+            self._queue.put({"cancel": order_id}, timeout=self.put_timeout)
+        except queue.Full:
+            logger.error("❌ Cola de pedidos llena: el pedido %s queda sin cancelar", order_id)
+            return
+        with self._lock:
+            self.cancelled += 1
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                order = self._queue.get()
+                if order is None:
+                    return
+                batch = [order]
+                stop = False
+                # Todo lo que llegó mientras se escribía el lote anterior va en este commit
+                while len(batch) < self.batch_size:
+                    try:
+                        order = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if order is None:
+                        stop = True
+                        break
+                    batch.append(order)
+                try:
+                    self._write(conn, batch)
+                except Exception as e:
+                    # El escritor no puede morir: submit() seguiría aceptando y flush() no terminaría
+                    logger.error("❌ Error inesperado escribiendo %d pedidos: %s", len(batch), e)
+                    with self._lock:
+                        self.write_errors += len(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            self._queue.task_done()  # el marcador de cierre (o el último get)
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        try:
+            with conn:
+                self._insert(conn, batch)
+        except Exception as e:
+            # Un pedido inválido (o mal armado) no debe perder el resto del lote: reintentar uno por uno
+            logger.error("❌ Error escribiendo lote de %d pedidos: %s", len(batch), e)
+            written = 0
+            for order in batch:
+                try:
+                    with conn:
+                        self._insert(conn, [order])
+                    written += 1
+                except Exception as e:
+                    logger.error("❌ Pedido %s no guardado: %s", order.get("id", order.get("cancel")), e)
+            with self._lock:
+                self.write_errors += len(batch) - written
+                self.written += written
+                self.batches += 1
+            return
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(batch))
+            self._commit_seconds += time.perf_counter() - start
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, batch: List[Dict[str, Any]]):
+        orders = [o for o in batch if "cancel" not in o]
+        conn.executemany(
+            "INSERT INTO orders (id, session_id, created_at, status, total, message) VALUES (?, ?, ?, ?, ?, ?)",
+            [(o["id"], o["session_id"], o["created_at"], o["status"], o["total"], o["message"]) for o in orders])
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_key, name, quantity, unit_price) VALUES (?, ?, ?, ?, ?)",
+            [(o["id"], i["product_key"], i["name"], i["quantity"], i["unit_price"]) for o in orders for i in o["items"]])
+        # Las cancelaciones van después de las inserciones del mismo lote (su pedido se encoló antes)
+        conn.executemany("UPDATE orders SET status = 'cancelado' WHERE id = ?",
+                         [(o["cancel"],) for o in batch if "cancel" in o])
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Esperar a que lo encolado quede escrito (True si se vació a tiempo)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Escribir lo pendiente y detener el escritor"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        logger.info("🧾 Escritor de pedidos detenido (%d escritos)", self.written)
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Leer un pedido escrito (None si no existe o aún está en la cola)"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone()
+            if row is None:
+                return None
+            items = conn.execute("SELECT product_key, name, quantity, unit_price FROM order_items "
+                                 "WHERE order_id = ?", (order_id,)).fetchall()
+        return dict(row, items=[dict(item) for item in items])
+
+    def list_recent(self, limit: int = 50, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Últimos pedidos (de una sesión o de todas)"""
+        with closing(self._connect()) as conn:
+            if session_id:
+                rows = conn.execute("SELECT * FROM orders WHERE session_id = ? ORDER BY created_at DESC LIMIT ?",
+                                    (session_id, limit)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM orders ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "submitted": self.submitted,
+                "written": self.written,
+                "pending": self._queue.qsize(),
+                "batches": self.batches,
+                "avg_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+                "max_batch": self.max_batch,
+                "avg_commit_ms": round(self._commit_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+                "write_errors": self.write_errors,
+                "cancelled": self.cancelled
+            }
@@ -0,0 +1,91 @@
+"""
+Turnos por sesión
+Serializan los mensajes de una misma sesión sin frenar a las demás
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionTurnTimeout(TimeoutError):
+    """El turno de la sesión no llegó dentro del tiempo de espera"""
+
+
+class SessionLocks:
+    """
+    Cola FIFO por sesión: los mensajes de una sesión se procesan de a uno y en orden de llegada
+    La cola existe solo mientras hay peticiones de esa sesión en curso o esperando,
+    así que la tabla no crece con el número de sesiones vistas
+    """
+
+    def __init__(self):
+        # sesión -> cola de turnos; el primero es la petición en curso (None),
+        # los demás son Events que se activan al llegar su turno
+        self._queues: Dict[str, Deque[Optional[threading.Event]]] = {}
+        self._guard = threading.Lock()
+        self.acquired = 0
+        self.contended = 0
+        self.max_wait_ms = 0.0
+        self.timeouts = 0
+
+    @contextmanager
+    def hold(self, session_id: str, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Ejecutar el bloque en el turno de la sesión
+
+        Args:
+            session_id: Identificador de la sesión
+            timeout: Segundos máximos de espera del turno (None = sin límite)
+
+        Raises:
+            SessionTurnTimeout: Si el turno no llegó a tiempo (la petición sale de la cola)
+        """
+        with self._guard:
+            queue = self._queues.get(session_id)
+            if queue is None:
+                queue = self._queues[session_id] = deque()
+            turn = threading.Event() if queue else None
+            queue.append(turn)
+
+        waited_ms = 0.0
+        if turn is not None:
+            start = time.perf_counter()
+            if not turn.wait(timeout):
+                with self._guard:
+                    # El turno pudo llegar justo al vencer la espera
+                    if not turn.is_set():
+                        queue.remove(turn)
+                        self.timeouts += 1
+                        raise SessionTurnTimeout(f"Turno de la sesión {session_id} no llegó en {timeout:.2f}s")
+            waited_ms = (time.perf_counter() - start) * 1000
+            logger.debug("🔒 Sesión %s esperó %.1fms por un mensaje anterior", session_id, waited_ms)
+        try:
+            with self._guard:
+                self.acquired += 1
+                if turn is not None:
+                    self.contended += 1
+                    self.max_wait_ms = max(self.max_wait_ms, waited_ms)
+            yield
+        finally:
+            with self._guard:
+                queue.popleft()
+                if queue:
+                    queue[0].set()
+                else:
+                    del self._queues[session_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._guard:
+            return {
+                "active_sessions": len(self._queues),
+                "acquired": self.acquired,
+                "contended": self.contended,
+                "max_wait_ms": round(self.max_wait_ms, 1),
+                "timeouts": self.timeouts
+            }
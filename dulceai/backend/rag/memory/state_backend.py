@@ -0,0 +1,332 @@
+"""
+Backend de estado compartido para sesiones y logs
+Permite ejecutar varios workers/hosts compartiendo memoria de usuarios
+"""
+
+import heapq
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Dependencia opcional: redis
+REDIS_AVAILABLE = False
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+
+
+class StateBackend(ABC):
+    """
+    Interfaz de almacenamiento de estado
+    Las sesiones se guardan como strings (JSON) y los logs como listas acotadas
+    """
+
+    @abstractmethod
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Leer varias claves en una sola operación"""
+
+    @abstractmethod
+    def set_many(self, mapping: Dict[str, str], ttl: Optional[int] = None):
+        """Escribir varias claves en una sola operación"""
+
+    @abstractmethod
+    def set_default(self, key: str, value: str) -> str:
+        """Escribir una clave solo si no existe (sin vencimiento); devuelve el valor que quedó guardado"""
+
+    @abstractmethod
+    def append_log(self, name: str, entry: Dict[str, Any], max_len: Optional[int] = None):
+        """Agregar entrada a un log acotado"""
+
+    @abstractmethod
+    def read_log(self, name: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Leer las últimas entradas de un log"""
+
+    @abstractmethod
+    def log_length(self, name: str) -> int:
+        """Número de entradas de un log"""
+
+    @abstractmethod
+    def add_session(self, session_id: str, ttl: Optional[int] = None):
+        """Registrar sesión activa (deja de contarse cuando vence su contexto)"""
+
+    @abstractmethod
+    def count_sessions(self) -> int:
+        """Número de sesiones registradas"""
+
+    def describe(self) -> Dict[str, Any]:
+        """Información del backend para el endpoint de estado"""
+        return {"type": self.__class__.__name__}
+
+
+class InMemoryStateBackend(StateBackend):
+    """Backend local al proceso (un solo worker)"""
+
+    def __init__(self):
+        self._values: Dict[str, str] = {}
+        self._expires: Dict[str, float] = {}
+        self._logs: Dict[str, List[Dict[str, Any]]] = {}
+        self._sessions = set()
+        # (expira, clave): las claves vencidas se liberan aunque nadie vuelva a leerlas
+        self._expiry_heap: List[tuple] = []
+        self._lock = threading.Lock()
+        logger.info("💾 Backend de estado en memoria inicializado")
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        now = time.time()
+        result = {}
+        with self._lock:
+            for key in keys:
+                expires = self._expires.get(key)
+                if expires is not None and expires <= now:
+                    self._values.pop(key, None)
+                    self._expires.pop(key, None)
+                result[key] = self._values.get(key)
+        return result
+
+    def set_many(self, mapping: Dict[str, str], ttl: Optional[int] = None):
+        now = time.time()
+        with self._lock:
+            self._values.update(mapping)
+            for key in mapping:
+                if ttl:
+                    self._expires[key] = now + ttl
+                    heapq.heappush(self._expiry_heap, (now + ttl, key))
+                else:
+                    self._expires.pop(key, None)
+            self._purge_expired(now)
+
+    def set_default(self, key: str, value: str) -> str:
+        now = time.time()
+        with self._lock:
+            expires = self._expires.get(key)
+            if key in self._values and (expires is None or expires > now):
+                return self._values[key]
+            self._values[key] = value
+            self._expires.pop(key, None)
+            return value
+
+    def _purge_expired(self, now: float, budget: int = 16):
+        """Liberar hasta `budget` claves vencidas (costo acotado por escritura; llamar con el lock)"""
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now and budget:
+            expires, key = heapq.heappop(heap)
+            budget -= 1
+            # Entradas obsoletas (la clave se renovó después) se descartan sin más
+            if self._expires.get(key) == expires:
+                del self._expires[key]
+                self._values.pop(key, None)
+                if key.startswith("context:"):
+                    self._sessions.discard(key[len("context:"):])
+        # Cada renovación deja una entrada vieja en el heap: compactar si crece demasiado
+        if len(heap) > 2 * len(self._expires) + 1024:
+            self._expiry_heap = [(expires, key) for key, expires in self._expires.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def append_log(self, name: str, entry: Dict[str, Any], max_len: Optional[int] = None):
+        with self._lock:
+            log = self._logs.setdefault(name, [])
+            log.append(entry)
+            if max_len and len(log) > max_len:
+                del log[:len(log) - max_len]
+
+    def read_log(self, name: str, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._logs.get(name, [])[-limit:]) if limit > 0 else []
+
+    def log_length(self, name: str) -> int:
+        with self._lock:
+            return len(self._logs.get(name, []))
+
+    def add_session(self, session_id: str, ttl: Optional[int] = None):
+        # Se libera junto con la clave "context:<id>" en _purge_expired
+        with self._lock:
+            self._sessions.add(session_id)
+
+    def count_sessions(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class RedisStateBackend(StateBackend):
+    """
+    Backend compartido sobre Redis
+    - Lecturas y escrituras en pipeline (un round-trip por operación)
+    - Near-cache local validado por versión: solo se transfiere el valor si cambió
+    - Sesiones activas en un ZSET con su vencimiento como puntaje: las vencidas se descartan al contar
+    """
+
+    def __init__(self, url: str, prefix: str = "dulceai:", near_cache_size: int = 1024,
+                 client=None):
+        """
+        Inicializar backend Redis
+
+        Args:
+            url: URL de conexión (redis://host:puerto/db)
+            prefix: Prefijo de todas las claves
+            near_cache_size: Máximo de entradas en la caché local
+            client: Cliente Redis ya construido (opcional)
+        """
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("El paquete 'redis' no está instalado")
+            client = redis.Redis.from_url(url, decode_responses=True)
+
+        self.client = client
+        self.url = url
+        self.prefix = prefix
+        self.near_cache_size = near_cache_size
+        # clave -> (versión, valor)
+        self._near_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.near_cache_hits = 0
+        self.near_cache_misses = 0
+        logger.info("💾 Backend de estado Redis inicializado: %s", url)
+
+    def _k(self, key: str) -> str:
+        return self.prefix + key
+
+    def _v(self, key: str) -> str:
+        return self.prefix + key + ":v"
+
+    def _cache_get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._near_cache.get(key)
+            if entry is not None:
+                self._near_cache.move_to_end(key)
+            return entry
+
+    def _cache_put(self, key: str, version: Optional[str], value: Optional[str]):
+        with self._lock:
+            if value is None or version is None:
+                self._near_cache.pop(key, None)
+                return
+            self._near_cache[key] = (version, value)
+            self._near_cache.move_to_end(key)
+            while len(self._near_cache) > self.near_cache_size:
+                self._near_cache.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        keys = list(keys)
+        cached = {key: self._cache_get(key) for key in keys}
+
+        # Un solo round-trip: versión de todas las claves + valor de las no cacheadas
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(self._v(key))
+            if cached[key] is None:
+                pipe.get(self._k(key))
+        replies = iter(pipe.execute())
+
+        result: Dict[str, Optional[str]] = {}
+        stale = []
+        for key in keys:
+            version = next(replies)
+            entry = cached[key]
+            if entry is None:
+                value = next(replies)
+                self.near_cache_misses += 1
+                self._cache_put(key, version, value)
+                result[key] = value
+            elif entry[0] == version:
+                self.near_cache_hits += 1
+                result[key] = entry[1]
+            else:
+                stale.append(key)
+
+        if stale:
+            # Otra instancia modificó la clave: releer valor y versión juntos
+            pipe = self.client.pipeline(transaction=False)
+            for key in stale:
+                pipe.get(self._v(key))
+                pipe.get(self._k(key))
+            replies = iter(pipe.execute())
+            for key in stale:
+                version, value = next(replies), next(replies)
+                self.near_cache_misses += 1
+                self._cache_put(key, version, value)
+                result[key] = value
+
+        return result
+
+    def set_many(self, mapping: Dict[str, str], ttl: Optional[int] = None):
+        pipe = self.client.pipeline(transaction=True)
+        for key, value in mapping.items():
+            pipe.set(self._k(key), value, ex=ttl)
+            pipe.incr(self._v(key))
+            if ttl:
+                pipe.expire(self._v(key), ttl)
+        if ttl:
+            # Cada guardado del contexto renueva el vencimiento de la sesión (mismo round-trip)
+            expires = time.time() + ttl
+            sessions = {key[len("context:"):]: expires for key in mapping if key.startswith("context:")}
+            if sessions:
+                pipe.zadd(self._k("active_sessions"), sessions)
+        replies = pipe.execute()
+
+        step = 3 if ttl else 2
+        for i, (key, value) in enumerate(mapping.items()):
+            self._cache_put(key, str(replies[i * step + 1]), value)
+
+    def set_default(self, key: str, value: str) -> str:
+        # SET NX + GET en una transacción: todos los workers leen el valor del primero que escribió
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(self._k(key), value, nx=True)
+        pipe.get(self._k(key))
+        return pipe.execute()[1]
+
+    def append_log(self, name: str, entry: Dict[str, Any], max_len: Optional[int] = None):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.rpush(self._k(name), json.dumps(entry, default=str))
+        if max_len:
+            pipe.ltrim(self._k(name), -max_len, -1)
+        pipe.execute()
+
+    def read_log(self, name: str, limit: int = 50) -> List[Dict[str, Any]]:
+        if limit <= 0:
+            return []
+        return [json.loads(item) for item in self.client.lrange(self._k(name), -limit, -1)]
+
+    def log_length(self, name: str) -> int:
+        return int(self.client.llen(self._k(name)))
+
+    def add_session(self, session_id: str, ttl: Optional[int] = None):
+        expires = time.time() + ttl if ttl else float("inf")
+        self.client.zadd(self._k("active_sessions"), {session_id: expires})
+
+    def count_sessions(self) -> int:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zremrangebyscore(self._k("active_sessions"), "-inf", time.time())
+        pipe.zcard(self._k("active_sessions"))
+        return int(pipe.execute()[1])
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": self.__class__.__name__,
+            "url": self.url,
+            "near_cache_entries": len(self._near_cache),
+            "near_cache_hits": self.near_cache_hits,
+            "near_cache_misses": self.near_cache_misses
+        }
+
+
+def build_state_backend(url: Optional[str] = None) -> StateBackend:
+    """
+    Construir backend de estado según URL
+
+    Args:
+        url: None o "memory://" para memoria local, "redis://..." para Redis
+
+    Returns:
+        Instancia de StateBackend
+    """
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url)
+    return InMemoryStateBackend()
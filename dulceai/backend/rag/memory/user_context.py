@@ -27,21 +27,30 @@ class UserContext:
         self.preferences: List[str] = []
         self.recent_products: List[str] = []
         self.orders_history: List[Dict[str, Any]] = []
+        # Pedido propuesto que espera el "sí" del cliente en el turno siguiente
+        self.pending_order: Optional[Dict[str, Any]] = None
         self.last_visit: Optional[str] = None
         self.registration_date: str = datetime.now().isoformat()
         
-        logger.info(f"👤 Contexto creado para usuario: {user_id}")
+        # Caché del prompt personalizado: se invalida (dirty) con cada cambio relevante
+        self.version = 0
+        self._prompt_cache: Optional[str] = None
+        
+        logger.info("👤 Contexto creado para usuario: %s", user_id)
     
     def update_name(self, name: str):
         """Actualizar nombre del usuario"""
-        self.name = name
-        logger.info(f"👤 Nombre actualizado: {name}")
+        if name != self.name:
+            self.name = name
+            self._mark_dirty()
+        logger.info("👤 Nombre actualizado: %s", name)
     
     def add_preference(self, preference: str):
         """Agregar preferencia del usuario"""
         if preference not in self.preferences:
             self.preferences.append(preference)
-            logger.info(f"❤️ Preferencia agregada: {preference}")
+            self._mark_dirty()
+            logger.info("❤️ Preferencia agregada: %s", preference)
     
     def add_recent_product(self, product: str):
         """Agregar producto recientemente consultado"""
@@ -50,7 +59,8 @@ class UserContext:
             # Mantener solo últimos 5 productos
             if len(self.recent_products) > 5:
                 self.recent_products = self.recent_products[:5]
-            logger.info(f"🛍️ Producto reciente: {product}")
+            self._mark_dirty()
+            logger.info("🛍️ Producto reciente: %s", product)
     
     def add_order(self, order_details: Dict[str, Any]):
         """Agregar pedido al historial"""
@@ -60,7 +70,22 @@ class UserContext:
             "user_id": self.user_id
         }
         self.orders_history.append(order)
-        logger.info(f"📋 Pedido agregado al historial")
+        self._mark_dirty()
+        logger.info("📋 Pedido agregado al historial")
+    
+    def set_pending_order(self, pending: Optional[Dict[str, Any]]):
+        """Guardar (o descartar con None) la propuesta de pedido a confirmar"""
+        self.pending_order = pending
+    
+    def _mark_dirty(self):
+        """Invalidar el prompt personalizado cacheado"""
+        self.version += 1
+        self._prompt_cache = None
+    
+    @property
+    def is_dirty(self) -> bool:
+        """True si el prompt personalizado debe reconstruirse"""
+        return self._prompt_cache is None
     
     def update_last_visit(self):
         """Actualizar última visita"""
@@ -79,11 +104,47 @@ class UserContext:
             "registration_date": self.registration_date
         }
     
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar contexto para el backend de estado"""
+        return {
+            "user_id": self.user_id,
+            "name": self.name,
+            "preferences": self.preferences,
+            "recent_products": self.recent_products,
+            "orders_history": self.orders_history,
+            "pending_order": self.pending_order,
+            "last_visit": self.last_visit,
+            "registration_date": self.registration_date,
+            "version": self.version,
+            "personalized_prompt": self._prompt_cache
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UserContext":
+        """Reconstruir contexto desde el backend de estado"""
+        # Sin __init__: se rehidrata en cada turno y no es un contexto nuevo (no se registra en el log)
+        context = cls.__new__(cls)
+        context.user_id = data["user_id"]
+        context.name = data.get("name")
+        context.preferences = data.get("preferences", [])
+        context.recent_products = data.get("recent_products", [])
+        context.orders_history = data.get("orders_history", [])
+        context.pending_order = data.get("pending_order")
+        context.last_visit = data.get("last_visit")
+        context.registration_date = data.get("registration_date") or datetime.now().isoformat()
+        context.version = data.get("version", 0)
+        context._prompt_cache = data.get("personalized_prompt")
+        return context
+    
     def build_personalized_prompt(self) -> str:
         """
         Construir prompt personalizado basado en el contexto
         Implementa recuperación de contexto semántico
+        Se reconstruye solo si el contexto cambió desde la última vez
         """
+        if self._prompt_cache is not None:
+            return self._prompt_cache
+        
         prompt_parts = []
         
         if self.name:
@@ -98,7 +159,8 @@ class UserContext:
         if self.orders_history:
             prompt_parts.append(f"Tiene {len(self.orders_history)} pedidos anteriores.")
         
-        return " ".join(prompt_parts) if prompt_parts else ""
+        self._prompt_cache = " ".join(prompt_parts) if prompt_parts else ""
+        return self._prompt_cache
 
 
 
@@ -1,8 +1,13 @@
 # Módulo de planificación y toma de decisiones
-from .task_planner import TaskPlanner
+from .task_planner import TaskPlanner, TaskPlan
 from .decision_maker import DecisionMaker
+from .fast_path import FastPathPolicy
+from .plan_executor import PlanExecutor, PlanResult
+from .deadline import Deadline, DeadlineStats
+from .degraded_engine import DegradedResponder
 
-__all__ = ['TaskPlanner', 'DecisionMaker']
+__all__ = ['TaskPlanner', 'TaskPlan', 'DecisionMaker', 'FastPathPolicy', 'PlanExecutor', 'PlanResult',
+           'Deadline', 'DeadlineStats', 'DegradedResponder']
 
 
 
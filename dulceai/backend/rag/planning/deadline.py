@@ -0,0 +1,74 @@
+"""
+Plazos por petición
+Un presupuesto total que se reparte entre la espera del turno, las herramientas y la generación
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """
+    Plazo de una petición
+    Se crea al recibirla; cada etapa consulta lo que queda. Si una etapa no alcanza,
+    la petición se responde en modo degradado y `degraded` guarda el motivo
+    """
+
+    __slots__ = ("total", "started", "expires_at", "degraded")
+
+    def __init__(self, total: float):
+        """
+        Args:
+            total: Segundos disponibles para toda la petición
+        """
+        self.total = total
+        self.started = time.monotonic()
+        self.expires_at = self.started + total
+        self.degraded: Optional[str] = None
+
+    def remaining(self) -> float:
+        """Segundos que quedan (nunca negativo)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def share(self, fraction: float) -> float:
+        """Tope de una etapa: una fracción del total, sin pasar de lo que queda"""
+        return min(self.total * fraction, self.remaining())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+class DeadlineStats:
+    """Métricas de plazos: peticiones con plazo y respuestas degradadas por motivo"""
+
+    REASONS = ("queue", "budget", "generation_timeout")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.degraded = {reason: 0 for reason in self.REASONS}
+
+    def record(self, deadline: Deadline):
+        """Registrar una petición terminada"""
+        with self._lock:
+            self.requests += 1
+            # Los demás motivos (circuito, sobrecarga) los cuenta el motor degradado
+            if deadline.degraded in self.degraded:
+                self.degraded[deadline.degraded] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            degraded = sum(self.degraded.values())
+            return {
+                "requests": self.requests,
+                "degraded": dict(self.degraded),
+                "degraded_rate": round(degraded / self.requests, 4) if self.requests else 0.0
+            }
@@ -14,9 +14,23 @@ class DecisionMaker:
     Ajusta comportamiento según condiciones del entorno
     """
     
-    def __init__(self):
-        """Inicializar sistema de decisiones"""
+    # Palabras clave por herramienta cuando no se usa el registro de herramientas
+    DEFAULT_TOOL_KEYWORDS = {
+        "BuscarProducto": ["producto", "cupcake", "torta", "pastel", "galleta", "cheesecake", "pie", "dona"],
+        "ConsultarHorario": ["horario", "abierto", "cierra", "disponible", "tiempo"],
+        "ConsultarContacto": ["contacto", "teléfono", "telefono", "dirección", "direccion", "email"],
+        "ProcesarPedido": ["pedido", "orden", "comprar", "quiero", "necesito"]
+    }
+    
+    def __init__(self, tool_keywords: Optional[Dict[str, List[str]]] = None):
+        """
+        Inicializar sistema de decisiones
+        
+        Args:
+            tool_keywords: Palabras clave por herramienta (p. ej. ToolRegistry.keywords())
+        """
         self.strategy = "balanced"  # balanced, thorough, quick
+        self.tool_keywords = tool_keywords or self.DEFAULT_TOOL_KEYWORDS
         logger.info("🧠 Sistema de decisiones inicializado")
     
     def decide_response_style(self, context: Dict[str, Any]) -> str:
@@ -56,17 +70,10 @@ class DecisionMaker:
         """
         message_lower = message.lower()
         
-        tool_keywords = {
-            "BuscarProducto": ["producto", "cupcake", "torta", "pastel", "galleta", "cheesecake", "pie", "dona"],
-            "ConsultarHorario": ["horario", "abierto", "cierra", "disponible", "tiempo"],
-            "ConsultarContacto": ["contacto", "teléfono", "telefono", "dirección", "direccion", "email"],
-            "ProcesarPedido": ["pedido", "orden", "comprar", "quiero", "necesito"]
-        }
-        
-        for tool_name, keywords in tool_keywords.items():
+        for tool_name, keywords in self.tool_keywords.items():
             if tool_name in available_tools:
                 if any(keyword in message_lower for keyword in keywords):
-                    logger.info(f"🛠️ Herramienta seleccionada: {tool_name}")
+                    logger.info("🛠️ Herramienta seleccionada: %s", tool_name)
                     return tool_name
         
         logger.debug("🛠️ No se requiere herramienta específica")
@@ -141,9 +148,13 @@ class DecisionMaker:
             info["intent"] = "hours_inquiry"
         elif any(word in message_lower for word in ["contacto", "teléfono"]):
             info["intent"] = "contact_inquiry"
+        elif len(message_lower.split()) <= 6 and any(
+                word.strip("¡!¿?.,") in ["hola", "buenas", "buenos", "saludos", "gracias", "chao", "adiós"]
+                for word in message_lower.split()):
+            info["intent"] = "greeting"
         
         if info:
-            logger.info(f"📊 Información extraída: {list(info.keys())}")
+            logger.info("📊 Información extraída: %s", list(info.keys()))
         
         return info
 
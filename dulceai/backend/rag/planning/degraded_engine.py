@@ -0,0 +1,180 @@
+"""
+Motor de respuestas degradado
+Responde sin LLM (Ollama caído, circuito abierto o sobrecarga) con el catálogo,
+las plantillas del negocio y la base de conocimiento
+"""
+
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..tools.business_tools import BusinessTools
+from ..tools.catalog_search import CatalogSearchIndex
+from ..tools.fuzzy_index import tokenize
+from ..tools.product_tools import ProductTools
+from .fast_path import FastPathPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class DegradedResponder:
+    """
+    Respuestas en español a partir de índices ya construidos (sin E/S ni LLM)
+
+    - Producto concreto (índice difuso): ficha o precio, más productos relacionados
+    - Categoría, "sin gluten/lactosa/...", "barato": búsqueda facetada del catálogo
+    - Horarios, contacto y pedidos: plantillas de BusinessTools
+    - Políticas y otros temas: fragmento más cercano de la base de conocimiento
+    - Nada reconocible: resumen del catálogo por categoría
+    """
+
+    ALLERGEN_PATTERN = re.compile(r"\bsin\s+(gluten|trigo|nueces|nuez|man[ií]|frutos\s+secos|"
+                                  r"l[aá]cteos|lactosa|leche|huevos?)\b")
+    CHEAP_PATTERN = re.compile(r"\b(barat[oa]s?|econ[oó]mic[oa]s?|m[aá]s\s+bajo)\b")
+    # Sinónimos de categoría que no salen del catálogo
+    CATEGORY_ALIASES = {"pastel": "tortas", "pasteles": "tortas", "ponque": "tortas"}
+    # Alias de alérgenos del mensaje que el índice no conoce
+    ALLERGEN_ALIASES = {"trigo": "gluten", "nuez": "nueces", "mani": "nueces", "maní": "nueces",
+                        "leche": "lacteos", "huevo": "huevos"}
+    ALLERGEN_LABELS = {"lacteos": "lácteos"}
+    MAX_LISTED = 4
+
+    def __init__(self, product_tools: ProductTools, business_tools: BusinessTools,
+                 catalog: CatalogSearchIndex, knowledge=None, knowledge_min_score: float = 0.15):
+        """
+        Args:
+            product_tools: Índice difuso, fichas y recomendador
+            business_tools: Plantillas de horario, contacto y pedidos
+            catalog: Índice facetado del catálogo
+            knowledge: KnowledgeIndex (opcional)
+            knowledge_min_score: Similitud mínima de un fragmento
+        """
+        self.product_tools = product_tools
+        self.business_tools = business_tools
+        self.catalog = catalog
+        self.knowledge = knowledge
+        self.knowledge_min_score = knowledge_min_score
+
+        # "torta"/"tortas" -> "tortas"
+        self._categories: Dict[str, str] = dict(self.CATEGORY_ALIASES)
+        for category in catalog.category_bits:
+            for token in tokenize(category):
+                self._categories[token] = category
+                self._categories[token.rstrip("s")] = category
+        # Resumen del catálogo (precio desde) calculado una vez
+        lowest: Dict[str, int] = {}
+        for product in catalog.products:
+            category = product.get("category", "")
+            lowest[category] = min(lowest.get(category, product["price"]), product["price"])
+        self._overview = "Nuestro catálogo:\n" + "\n".join(
+            f"- {category.capitalize()} desde ${price:,}" for category, price in lowest.items())
+
+        self._lock = threading.Lock()
+        self.answers: Dict[str, int] = {}
+        self._total_seconds = 0.0
+
+    def respond(self, message: str, info: Dict[str, Any], name: Optional[str] = None,
+                reason: str = "degraded") -> str:
+        """
+        Responder sin LLM
+
+        Args:
+            message: Mensaje del cliente
+            info: Información extraída por DecisionMaker
+            name: Nombre del cliente (opcional)
+            reason: Motivo del modo degradado (solo para métricas)
+
+        Returns:
+            Respuesta en español
+        """
+        start = time.perf_counter()
+        text = message.lower()
+        sections = self._sections(message, text, info)
+        if sections:
+            opening = f"¡Claro, {name}! 😊" if name else "¡Claro! 😊"
+            body = "\n\n".join(sections)
+            response = f"{opening}\n\n{body}\n\n¿Hay algo más en lo que pueda ayudarte?"
+        else:
+            opening = f"¡Hola, {name}! 😊" if name else "¡Hola! 😊"
+            response = (f"{opening} Soy DulceAI, el asistente de la pastelería.\n\n{self._overview}"
+                        "\n\nCuéntame qué producto te interesa y te doy los detalles.")
+
+        with self._lock:
+            self.answers[reason] = self.answers.get(reason, 0) + 1
+            self._total_seconds += time.perf_counter() - start
+        return response
+
+    def _sections(self, message: str, text: str, info: Dict[str, Any]) -> List[str]:
+        sections = []
+        intent = info.get("intent")
+
+        if FastPathPolicy.TOOL_PATTERNS["ConsultarHorario"].search(text):
+            sections.append(self.business_tools.get_hours())
+        if FastPathPolicy.TOOL_PATTERNS["ConsultarContacto"].search(text):
+            sections.append(self.business_tools.get_contact_info())
+
+        products = self._product_section(message, text, info)
+        if products:
+            sections.append(products)
+
+        if intent == "purchase":
+            sections.append(self.business_tools.get_order_instructions())
+
+        if not sections and self.knowledge is not None and intent != "greeting":
+            hits = self.knowledge.search(message, k=1, min_score=self.knowledge_min_score)
+            if hits:
+                sections.append(f"{hits[0]['title']}:\n{hits[0]['text']}")
+        return sections
+
+    def _product_section(self, message: str, text: str, info: Dict[str, Any]) -> Optional[str]:
+        without = [self.ALLERGEN_ALIASES.get(m.group(1), m.group(1))
+                   for m in self.ALLERGEN_PATTERN.finditer(text)]
+        cheap = bool(self.CHEAP_PATTERN.search(text))
+        category = next((self._categories[t] for t in tokenize(text) if t in self._categories), None)
+
+        # Un producto concreto: una sola coincidencia con el mejor puntaje
+        if not without and not cheap:
+            candidates = self.product_tools.fuzzy_match(message, limit=2)
+            if candidates and (len(candidates) == 1 or candidates[1][1] < candidates[0][1]):
+                product = self.product_tools.config.PRODUCTS[candidates[0][0]]
+                if info.get("intent") == "price_inquiry":
+                    section = f"🍰 {product['name']}: ${product['price']:,}"
+                    if "size" in product:
+                        section += f" ({product['size']})"
+                else:
+                    section = self.product_tools.describe(product)
+                related = self.product_tools.recommend_products([candidates[0][0]], k=2)
+                related = [p for p in related if p["name"] != product["name"]]
+                if related:
+                    section += "\n\nTambién te pueden interesar:\n" + "\n".join(
+                        f"- {p['name']}: ${p['price']:,}" for p in related)
+                return section
+
+        if not (category or without or cheap or info.get("mentioned_products")):
+            return None
+
+        result = self.catalog.search(category=category, without=without,
+                                     sort="price_asc" if cheap else "default", page_size=self.MAX_LISTED)
+        allergens = result["filters"]["without"]
+        label = category or "productos"
+        if allergens:
+            label += " sin " + ", ".join(self.ALLERGEN_LABELS.get(a, a) for a in allergens)
+        if not result["results"]:
+            return (f"En este momento no tenemos {label} en el catálogo. "
+                    f"Escríbenos al {self.business_tools.config.BUSINESS_INFO['phone']} y revisamos opciones.")
+        lines = [f"- {p['name']}: ${p['price']:,}" for p in result["results"]]
+        more = result["total"] - len(lines)
+        if more > 0:
+            lines.append(f"... y {more} más")
+        heading = f"{label.capitalize()} más económicos:" if cheap else f"{label.capitalize()}:"
+        return heading + "\n" + "\n".join(lines)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            answered = sum(self.answers.values())
+            return {
+                "answers": dict(self.answers),
+                "avg_ms": round(self._total_seconds / answered * 1000, 3) if answered else 0.0
+            }
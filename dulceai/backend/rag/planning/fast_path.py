@@ -0,0 +1,124 @@
+"""
+Camino rápido determinista
+Responde intenciones que solo requieren herramientas sin invocar el LLM
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FastPathDecision:
+    """Resultado de evaluar un mensaje para el camino rápido"""
+
+    __slots__ = ("tools", "confidence")
+
+    def __init__(self, tools: List[str], confidence: float):
+        self.tools = tools
+        self.confidence = confidence
+
+
+class FastPathPolicy:
+    """
+    Política de camino rápido
+    Se activa cuando la intención es de alta confianza y solo necesita herramientas
+    (horarios, contacto); cualquier señal de producto, pedido o precio la descarta
+    """
+
+    # Patrones compilados por herramienta (palabras completas, con y sin tildes)
+    TOOL_PATTERNS = {
+        "ConsultarHorario": re.compile(
+            r"\b(horarios?|abren|abierto|abiertos|cierran|cierra|a\s+qu[eé]\s+hora|atienden)\b"
+        ),
+        "ConsultarContacto": re.compile(
+            r"\b(contacto|contactar|tel[eé]fono|celular|whatsapp|direcci[oó]n|email|correo|"
+            r"d[oó]nde\s+(quedan|est[aá]n|se\s+ubican))\b"
+        ),
+    }
+
+    # Señales que requieren razonamiento del LLM
+    BLOCKING_PATTERN = re.compile(
+        r"\b(pedido|pedir|orden|ordenar|comprar|quiero|necesito|precio|cuesta|cu[aá]nto|valor|"
+        r"recomienda|recomiendas|recomendaci[oó]n|domicilio|entrega|env[ií]o)\b"
+    )
+
+    def __init__(self, enabled: bool = True, tools: Optional[List[str]] = None,
+                 min_confidence: float = 0.8, max_words: int = 15):
+        """
+        Inicializar política
+
+        Args:
+            enabled: Activar el camino rápido
+            tools: Herramientas que pueden responder sin LLM
+            min_confidence: Confianza mínima para usarlo
+            max_words: Mensajes más largos pierden confianza
+        """
+        self.enabled = enabled
+        self.tools = set(tools or self.TOOL_PATTERNS.keys())
+        self.min_confidence = min_confidence
+        self.max_words = max_words
+        self.evaluations = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        logger.info("⚡ Camino rápido %s", "activado" if enabled else "desactivado")
+
+    def evaluate(self, message: str, info: Dict[str, Any]) -> Optional[FastPathDecision]:
+        """
+        Evaluar si el mensaje puede responderse solo con herramientas
+
+        Args:
+            message: Mensaje del usuario
+            info: Información extraída por DecisionMaker
+
+        Returns:
+            FastPathDecision si aplica, None si debe ir al LLM
+        """
+        if not self.enabled:
+            return None
+
+        decision = self._score(message.lower(), info)
+        with self._lock:
+            self.evaluations += 1
+            if decision:
+                self.hits += 1
+        return decision
+
+    def _score(self, message_lower: str, info: Dict[str, Any]) -> Optional[FastPathDecision]:
+        if info.get("mentioned_products") or self.BLOCKING_PATTERN.search(message_lower):
+            return None
+
+        matched = [tool for tool, pattern in self.TOOL_PATTERNS.items() if pattern.search(message_lower)]
+        if not matched or not set(matched) <= self.tools:
+            return None
+
+        confidence = 0.9
+        confidence += 0.1 if len(message_lower.split()) <= self.max_words else -0.4
+        if confidence < self.min_confidence:
+            return None
+
+        return FastPathDecision(matched, confidence)
+
+    def render(self, tool_outputs: List[str], name: Optional[str] = None) -> str:
+        """
+        Construir respuesta en español a partir de la salida de las herramientas
+
+        Args:
+            tool_outputs: Texto producido por cada herramienta
+            name: Nombre del cliente para personalizar (opcional)
+        """
+        greeting = f"¡Claro, {name}! 😊" if name else "¡Claro! 😊"
+        body = "\n\n".join(output for output in tool_outputs if output)
+        return f"{greeting} Aquí tienes la información:\n\n{body}\n\n¿Hay algo más en lo que pueda ayudarte?"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tasa de aciertos del camino rápido"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "evaluations": self.evaluations,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.evaluations, 4) if self.evaluations else 0.0
+            }
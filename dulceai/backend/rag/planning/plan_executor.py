@@ -0,0 +1,179 @@
+"""
+Ejecutor de planes
+Convierte los pasos de TaskPlanner en llamadas a herramientas y las ejecuta en paralelo
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PlanResult:
+    """Resultado de ejecutar un plan"""
+
+    __slots__ = ("outputs", "timings", "elapsed")
+
+    def __init__(self, outputs: List[str], timings: List[Dict[str, Any]], elapsed: float):
+        self.outputs = outputs
+        self.timings = timings
+        self.elapsed = elapsed
+
+    @property
+    def tools(self) -> List[str]:
+        return [t["tool"] for t in self.timings if t["status"] == "ok"]
+
+    def merged(self) -> str:
+        """Salidas de todas las herramientas unidas para el contexto del LLM"""
+        return "\n\n".join(output for output in self.outputs if output)
+
+
+class PlanExecutor:
+    """
+    Ejecutor concurrente de pasos del plan
+    Cada acción se asigna a una herramienta; las herramientas repetidas se ejecutan una vez
+    y un paso que supera su timeout se omite sin bloquear la respuesta
+    """
+
+    # Acción del plan -> herramienta (las acciones sin herramienta las resuelve el LLM)
+    ACTION_TOOLS = {
+        "search_product": "BuscarProducto",
+        "provide_price": "BuscarProducto",
+        "recommend": "RecomendarProductos",
+        "offer_alternatives": "RecomendarProductos",
+        "process_order": "ProcesarPedido",
+        "confirm_contact": "ConsultarContacto",
+        "provide_hours": "ConsultarHorario",
+        "provide_contact": "ConsultarContacto",
+    }
+
+    def __init__(self, max_workers: int = 4, step_timeout: float = 2.0,
+                 timeout_for: Optional[Callable[[str], float]] = None):
+        """
+        Inicializar ejecutor
+
+        Args:
+            max_workers: Hilos compartidos para ejecutar pasos
+            step_timeout: Segundos máximos por paso
+            timeout_for: Timeout declarado por herramienta (p. ej. ToolRegistry.timeout_for)
+        """
+        self.step_timeout = step_timeout
+        self.timeout_for = timeout_for or (lambda tool: self.step_timeout)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-step")
+        self._lock = threading.Lock()
+        self.plans = 0
+        self.steps = 0
+        self.timeouts = 0
+        self.errors = 0
+        # herramienta -> [ejecuciones, milisegundos acumulados]
+        self._tool_times: Dict[str, List[float]] = {}
+        logger.info("⚙️ Ejecutor de planes inicializado (hilos=%d, timeout=%.1fs)", max_workers, step_timeout)
+
+    def tools_for(self, plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Pasos del plan que requieren herramienta, sin repetir herramientas
+
+        Args:
+            plan: Pasos de TaskPlanner (un paso puede fijar "tool" directamente)
+
+        Returns:
+            Lista de {"action", "tool"} en orden de prioridad
+        """
+        steps, seen = [], set()
+        for step in sorted(plan, key=lambda s: s.get("priority", 0)):
+            tool = step.get("tool") or self.ACTION_TOOLS.get(step.get("action"))
+            if tool and tool not in seen:
+                seen.add(tool)
+                steps.append({"action": step.get("action"), "tool": tool})
+        return steps
+
+    def execute(self, plan: List[Dict[str, Any]], run_tool: Callable[[str], str],
+                budget: Optional[float] = None) -> PlanResult:
+        """
+        Ejecutar los pasos del plan
+
+        Args:
+            plan: Pasos de TaskPlanner
+            run_tool: Ejecuta una herramienta por nombre y devuelve su texto
+            budget: Segundos máximos para todo el plan (plazo de la petición); None = solo timeouts por paso
+
+        Returns:
+            PlanResult con salidas en orden del plan y tiempos por paso
+        """
+        steps = self.tools_for(plan)
+        start = time.perf_counter()
+
+        if len(steps) <= 1 and budget is None:
+            # Un solo paso: ejecutar en el hilo actual (sin timeout, no hay nada que paralelizar)
+            results = [self._run_step(step, run_tool) for step in steps]
+        else:
+            futures = [self._pool.submit(self._run_step, step, run_tool) for step in steps]
+            results = []
+            for step, future in zip(steps, futures):
+                # Todos arrancan a la vez: el plazo de cada paso se cuenta desde start
+                timeout = self.timeout_for(step["tool"])
+                if budget is not None:
+                    timeout = min(timeout, budget)
+                try:
+                    results.append(future.result(timeout=max(0.0, start + timeout - time.perf_counter())))
+                except FutureTimeout:
+                    # El hilo sigue en segundo plano; su resultado se descarta
+                    future.cancel()
+                    logger.warning("⏱️ Paso %s (%s) superó %.2fs", step["action"], step["tool"], timeout)
+                    results.append((None, {"action": step["action"], "tool": step["tool"],
+                                           "status": "timeout", "ms": round(timeout * 1000, 1)}))
+
+        elapsed = time.perf_counter() - start
+        outputs = [output for output, _ in results if output]
+        timings = [timing for _, timing in results]
+        self._record(timings)
+
+        if steps:
+            logger.info("⚙️ Plan ejecutado: %s en %.1fms",
+                        ", ".join(f"{t['tool']}={t['status']}" for t in timings), elapsed * 1000)
+        return PlanResult(outputs, timings, elapsed)
+
+    def _run_step(self, step: Dict[str, str], run_tool: Callable[[str], str]):
+        start = time.perf_counter()
+        try:
+            output, status = run_tool(step["tool"]), "ok"
+        except Exception as e:
+            logger.error("❌ Error en paso %s (%s): %s", step["action"], step["tool"], e)
+            output, status = None, "error"
+        elapsed = time.perf_counter() - start
+        return output, {"action": step["action"], "tool": step["tool"],
+                        "status": status, "ms": round(elapsed * 1000, 1)}
+
+    def _record(self, timings: List[Dict[str, Any]]):
+        with self._lock:
+            self.plans += 1
+            for timing in timings:
+                self.steps += 1
+                if timing["status"] == "timeout":
+                    # Su duración real se desconoce; no entra en el promedio
+                    self.timeouts += 1
+                    continue
+                if timing["status"] == "error":
+                    self.errors += 1
+                entry = self._tool_times.setdefault(timing["tool"], [0, 0.0])
+                entry[0] += 1
+                entry[1] += timing["ms"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de ejecución de planes"""
+        with self._lock:
+            return {
+                "plans": self.plans,
+                "steps": self.steps,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "avg_step_ms": {tool: round(total / count, 2)
+                                for tool, (count, total) in self._tool_times.items()}
+            }
+
+    def shutdown(self):
+        """Liberar hilos del ejecutor"""
+        self._pool.shutdown(wait=False)
@@ -4,22 +4,59 @@ Implementa esquemas de planificación
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
 logger = logging.getLogger(__name__)
 
+
+class TaskPlan:
+    """
+    Plan de una petición
+    Cada mensaje recibe su propio plan: peticiones concurrentes no comparten pasos
+    """
+
+    __slots__ = ("steps",)
+
+    def __init__(self, steps: Optional[List[Dict[str, Any]]] = None):
+        self.steps = steps if steps is not None else []
+
+    def add(self, step: Dict[str, Any]):
+        """Agregar un paso al plan"""
+        self.steps.append(step)
+
+    def next_step(self) -> Optional[Dict[str, Any]]:
+        """
+        Obtener y quitar el siguiente paso
+
+        Returns:
+            Siguiente paso o None si no hay más pasos
+        """
+        if self.steps:
+            return self.steps.pop(0)
+        return None
+
+    def clear(self):
+        """Limpiar el plan"""
+        self.steps = []
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.steps)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+
 class TaskPlanner:
     """
     Planificador de tareas jerárquico
-    Descompone objetivos en tareas ejecutables
+    Descompone objetivos en tareas ejecutables; no guarda estado entre peticiones
     """
     
     def __init__(self):
         """Inicializar planificador"""
-        self.task_steps = []
         logger.info("📋 Planificador de tareas inicializado")
     
-    def plan_conversation(self, user_message: str, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def plan_conversation(self, user_message: str, context: Dict[str, Any]) -> TaskPlan:
         """
         Planificar respuesta basado en mensaje y contexto
         
@@ -28,7 +65,7 @@ class TaskPlanner:
             context: Contexto de la conversación
             
         Returns:
-            Lista de pasos planificados
+            Plan con los pasos de esta petición
         """
         steps = []
         message_lower = user_message.lower()
@@ -49,7 +86,8 @@ class TaskPlanner:
                     "description": "Preguntar nombre del usuario"
                 })
         
-        elif any(word in message_lower for word in ["producto", "cupcake", "torta", "pastel", "galleta"]):
+        # Temas independientes: un mensaje puede combinar varios ("precio de la torta y horario")
+        if any(word in message_lower for word in ["producto", "cupcake", "torta", "pastel", "galleta"]):
             steps.append({
                 "action": "search_product",
                 "priority": 1,
@@ -61,7 +99,7 @@ class TaskPlanner:
                 "description": "Ofrecer recomendaciones relacionadas"
             })
         
-        elif any(word in message_lower for word in ["precio", "cuesta", "valor", "cuánto"]):
+        if any(word in message_lower for word in ["precio", "cuesta", "valor", "cuánto"]):
             steps.append({
                 "action": "provide_price",
                 "priority": 1,
@@ -73,7 +111,7 @@ class TaskPlanner:
                 "description": "Ofrecer alternativas si es necesario"
             })
         
-        elif any(word in message_lower for word in ["pedido", "orden", "comprar", "quiero"]):
+        if any(word in message_lower for word in ["pedido", "orden", "comprar", "quiero"]):
             steps.append({
                 "action": "process_order",
                 "priority": 1,
@@ -85,21 +123,21 @@ class TaskPlanner:
                 "description": "Confirmar información de contacto"
             })
         
-        elif any(word in message_lower for word in ["horario", "abierto", "tiempo"]):
+        if any(word in message_lower for word in ["horario", "abierto", "tiempo"]):
             steps.append({
                 "action": "provide_hours",
                 "priority": 1,
                 "description": "Proporcionar horarios de atención"
             })
         
-        elif any(word in message_lower for word in ["contacto", "teléfono", "dirección"]):
+        if any(word in message_lower for word in ["contacto", "teléfono", "dirección"]):
             steps.append({
                 "action": "provide_contact",
                 "priority": 1,
                 "description": "Proporcionar información de contacto"
             })
         
-        else:
+        if not steps:
             # Consulta genérica
             steps.append({
                 "action": "general_response",
@@ -115,26 +153,6 @@ class TaskPlanner:
                 "description": f"Personalizar respuesta para {context.get('name')}"
             })
         
-        logger.info(f"📋 Plan generado: {len(steps)} pasos")
-        self.task_steps = steps
+        logger.info("📋 Plan generado: %d pasos", len(steps))
         
-        return steps
-    
-    def get_next_step(self) -> Optional[Dict[str, Any]]:
-        """
-        Obtener siguiente paso planificado
-        
-        Returns:
-            Siguiente paso o None si no hay más pasos
-        """
-        if self.task_steps:
-            return self.task_steps.pop(0)
-        return None
-    
-    def clear_plan(self):
-        """Limpiar plan actual"""
-        self.task_steps = []
-        logger.debug("🗑️ Plan limpiado")
-
-
-
+        return TaskPlan(steps)
@@ -1,8 +1,12 @@
 # Módulo de herramientas del agente
 from .product_tools import ProductTools
 from .business_tools import BusinessTools
+from .registry import ToolSpec, ToolRegistry, build_tool_registry
+from .catalog_search import CatalogSearchIndex
+from .order_tools import OrderParser, OrderTools
 
-__all__ = ['ProductTools', 'BusinessTools']
+__all__ = ['ProductTools', 'BusinessTools', 'ToolSpec', 'ToolRegistry', 'build_tool_registry',
+           'CatalogSearchIndex', 'OrderParser', 'OrderTools']
 
 
 
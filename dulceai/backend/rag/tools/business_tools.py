@@ -49,6 +49,21 @@ class BusinessTools:
         logger.debug("📞 Información de contacto consultada")
         return contact
     
+    def get_order_instructions(self) -> str:
+        """
+        Cómo hacer un pedido (sin registrarlo)
+        
+        Returns:
+            String con los canales para pedir
+        """
+        info = self.config.BUSINESS_INFO
+        return f"""Para hacer tu pedido:
+
+📞 Llámanos o escríbenos por WhatsApp al {info['phone']}
+📧 O envíanos un correo a {info['email']}
+
+Te confirmamos disponibilidad, precio final y entrega."""
+    
     def get_full_business_info(self) -> Dict[str, Any]:
         """
         Obtener toda la información del negocio
@@ -0,0 +1,249 @@
+"""
+Búsqueda facetada del catálogo
+Facetas precalculadas como bitsets (enteros de Python) y precios ordenados para búsqueda por rangos
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .fuzzy_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def _bits_from(positions: Iterable[int], size: int) -> int:
+    """Bitset a partir de posiciones en O(n): se arma en un bytearray y se convierte una sola vez"""
+    buffer = bytearray((size + 7) // 8)
+    for i in positions:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _iter_bits(bits: int) -> Iterable[int]:
+    """Posiciones de los bits encendidos, de menor a mayor"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class CatalogSearchIndex:
+    """
+    Índice del catálogo para filtros combinables
+    Cada valor de faceta es un bitset con un bit por producto; combinar filtros es un AND de enteros
+    """
+
+    # Alérgeno -> tokens que lo delatan en el texto de "allergens" ("puede contener" cuenta como contiene)
+    ALLERGEN_TOKENS = {
+        "gluten": {"gluten", "trigo"},
+        "nueces": {"nueces", "nuez", "almendras", "almendra", "mani", "avellanas", "pistachos"},
+        "lacteos": {"lacteos", "lacteo", "leche", "lactosa"},
+        "huevos": {"huevos", "huevo"},
+    }
+
+    # Alias aceptados en el filtro "without"
+    ALLERGEN_ALIASES = {
+        "gluten": "gluten",
+        "nueces": "nueces", "nuts": "nueces", "frutos secos": "nueces",
+        "lacteos": "lacteos", "lactosa": "lacteos", "lactose": "lacteos", "dairy": "lacteos",
+        "huevos": "huevos", "huevo": "huevos", "eggs": "huevos",
+    }
+
+    # Número de bitsets acumulados de precio (memoria ~ PRICE_BLOCKS * productos / 8 bytes)
+    PRICE_BLOCKS = 256
+
+    def __init__(self, products: Dict[str, Dict[str, Any]], price_bands: Sequence[int] = (15000, 25000)):
+        """
+        Args:
+            products: Catálogo (AIConfig.PRODUCTS)
+            price_bands: Límites de los rangos de precio para la faceta de precio
+        """
+        self.keys: List[str] = list(products)
+        self.products = [dict(products[key], key=key) for key in self.keys]
+        self.all_bits = (1 << len(self.keys)) - 1
+        self.price_bands = list(price_bands)
+
+        # Primero listas de posiciones y después un bitset por valor (OR repetidos sobre
+        # enteros grandes serían cuadráticos en catálogos grandes)
+        size = len(self.products)
+        categories: Dict[str, List[int]] = {}
+        allergens: Dict[str, List[int]] = {name: [] for name in self.ALLERGEN_TOKENS}
+        postings: Dict[str, List[int]] = {}
+
+        for i, product in enumerate(self.products):
+            category = product.get("category", "")
+            categories.setdefault(category, []).append(i)
+
+            allergen_tokens = set(tokenize(product.get("allergens", "")))
+            for name, tokens in self.ALLERGEN_TOKENS.items():
+                if allergen_tokens & tokens:
+                    allergens[name].append(i)
+
+            text = " ".join([product.get("name", ""), category, product.get("description", ""),
+                             " ".join(product.get("keywords", []))])
+            for token in set(tokenize(text)):
+                postings.setdefault(token, []).append(i)
+
+        self.category_bits: Dict[str, int] = {name: _bits_from(idx, size) for name, idx in categories.items()}
+        self.allergen_bits: Dict[str, int] = {name: _bits_from(idx, size) for name, idx in allergens.items()}
+
+        # Vocabulario ordenado: un prefijo ("tort") es un rango contiguo encontrado con bisect
+        self._vocab = sorted(postings)
+        self._vocab_bits = [_bits_from(postings[token], size) for token in self._vocab]
+
+        # Precios ordenados con la posición del producto
+        order = sorted(range(len(self.products)), key=lambda i: (self.products[i].get("price", 0), i))
+        self._prices = [self.products[i].get("price", 0) for i in order]
+        self._price_order = order
+        self._price_rank = {i: rank for rank, i in enumerate(order)}
+        # Bitsets acumulados cada _price_step precios: un rango es la resta de dos prefijos
+        # más los bordes, sin recorrer todos los productos del rango
+        self._price_step = max(64, -(-size // self.PRICE_BLOCKS))
+        self._price_prefix = []
+        buffer = bytearray((size + 7) // 8)
+        for rank, i in enumerate(order):
+            if rank % self._price_step == 0:
+                self._price_prefix.append(int.from_bytes(buffer, "little"))
+            buffer[i >> 3] |= 1 << (i & 7)
+        if size % self._price_step == 0:
+            self._price_prefix.append(int.from_bytes(buffer, "little"))
+
+        # Bitsets de cada rango de la faceta de precio
+        bounds = [None] + self.price_bands + [None]
+        self.price_band_bits: Dict[str, int] = {}
+        for low, high in zip(bounds, bounds[1:]):
+            label = f"<{high}" if low is None else f">={low}" if high is None else f"{low}-{high}"
+            lo = 0 if low is None else bisect_left(self._prices, low)
+            hi = len(self._prices) if high is None else bisect_left(self._prices, high)
+            self.price_band_bits[label] = _bits_from(order[lo:hi], size)
+
+        logger.info("🗂️ Índice de catálogo: %d productos, %d categorías, %d términos",
+                    len(self.products), len(self.category_bits), len(self._vocab))
+
+    # ------------------------------------------------------------------
+    # Filtros
+    # ------------------------------------------------------------------
+
+    def _text_bits(self, query: str) -> int:
+        """AND de los términos de la consulta; cada término acepta cualquier palabra con ese prefijo"""
+        bits = self.all_bits
+        for token in tokenize(query):
+            lo = bisect_left(self._vocab, token)
+            hi = bisect_left(self._vocab, token + "￿", lo)
+            matched = 0
+            for j in range(lo, hi):
+                matched |= self._vocab_bits[j]
+            bits &= matched
+            if not bits:
+                break
+        return bits
+
+    def _price_bits(self, min_price: Optional[float], max_price: Optional[float]) -> int:
+        """Productos con precio en [min_price, max_price] vía bisect sobre precios ordenados"""
+        lo = 0 if min_price is None else bisect_left(self._prices, min_price)
+        hi = len(self._prices) if max_price is None else bisect_right(self._prices, max_price)
+        if hi - lo == len(self._prices):
+            return self.all_bits
+        return self._prefix_bits(hi) & ~self._prefix_bits(lo)
+
+    def _prefix_bits(self, end: int) -> int:
+        """Bitset de los `end` productos más baratos"""
+        block, rest = divmod(end, self._price_step)
+        bits = self._price_prefix[block]
+        if rest:
+            start = block * self._price_step
+            bits |= _bits_from(self._price_order[start:end], len(self.products))
+        return bits
+
+    def normalize_allergens(self, without: Iterable[str]) -> List[str]:
+        """Mapear alias ("nuts", "lactosa") a los alérgenos del índice; los desconocidos se ignoran"""
+        names = []
+        for value in without:
+            name = self.ALLERGEN_ALIASES.get(" ".join(tokenize(value)))
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+
+    def search(self, query: str = "", category: Optional[str] = None,
+               min_price: Optional[float] = None, max_price: Optional[float] = None,
+               without: Iterable[str] = (), sort: str = "default",
+               page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+        """
+        Buscar productos con filtros combinados
+
+        Args:
+            query: Texto libre (prefijos de palabras de nombre, descripción y keywords)
+            category: Categoría exacta
+            min_price: Precio mínimo
+            max_price: Precio máximo
+            without: Alérgenos a excluir ("gluten", "nueces"/"nuts", "lactosa", "huevos")
+            sort: default (orden del catálogo), price_asc, price_desc o name
+            page: Página (desde 1)
+            page_size: Resultados por página
+
+        Returns:
+            Diccionario con resultados de la página, total y conteos por faceta
+        """
+        base = self.all_bits
+        if query.strip():
+            base &= self._text_bits(query)
+        if min_price is not None or max_price is not None:
+            base &= self._price_bits(min_price, max_price)
+        allergens = self.normalize_allergens(without)
+        for name in allergens:
+            base &= ~self.allergen_bits[name]
+
+        # La faceta de categoría se cuenta sin el filtro de categoría (para ofrecer alternativas)
+        result = base & self.category_bits.get(category, 0) if category else base
+        total = _popcount(result)
+
+        page = max(1, page)
+        page_size = max(1, min(page_size, 100))
+        start = (page - 1) * page_size
+        positions = self._sorted_positions(result, sort, start + page_size)
+
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "pages": (total + page_size - 1) // page_size,
+            "results": [self._public(self.products[i]) for i in positions[start:start + page_size]],
+            "filters": {"q": query, "category": category, "min_price": min_price,
+                        "max_price": max_price, "without": allergens, "sort": sort},
+            "facets": {
+                "category": {name: count for name, count in
+                             ((name, _popcount(base & bits)) for name, bits in self.category_bits.items())
+                             if count},
+                "price": {label: _popcount(result & bits) for label, bits in self.price_band_bits.items()},
+                "allergen_free": {name: _popcount(result & ~bits) for name, bits in self.allergen_bits.items()}
+            }
+        }
+
+    def _sorted_positions(self, bits: int, sort: str, needed: int) -> List[int]:
+        """Las primeras `needed` posiciones del resultado en el orden pedido"""
+        if sort in ("price_asc", "price_desc"):
+            return sorted(_iter_bits(bits), key=self._price_rank.__getitem__,
+                          reverse=sort == "price_desc")[:needed]
+        if sort == "name":
+            return sorted(_iter_bits(bits), key=lambda i: self.products[i].get("name", ""))[:needed]
+
+        positions = []
+        for i in _iter_bits(bits):
+            positions.append(i)
+            if len(positions) >= needed:
+                break
+        return positions
+
+    @staticmethod
+    def _public(product: Dict[str, Any]) -> Dict[str, Any]:
+        fields = ("key", "name", "price", "category", "description", "size", "allergens", "customization")
+        return {field: product[field] for field in fields if field in product}
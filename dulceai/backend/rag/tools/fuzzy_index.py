@@ -0,0 +1,218 @@
+"""
+Índice de productos tolerante a errores de escritura
+BK-tree sobre tokens normalizados de nombres, keywords y categorías
+"""
+
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Palabras sin valor para identificar un producto
+STOPWORDS = frozenset({
+    "de", "del", "la", "las", "el", "los", "y", "con", "un", "una", "unos", "unas", "para",
+    "por", "en", "que", "me", "tienen", "tiene", "hay", "quiero", "busco", "precio", "cuanto"
+})
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin tildes y solo caracteres alfanuméricos"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados sin stopwords"""
+    return [t for t in normalize(text).split() if t not in STOPWORDS]
+
+
+def levenshtein(a: str, b: str) -> int:
+    """
+    Distancia de Levenshtein con el algoritmo bit-paralelo de Myers/Hyyrö
+    Una columna de la matriz por carácter de b, usando enteros como vectores de bits
+    """
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    peq: Dict[str, int] = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    m = len(a)
+    full = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+    return score
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Distancia de Levenshtein acotada
+    (métrica verdadera: necesaria para podar el BK-tree sin perder resultados)
+
+    Returns:
+        La distancia, o limit + 1 si la supera
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    return min(levenshtein(a, b), limit + 1)
+
+
+class BKTree:
+    """
+    Árbol BK para búsqueda por distancia de edición
+    La desigualdad triangular permite descartar subárboles completos
+    """
+
+    # Límite de distancia guardado entre nodos (cota superior de la métrica en la inserción)
+    _MAX_DISTANCE = 64
+
+    def __init__(self, words: Iterable[str] = ()):
+        # Nodo: [palabra, {distancia: hijo}]
+        self._root: Optional[list] = None
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        """Insertar palabra (las repetidas se ignoran)"""
+        if self._root is None:
+            self._root = [word, {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            distance = edit_distance(word, node[0], self._MAX_DISTANCE)
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [word, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, word: str, max_distance: int) -> Tuple[List[Tuple[int, str]], int]:
+        """
+        Palabras a distancia <= max_distance
+
+        Returns:
+            ([(distancia, palabra)] ordenadas, nodos visitados)
+        """
+        if self._root is None:
+            return [], 0
+        results, visited = [], 0
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            visited += 1
+            # Solo hace falta la distancia exacta hasta la arista más larga + tolerancia;
+            # por encima de eso ningún hijo puede estar dentro del rango
+            children = node[1]
+            limit = (max(children) if children else 0) + max_distance
+            distance = edit_distance(word, node[0], limit)
+            if distance <= max_distance:
+                results.append((distance, node[0]))
+            if distance > limit:
+                continue
+            low, high = distance - max_distance, distance + max_distance
+            for edge, child in children.items():
+                if low <= edge <= high:
+                    stack.append(child)
+        results.sort()
+        return results, visited
+
+
+class FuzzyProductIndex:
+    """
+    Índice difuso del catálogo
+    Cada token apunta a los productos que lo contienen con un peso según el campo
+    """
+
+    FIELD_WEIGHTS = {"name": 1.0, "keywords": 0.9, "key": 0.8, "category": 0.6}
+
+    def __init__(self, products: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            products: Catálogo (AIConfig.PRODUCTS)
+        """
+        self.products = products
+        # token -> {clave de producto: peso}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        for key, product in products.items():
+            fields = {
+                "name": [product.get("name", "")],
+                "keywords": product.get("keywords", []),
+                "key": [key.replace("_", " ")],
+                "category": [product.get("category", "")],
+            }
+            for field, values in fields.items():
+                weight = self.FIELD_WEIGHTS[field]
+                for value in values:
+                    for token in tokenize(value):
+                        postings = self._postings.setdefault(token, {})
+                        postings[key] = max(postings.get(key, 0.0), weight)
+        self.tree = BKTree(self._postings)
+        logger.info("🔎 Índice difuso: %d productos, %d tokens", len(products), self.tree.size)
+
+    @staticmethod
+    def max_distance_for(token: str) -> int:
+        """Errores tolerados según la longitud del token"""
+        if len(token) <= 3:
+            return 0
+        if len(token) <= 5:
+            return 1
+        return 2
+
+    def search(self, query: str, limit: int = 3, min_score: float = 0.5) -> List[Tuple[str, float]]:
+        """
+        Productos candidatos ordenados por puntaje
+
+        Args:
+            query: Texto libre del cliente
+            limit: Máximo de candidatos
+            min_score: Puntaje mínimo (1.0 = todos los tokens coinciden exactamente en el nombre)
+
+        Returns:
+            Lista de (clave de producto, puntaje)
+        """
+        tokens = [t for t in tokenize(query) if len(t) >= 3]
+        scores: Dict[str, float] = {}
+        matched_tokens = 0
+        for token in tokens:
+            matches, _ = self.tree.search(token, self.max_distance_for(token))
+            if not matches:
+                continue
+            matched_tokens += 1
+            best: Dict[str, float] = {}
+            for distance, word in matches:
+                similarity = 1.0 - distance / (len(token) + 1)
+                for key, weight in self._postings[word].items():
+                    best[key] = max(best.get(key, 0.0), weight * similarity)
+            for key, value in best.items():
+                scores[key] = scores.get(key, 0.0) + value
+
+        if not matched_tokens:
+            return []
+        ranked = sorted(((key, round(score / matched_tokens, 4)) for key, score in scores.items()),
+                        key=lambda item: (-item[1], item[0]))
+        return [item for item in ranked if item[1] >= min_score][:limit]
@@ -0,0 +1,233 @@
+"""
+Captura de pedidos desde el chat
+Interpreta productos y cantidades del mensaje contra el catálogo y los registra en el OrderStore
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..memory.order_store import OrderQueueFull, OrderStore
+from .business_tools import BusinessTools
+from .fuzzy_index import normalize
+from .product_tools import ProductTools
+
+logger = logging.getLogger(__name__)
+
+
+class OrderParser:
+    """
+    Líneas de pedido a partir de texto libre
+    "quiero 2 tortas de chocolate y media docena de brownies" ->
+    [(torta_chocolate, 2), (brownies, 6)]
+    """
+
+    NUMBER_WORDS = {
+        "un": 1, "una": 1, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6,
+        "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "once": 11, "doce": 12, "veinte": 20,
+        "media docena": 6, "docena": 12
+    }
+    # Separadores entre productos (no parte "tres leches" ni "red velvet")
+    SEGMENT_PATTERN = re.compile(r"[,;+\n]|\s+y\s+|\s+e\s+|\s+m[aá]s\s+|\s+tambi[eé]n\s+", re.IGNORECASE)
+    # Una cantidad seguida de "personas", "pm", etc. no es una cantidad del pedido ("tres leches" tampoco)
+    QUANTITY_PATTERN = re.compile(
+        r"\b(\d{1,3}|media docena|" + "|".join(sorted((w for w in NUMBER_WORDS if " " not in w), key=len, reverse=True))
+        + r")\b(?!\s*(?:personas|persona|pm|am|horas|hora|minutos|dias|mil|%|leches))")
+    # Palabras del pedido que no describen el producto (bajan el puntaje del índice difuso)
+    FILLER_PATTERN = re.compile(r"\b(quiero|quisiera|pedir|pido|pedido|necesito|comprar|ordenar|encargar|"
+                                r"me|das|da|dame|regalas|por favor|porfa|unidades?|paquetes?|cajas?)\b")
+    MAX_QUANTITY = 50
+
+    def __init__(self, product_tools: ProductTools):
+        self.product_tools = product_tools
+
+    def parse(self, message: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Interpretar un pedido
+
+        Args:
+            message: Mensaje del cliente
+
+        Returns:
+            (líneas con product_key, name, quantity, unit_price; fragmentos con producto ambiguo)
+        """
+        lines: Dict[str, Dict[str, Any]] = {}
+        ambiguous: List[str] = []
+        for segment in self.SEGMENT_PATTERN.split(message):
+            segment = normalize(segment)
+            if not segment:
+                continue
+            product_text = self.FILLER_PATTERN.sub(" ", self.QUANTITY_PATTERN.sub(" ", segment))
+            candidates = self.product_tools.fuzzy_match(product_text, limit=2)
+            if not candidates:
+                continue
+            if len(candidates) > 1 and candidates[1][1] >= candidates[0][1]:
+                ambiguous.append(segment)
+                continue
+            key = candidates[0][0]
+            product = self.product_tools.config.PRODUCTS[key]
+            quantity = self._quantity(segment)
+            line = lines.setdefault(key, {"product_key": key, "name": product["name"],
+                                          "quantity": 0, "unit_price": product["price"]})
+            line["quantity"] = min(self.MAX_QUANTITY, line["quantity"] + quantity)
+        return list(lines.values()), ambiguous
+
+    def _quantity(self, segment: str) -> int:
+        match = self.QUANTITY_PATTERN.search(segment)
+        if match is None:
+            return 1
+        value = match.group(1)
+        quantity = int(value) if value.isdigit() else self.NUMBER_WORDS[value]
+        return max(1, min(self.MAX_QUANTITY, quantity))
+
+    def has_quantity(self, message: str) -> bool:
+        """¿El mensaje dice cuántos? ("2 tortas", "media docena"; "la torta" no)"""
+        return self.QUANTITY_PATTERN.search(normalize(message)) is not None
+
+
+class OrderTools:
+    """
+    Pedidos desde el chat en dos tiempos
+    - prepare(): decide si el mensaje es un pedido y arma la propuesta, sin escribir nada
+    - El agente registra el pedido con commit() solo cuando el turno ya no se puede cancelar
+    Solo se registra un pedido explícito ("quiero pedir 2 brownies") o uno confirmado en el turno
+    siguiente; preguntas ("¿hacen pedidos de brownies?") y negaciones no registran nada
+    """
+
+    # Verbos de pedido; "pedido"/"pedidos" como sustantivo no cuentan
+    ORDER_PATTERN = re.compile(r"\b(quiero|quisiera|deseo|necesito|dame|deme|regalame|pedir|pido|ordenar|ordeno|"
+                               r"encargar|encargo|comprar|compro|llevo|llevar|anotame|apuntame|"
+                               r"me (?:das|da|regalas|envias|mandas|vendes))\b")
+    # Pedir sin decir qué: solo estos verbos (o un producto ambiguo) piden completar el pedido;
+    # "quiero hablar con alguien" o "necesito 2 horas para pensarlo" no son pedidos
+    EXPLICIT_ORDER_PATTERN = re.compile(r"\b(pedir|pido|pedido|encargar|encargo|comprar|compro|ordenar|ordeno)\b")
+    NEGATION_PATTERN = re.compile(r"\b(no|ya no|nunca|tampoco)\s+(me\s+)?"
+                                  r"(quiero|quisiera|deseo|necesito|voy a|pidas|registres|compro)\b|\bcancel")
+    # Consultas: la respuesta es información, no un pedido
+    INFO_PATTERN = re.compile(r"\b(saber|cuanto|cuanta|cuesta|cuestan|precio|precios|valor|hacen|tienen|"
+                              r"venden|manejan|informacion|como|cual|cuales|donde|hay|puedo|pueden|se puede)\b")
+    CONFIRM_PATTERN = re.compile(r"^(si|sii+|dale|confirmo|confirmado|confirmar|correcto|de acuerdo|ok|okay|listo|"
+                                 r"perfecto|hagale|hazlo|asi es|claro)\b")
+    DECLINE_PATTERN = re.compile(r"^(no|nop|cancela|cancelar|mejor no|olvidalo|dejalo)\b")
+
+    def __init__(self, product_tools: ProductTools, business_tools: BusinessTools, store: OrderStore):
+        """
+        Args:
+            product_tools: Catálogo e índice difuso
+            business_tools: Datos de contacto para la confirmación
+            store: Almacén de pedidos (escritura en segundo plano)
+        """
+        self.parser = OrderParser(product_tools)
+        self.business_tools = business_tools
+        self.store = store
+
+    def prepare(self, message: str, session_id: Optional[str] = None,
+                pending: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Interpretar el mensaje como pedido (sin registrarlo)
+
+        Args:
+            message: Mensaje del cliente
+            session_id: Sesión del cliente
+            pending: Propuesta del turno anterior que espera confirmación (UserContext.pending_order)
+
+        Returns:
+            None si el mensaje no es un pedido; si no, {"status", "text", ...}:
+            - "ready": pedido a registrar (con "order" ya armado y su número)
+            - "confirm": propuesta a confirmar en el turno siguiente (con "pending")
+            - "declined": el cliente rechazó la propuesta pendiente
+            - "incomplete": pedido explícito ("quiero hacer un pedido") o con producto ambiguo,
+              sin productos reconocibles
+        """
+        text = normalize(message)
+        if pending is not None:
+            if self.CONFIRM_PATTERN.match(text):
+                return self._ready(pending["items"], session_id, pending.get("message", message), [])
+            if self.DECLINE_PATTERN.match(text):
+                return {"status": "declined", "text": "Entendido, no registré el pedido."}
+
+        if self.NEGATION_PATTERN.search(text) or not self.ORDER_PATTERN.search(text):
+            return None
+        items, ambiguous = self.parser.parse(message)
+        asks_info = "?" in message or "¿" in message or self.INFO_PATTERN.search(text) is not None
+        if not items:
+            if asks_info or not (ambiguous or self.EXPLICIT_ORDER_PATTERN.search(text)):
+                return None
+            hint = ("¿Cuál de nuestras opciones te gustaría? Dime el producto exacto y la cantidad."
+                    if ambiguous else "Dime qué productos y cuántos quieres para registrar tu pedido.")
+            return {"status": "incomplete",
+                    "text": f"{hint}\n\n{self.business_tools.get_order_instructions()}"}
+
+        has_quantity = self.parser.has_quantity(message)
+        if asks_info and not has_quantity:
+            # "quiero saber cuánto cuesta la torta": la respuesta es el precio
+            return None
+        if has_quantity and not asks_info:
+            return self._ready(items, session_id, message, ambiguous)
+        pending = {"items": items, "message": message}
+        return {"status": "confirm", "pending": pending, "text": self.format_proposal(items, ambiguous)}
+
+    def _ready(self, items: List[Dict[str, Any]], session_id: Optional[str], message: str,
+               ambiguous: List[str]) -> Dict[str, Any]:
+        order = self.store.new_order(items, session_id=session_id, message=message)
+        return {"status": "ready", "order": order, "text": self.format_confirmation(order, ambiguous)}
+
+    def commit(self, order: Dict[str, Any]) -> bool:
+        """
+        Registrar un pedido listo (después de guardar el turno)
+
+        Returns:
+            True si quedó encolado; False si la cola de escritura está llena
+        """
+        try:
+            self.store.submit(order)
+        except OrderQueueFull:
+            logger.error("❌ Cola de pedidos llena: pedido %s no registrado", order["id"])
+            return False
+        logger.info("🧾 Pedido %s registrado (%d líneas, $%s)", order["id"], len(order["items"]),
+                    f"{order['total']:,}")
+        return True
+
+    def cancel(self, order: Dict[str, Any]):
+        """Anular un pedido registrado cuyo turno no se pudo guardar"""
+        self.store.cancel(order["id"])
+        logger.warning("🧾 Pedido %s cancelado: el turno no se guardó", order["id"])
+
+    def unavailable_text(self) -> str:
+        """Respuesta cuando el pedido no se pudo registrar"""
+        return ("No pude registrar el pedido en este momento. "
+                f"Llámanos al {self.business_tools.config.BUSINESS_INFO['phone']} y lo tomamos enseguida.\n\n"
+                f"{self.business_tools.get_order_instructions()}")
+
+    def describe(self, message: str, info: Dict[str, Any]) -> str:
+        """
+        Herramienta ProcesarPedido: texto del pedido que el agente ya preparó en info["order_step"]
+        (solo lectura: se puede descartar por timeout sin efectos)
+        """
+        step = info.get("order_step")
+        if step is not None:
+            return step["text"]
+        return self.business_tools.get_order_instructions()
+
+    def format_proposal(self, items: List[Dict[str, Any]], ambiguous: Optional[List[str]] = None) -> str:
+        """Propuesta de pedido a confirmar en el turno siguiente"""
+        lines = [f"- {item['quantity']} x {item['name']}: ${item['quantity'] * item['unit_price']:,}"
+                 for item in items]
+        total = sum(item["quantity"] * item["unit_price"] for item in items)
+        proposal = ("Antes de registrarlo, ¿confirmas este pedido?\n" + "\n".join(lines) +
+                    f"\nTotal: ${total:,}")
+        if ambiguous:
+            proposal += "\n\nNo identifiqué: " + ", ".join(ambiguous) + "."
+        return proposal + "\n\nResponde «sí» para registrarlo o dime qué cambiar."
+
+    def format_confirmation(self, order: Dict[str, Any], ambiguous: Optional[List[str]] = None) -> str:
+        """Confirmación del pedido con sus líneas y total"""
+        lines = [f"- {item['quantity']} x {item['name']}: ${item['quantity'] * item['unit_price']:,}"
+                 for item in order["items"]]
+        confirmation = (f"✅ Pedido {order['id']} registrado:\n" + "\n".join(lines) +
+                        f"\nTotal: ${order['total']:,}")
+        if ambiguous:
+            confirmation += "\n\nNo identifiqué: " + ", ".join(ambiguous) + ". Dime el producto exacto para agregarlo."
+        confirmation += ("\n\nTe contactaremos pronto para confirmar entrega y pago.\n"
+                         f"Información de contacto: {self.business_tools.config.BUSINESS_INFO['phone']}")
+        return confirmation
@@ -4,7 +4,10 @@ Implementa herramientas de consulta
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+from .fuzzy_index import FuzzyProductIndex
+from .recommender import ItemItemRecommender, NUMPY_AVAILABLE
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +22,18 @@ class ProductTools:
             config: Objeto de configuración con catálogo de productos
         """
         self.config = config
+        # Índice tolerante a errores de escritura ("chesecake", "tres lechez")
+        self.fuzzy_index = FuzzyProductIndex(config.PRODUCTS)
+        # Recomendador ítem-ítem (requiere numpy; sin él se recomienda por categoría)
+        self.recommender: Optional[ItemItemRecommender] = None
+        if NUMPY_AVAILABLE:
+            self.recommender = ItemItemRecommender(
+                config.PRODUCTS,
+                price_bands=config.RECOMMENDER_PRICE_BANDS,
+                cooccurrence_weight=config.RECOMMENDER_COOCCURRENCE_WEIGHT
+            )
+        else:
+            logger.warning("⚠️ numpy no disponible: recomendaciones por categoría")
         logger.info("🛍️ Herramientas de productos inicializadas")
     
     def search_product(self, query: str) -> Dict[str, Any]:
@@ -53,40 +68,76 @@ class ProductTools:
                     result = product
                     break
         
+        # Último recurso: coincidencia aproximada
+        fuzzy = False
+        if not result:
+            candidates = self.fuzzy_match(query)
+            if candidates:
+                result = self.config.PRODUCTS[candidates[0][0]]
+                fuzzy = True
+        
         if result:
-            logger.info(f"✅ Producto encontrado: {result['name']}")
-            
-            # Construir mensaje detallado con toda la información experta
-            message_parts = [
-                f"🍰 {result['name']}",
-                f"💰 Precio: ${result['price']:,}",
-                f"📝 {result['description']}"
-            ]
-            
-            # Agregar información adicional si está disponible
-            if 'size' in result:
-                message_parts.append(f"📏 Tamaño: {result['size']}")
-            if 'ingredients' in result:
-                message_parts.append(f"🥄 Ingredientes: {result['ingredients']}")
-            if 'allergens' in result:
-                message_parts.append(f"⚠️ Alérgenos: {result['allergens']}")
-            if 'storage' in result:
-                message_parts.append(f"❄️ Conservación: {result['storage']}")
-            if 'customization' in result:
-                message_parts.append(f"✨ Personalización: {result['customization']}")
+            logger.info("✅ Producto encontrado: %s", result['name'])
             
             return {
                 "found": True,
+                "fuzzy": fuzzy,
                 "product": result,
-                "message": "\n".join(message_parts)
+                "message": self.describe(result)
             }
         else:
-            logger.warning(f"❌ Producto no encontrado: {query}")
+            logger.warning("❌ Producto no encontrado: %s", query)
             return {
                 "found": False,
                 "message": f"No encontré un producto específico con '{query}'. ¿Te gustaría ver nuestro catálogo completo? Tenemos tortas, cupcakes, galletas, cheesecakes, pies, donas, muffins, brownies y macarons."
             }
     
+    def describe(self, product: Dict[str, Any]) -> str:
+        """
+        Ficha del producto (precio, descripción, tamaño, ingredientes, alérgenos...)
+        
+        Args:
+            product: Producto del catálogo
+            
+        Returns:
+            Texto con la información del producto
+        """
+        # Construir mensaje detallado con toda la información experta
+        message_parts = [
+            f"🍰 {product['name']}",
+            f"💰 Precio: ${product['price']:,}",
+            f"📝 {product['description']}"
+        ]
+        
+        # Agregar información adicional si está disponible
+        if 'size' in product:
+            message_parts.append(f"📏 Tamaño: {product['size']}")
+        if 'ingredients' in product:
+            message_parts.append(f"🥄 Ingredientes: {product['ingredients']}")
+        if 'allergens' in product:
+            message_parts.append(f"⚠️ Alérgenos: {product['allergens']}")
+        if 'storage' in product:
+            message_parts.append(f"❄️ Conservación: {product['storage']}")
+        if 'customization' in product:
+            message_parts.append(f"✨ Personalización: {product['customization']}")
+        return "\n".join(message_parts)
+    
+    def fuzzy_match(self, query: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """
+        Candidatos aproximados para un texto con errores de escritura
+        
+        Args:
+            query: Texto libre
+            limit: Máximo de candidatos
+            
+        Returns:
+            Lista de (clave de producto, puntaje) ordenada de mayor a menor
+        """
+        candidates = self.fuzzy_index.search(query, limit=limit, min_score=self.config.FUZZY_MIN_SCORE)
+        if candidates:
+            logger.info("🔎 Coincidencia aproximada para '%s': %s", query, candidates[0][0])
+        return candidates
+    
     def list_all_products(self) -> List[Dict[str, Any]]:
         """
         Listar todos los productos disponibles
@@ -98,7 +149,7 @@ class ProductTools:
         for key, product in self.config.PRODUCTS.items():
             products.append(product)
         
-        logger.info(f"📋 Listando {len(products)} productos")
+        logger.info("📋 Listando %d productos", len(products))
         return products
     
     def get_products_by_category(self, category: str) -> List[Dict[str, Any]]:
@@ -116,19 +167,30 @@ class ProductTools:
             if category.lower() in product["category"].lower():
                 products.append(product)
         
-        logger.info(f"🏷️ {len(products)} productos en categoría: {category}")
+        logger.info("🏷️ %d productos en categoría: %s", len(products), category)
         return products
     
-    def recommend_products(self, preferences: List[str]) -> List[Dict[str, Any]]:
+    def recommend_products(self, preferences: List[str], recent_products: Optional[List[str]] = None,
+                           k: int = 3) -> List[Dict[str, Any]]:
         """
         Recomendar productos basado en preferencias
         
         Args:
-            preferences: Lista de preferencias del usuario
+            preferences: Lista de preferencias del usuario (productos mencionados ahora)
+            recent_products: Productos consultados antes, del más reciente al más antiguo
+            k: Número de recomendaciones
             
         Returns:
             Lista de productos recomendados
         """
+        if self.recommender is not None:
+            # Lo mencionado ahora pesa 1.0; lo reciente decae con la antigüedad
+            seeds = [(p, 1.0) for p in preferences]
+            seeds += [(p, 0.8 ** (i + 1)) for i, p in enumerate(recent_products or [])]
+            recs = self.recommender.recommend(seeds, k=k)
+            logger.info("💡 %d recomendaciones generadas", len(recs))
+            return recs
+        
         recommendations = []
         
         for preference in preferences:
@@ -144,8 +206,14 @@ class ProductTools:
                 seen.add(name)
                 unique_recs.append(product)
         
-        logger.info(f"💡 {len(unique_recs)} recomendaciones generadas")
-        return unique_recs[:3]  # Retornar top 3
+        logger.info("💡 %d recomendaciones generadas", len(unique_recs))
+        return unique_recs[:k]  # Retornar top k
+    
+    def refresh_catalog(self):
+        """Reconstruir índices tras modificar config.PRODUCTS (el recomendador es incremental)"""
+        self.fuzzy_index = FuzzyProductIndex(self.config.PRODUCTS)
+        if self.recommender is not None:
+            self.recommender.refresh(self.config.PRODUCTS)
 
 
 
@@ -0,0 +1,278 @@
+"""
+Recomendador ítem-ítem
+Matriz de similitud precalculada a partir de atributos del producto y co-ocurrencia en conversaciones
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .fuzzy_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# NumPy es opcional: sin él ProductTools usa la recomendación por categoría
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+class ItemItemRecommender:
+    """
+    Recomendador ítem-ítem vectorizado
+    Cada producto es un vector de atributos (categoría, ingredientes, alérgenos, rango de precio);
+    la similitud coseno se precalcula una vez y se combina con la co-ocurrencia observada
+    """
+
+    # Peso de cada bloque de atributos en el vector del producto
+    BLOCK_WEIGHTS = {"category": 1.0, "ingredient": 0.6, "allergen": 0.3, "price": 0.5}
+
+    def __init__(self, products: Dict[str, Dict[str, Any]], price_bands: Sequence[int] = (15000, 25000),
+                 cooccurrence_weight: float = 0.3):
+        """
+        Args:
+            products: Catálogo (AIConfig.PRODUCTS)
+            price_bands: Límites de los rangos de precio
+            cooccurrence_weight: Peso de la co-ocurrencia frente a los atributos (0-1)
+        """
+        if not NUMPY_AVAILABLE:
+            raise ImportError("numpy no está instalado")
+
+        self.price_bands = list(price_bands)
+        self.cooccurrence_weight = cooccurrence_weight
+        self._lock = threading.Lock()
+
+        self.keys: List[str] = []
+        self.products: Dict[str, Dict[str, Any]] = {}
+        self._index: Dict[str, int] = {}
+        self._signatures: Dict[str, str] = {}
+        self._vocab: Dict[str, int] = {}
+        self._features = np.zeros((0, 0))
+        self._attribute_sim = np.zeros((0, 0))
+        self._cooccurrence = np.zeros((0, 0))
+        self.similarity = np.zeros((0, 0))
+        # término (keyword, categoría, token del nombre) -> índices de producto
+        self._terms: Dict[str, List[int]] = {}
+
+        self.refresh(products)
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+
+    def _attributes(self, product: Dict[str, Any]) -> List[str]:
+        """Atributos de un producto como lista de 'bloque:valor'"""
+        attrs = ["category:" + product.get("category", "")]
+        attrs += ["ingredient:" + t for t in tokenize(product.get("ingredients", "")) if len(t) > 3]
+        attrs += ["allergen:" + t for t in tokenize(product.get("allergens", ""))
+                  if t in ("gluten", "lacteos", "huevos", "nueces", "frutos", "soya", "mani")]
+        band = sum(1 for limit in self.price_bands if product.get("price", 0) >= limit)
+        attrs.append(f"price:{band}")
+        return attrs
+
+    @staticmethod
+    def _signature(product: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps(product, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _vectorize(self, attrs: List[str]):
+        row = np.zeros(len(self._vocab))
+        for attr in attrs:
+            row[self._vocab[attr]] = self.BLOCK_WEIGHTS[attr.split(":", 1)[0]]
+        norm = np.linalg.norm(row)
+        return row / norm if norm else row
+
+    def refresh(self, products: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Sincronizar con el catálogo recalculando solo lo que cambió
+
+        Si el vocabulario de atributos no cambia, solo se recalculan las filas y columnas de
+        los productos modificados; si aparecen atributos nuevos se reconstruye la matriz
+
+        Returns:
+            Conteo de productos agregados, modificados y eliminados
+        """
+        with self._lock:
+            signatures = {key: self._signature(product) for key, product in products.items()}
+            added = [k for k in products if k not in self._signatures]
+            removed = [k for k in self._signatures if k not in products]
+            changed = [k for k in products if k in self._signatures and signatures[k] != self._signatures[k]]
+            if not (added or removed or changed) and self.keys:
+                return {"added": 0, "changed": 0, "removed": 0}
+
+            attrs = {key: self._attributes(product) for key, product in products.items()}
+            needed = {attr for key in added + changed for attr in attrs[key]}
+
+            if removed or added or any(attr not in self._vocab for attr in needed) or not self.keys:
+                self._rebuild(products, attrs)
+            else:
+                # Actualización incremental: filas/columnas de los productos modificados
+                rows = [self._index[key] for key in changed]
+                for key, row in zip(changed, rows):
+                    self._features[row] = self._vectorize(attrs[key])
+                block = self._features[rows] @ self._features.T
+                self._attribute_sim[rows, :] = block
+                self._attribute_sim[:, rows] = block.T
+                np.fill_diagonal(self._attribute_sim, 0.0)
+                self.products = dict(products)
+                self._build_terms()
+                self._combine()
+
+            self._signatures = signatures
+            logger.info("💡 Recomendador actualizado: +%d ~%d -%d productos", len(added), len(changed), len(removed))
+            return {"added": len(added), "changed": len(changed), "removed": len(removed)}
+
+    def _rebuild(self, products: Dict[str, Dict[str, Any]], attrs: Dict[str, List[str]]):
+        old_keys, old_cooc = self.keys, self._cooccurrence
+        self.products = dict(products)
+        self.keys = list(products)
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        self._vocab = {}
+        for key in self.keys:
+            for attr in attrs[key]:
+                self._vocab.setdefault(attr, len(self._vocab))
+
+        self._features = (np.vstack([self._vectorize(attrs[key]) for key in self.keys]) if self.keys
+                          else np.zeros((0, len(self._vocab)))).astype(np.float32)
+        self._attribute_sim = self._features @ self._features.T
+        np.fill_diagonal(self._attribute_sim, 0.0)
+
+        # Conservar la co-ocurrencia de los productos que siguen en el catálogo
+        self._cooccurrence = np.zeros((len(self.keys), len(self.keys)), dtype=np.float32)
+        kept = [(self._index[k], i) for i, k in enumerate(old_keys) if k in self._index]
+        if kept:
+            new_idx, old_idx = zip(*kept)
+            self._cooccurrence[np.ix_(new_idx, new_idx)] = old_cooc[np.ix_(old_idx, old_idx)]
+
+        self._build_terms()
+        self._combine()
+
+    def _build_terms(self):
+        terms = defaultdict(set)
+        for key in self.keys:
+            product = self.products[key]
+            values = [product.get("name", ""), product.get("category", ""), key.replace("_", " ")]
+            values += product.get("keywords", [])
+            for value in values:
+                for token in tokenize(value):
+                    terms[token].add(self._index[key])
+        self._terms = {term: sorted(indexes) for term, indexes in terms.items()}
+
+    def _combine(self):
+        """Similitud final = atributos mezclados con co-ocurrencia normalizada"""
+        cooc = self._cooccurrence
+        peak = cooc.max() if cooc.size else 0.0
+        if peak > 0:
+            w = self.cooccurrence_weight
+            self.similarity = ((1 - w) * self._attribute_sim + w * (cooc / peak)).astype(np.float32)
+        else:
+            self.similarity = self._attribute_sim.copy()
+
+    # ------------------------------------------------------------------
+    # Co-ocurrencia
+    # ------------------------------------------------------------------
+
+    def resolve(self, terms: Iterable[str]) -> List[int]:
+        """Índices de producto para términos libres ("torta", "cupcake", clave de producto)"""
+        indexes: Dict[int, None] = {}
+        for term in terms:
+            if term in self._index:
+                indexes[self._index[term]] = None
+            else:
+                for token in tokenize(term):
+                    indexes.update(dict.fromkeys(self._terms.get(token, ())))
+        return list(indexes)
+
+    def fit_cooccurrence(self, sessions: Iterable[Iterable[str]]) -> int:
+        """
+        Agregar co-ocurrencias: productos mencionados en una misma conversación
+
+        Args:
+            sessions: Por conversación, términos o claves de producto mencionados
+
+        Returns:
+            Número de conversaciones con al menos dos productos
+        """
+        with self._lock:
+            used = 0
+            for terms in sessions:
+                idx = self.resolve(terms)
+                if len(idx) < 2:
+                    continue
+                used += 1
+                vector = np.zeros(len(self.keys), dtype=np.float32)
+                vector[idx] = 1.0
+                self._cooccurrence += np.outer(vector, vector)
+            np.fill_diagonal(self._cooccurrence, 0.0)
+            self._combine()
+            return used
+
+    def fit_from_chat_log(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """
+        Co-ocurrencia a partir del historial de chat (entradas con user_id y user_message)
+
+        Returns:
+            Número de conversaciones utilizadas
+        """
+        sessions = defaultdict(list)
+        for entry in entries:
+            sessions[entry.get("user_id") or "anonymous"].extend(tokenize(entry.get("user_message", "")))
+        used = self.fit_cooccurrence(sessions.values())
+        logger.info("💡 Co-ocurrencia aprendida de %d conversaciones", used)
+        return used
+
+    # ------------------------------------------------------------------
+    # Recomendación
+    # ------------------------------------------------------------------
+
+    def recommend(self, seeds: Sequence[Tuple[str, float]], k: int = 3,
+                  exclude: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k productos similares a las semillas del usuario
+
+        Args:
+            seeds: (término o clave de producto, peso), p. ej. productos recientes con peso decreciente
+            k: Número de recomendaciones
+            exclude: Términos cuyos productos no deben recomendarse
+
+        Returns:
+            Lista de productos del catálogo ordenada por puntaje
+        """
+        with self._lock:
+            n = len(self.keys)
+            if not n:
+                return []
+            seed_weights: Dict[int, float] = {}
+            for term, weight in seeds:
+                for i in self.resolve([term]):
+                    seed_weights[i] = max(seed_weights.get(i, 0.0), weight)
+            if not seed_weights:
+                return []
+
+            # Una sola operación: suma ponderada de las filas de similitud de las semillas
+            rows = np.fromiter(seed_weights.keys(), dtype=np.intp, count=len(seed_weights))
+            weights = np.fromiter(seed_weights.values(), dtype=self.similarity.dtype, count=len(seed_weights))
+            scores = weights @ self.similarity[rows]
+            scores[rows] = -np.inf
+            for i in self.resolve(exclude or []):
+                scores[i] = -np.inf
+
+            k = min(k, int(np.isfinite(scores).sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [self.products[self.keys[i]] for i in top if scores[i] > 0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "products": len(self.keys),
+                "attributes": len(self._vocab),
+                "cooccurrence_pairs": int((self._cooccurrence > 0).sum() // 2)
+            }
@@ -0,0 +1,267 @@
+"""
+Registro declarativo de herramientas
+Cada herramienta declara nombre, palabras clave, si es pura (cacheable), TTL y timeout
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ToolSpec:
+    """Declaración de una herramienta del agente"""
+
+    __slots__ = ("name", "handler", "keywords", "pure", "ttl", "timeout", "cache_key", "description")
+
+    def __init__(self, name: str, handler: Callable[[str, Dict[str, Any]], str],
+                 keywords: Optional[List[str]] = None, pure: bool = False, ttl: float = 0.0,
+                 timeout: Optional[float] = None,
+                 cache_key: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+                 description: str = ""):
+        """
+        Args:
+            name: Nombre de la herramienta (p. ej. "ConsultarHorario")
+            handler: Función (mensaje, info extraída) -> texto
+            keywords: Palabras que activan la herramienta
+            pure: True si el resultado depende solo de cache_key (se memoiza)
+            ttl: Segundos que se conserva un resultado memoizado
+            timeout: Segundos máximos al ejecutarse como paso de un plan
+            cache_key: Función (mensaje, info) -> clave de memoización
+            description: Descripción corta para el estado del agente
+        """
+        self.name = name
+        self.handler = handler
+        self.keywords = keywords or []
+        self.pure = pure
+        self.ttl = ttl
+        self.timeout = timeout
+        self.cache_key = cache_key or (lambda message, info: None)
+        self.description = description
+
+
+class _ToolStats:
+    __slots__ = ("calls", "cache_hits", "errors", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+
+class ToolRegistry:
+    """
+    Registro de herramientas con despacho por diccionario
+    Memoiza las herramientas puras con TTL y registra llamadas y latencia por herramienta
+    """
+
+    def __init__(self, default_timeout: float = 2.0, cache_size: int = 1024):
+        """
+        Args:
+            default_timeout: Timeout para herramientas que no declaran uno
+            cache_size: Resultados memoizados máximos (LRU)
+        """
+        self.default_timeout = default_timeout
+        self.cache_size = cache_size
+        self._tools: Dict[str, ToolSpec] = {}
+        self._stats: Dict[str, _ToolStats] = {}
+        # (herramienta, clave) -> (expira, resultado)
+        self._cache: "OrderedDict[Tuple[str, Any], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, spec: ToolSpec) -> ToolSpec:
+        """Registrar una herramienta (el orden de registro es la prioridad de las palabras clave)"""
+        self._tools[spec.name] = spec
+        self._stats[spec.name] = _ToolStats()
+        logger.debug("🔧 Herramienta registrada: %s", spec.name)
+        return spec
+
+    def names(self) -> List[str]:
+        """Nombres de las herramientas registradas"""
+        return list(self._tools)
+
+    def keywords(self) -> Dict[str, List[str]]:
+        """Palabras clave por herramienta (para DecisionMaker)"""
+        return {name: spec.keywords for name, spec in self._tools.items() if spec.keywords}
+
+    def timeout_for(self, name: str) -> float:
+        """Timeout declarado de una herramienta"""
+        spec = self._tools.get(name)
+        if spec is None or spec.timeout is None:
+            return self.default_timeout
+        return spec.timeout
+
+    def call(self, name: str, message: str, info: Dict[str, Any]) -> str:
+        """
+        Ejecutar una herramienta por nombre
+
+        Args:
+            name: Nombre de la herramienta
+            message: Mensaje del usuario
+            info: Información extraída por DecisionMaker
+
+        Returns:
+            Texto producido por la herramienta ("" si no existe)
+        """
+        spec = self._tools.get(name)
+        if spec is None:
+            logger.warning("⚠️ Herramienta desconocida: %s", name)
+            return ""
+
+        logger.info("🛠️ Ejecutando herramienta: %s", name)
+        stats = self._stats[name]
+        cache_key = None
+        if spec.pure:
+            cache_key = (name, spec.cache_key(message, info))
+            now = time.monotonic()
+            with self._lock:
+                cached = self._cache.get(cache_key)
+                if cached is not None and cached[0] > now:
+                    self._cache.move_to_end(cache_key)
+                    stats.calls += 1
+                    stats.cache_hits += 1
+                    return cached[1]
+
+        start = time.perf_counter()
+        try:
+            result = spec.handler(message, info)
+        except Exception:
+            with self._lock:
+                stats.calls += 1
+                stats.errors += 1
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            if cache_key is not None:
+                self._cache[cache_key] = (time.monotonic() + spec.ttl, result)
+                self._cache.move_to_end(cache_key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def invalidate(self, name: Optional[str] = None):
+        """Descartar resultados memoizados (de una herramienta o de todas)"""
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == name]:
+                    del self._cache[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Llamadas, aciertos de caché y latencia por herramienta"""
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                executed = stats.calls - stats.cache_hits - stats.errors
+                result[name] = {
+                    "calls": stats.calls,
+                    "cache_hits": stats.cache_hits,
+                    "errors": stats.errors,
+                    "avg_ms": round(stats.total_ms / executed, 3) if executed else 0.0,
+                    "max_ms": round(stats.max_ms, 3)
+                }
+            return result
+
+
+def build_tool_registry(product_tools, business_tools, default_timeout: float = 2.0,
+                        knowledge=None, knowledge_top_k: int = 3,
+                        knowledge_min_score: float = 0.2, order_tools=None) -> ToolRegistry:
+    """
+    Registrar las herramientas del agente
+
+    Args:
+        product_tools: ProductTools inicializado
+        business_tools: BusinessTools inicializado
+        default_timeout: Timeout por defecto de cada paso
+        knowledge: KnowledgeIndex cargado (None = sin base de conocimiento)
+        knowledge_top_k: Fragmentos recuperados por consulta
+        knowledge_min_score: Similitud mínima de un fragmento
+        order_tools: OrderTools para describir el pedido preparado (None = solo confirmación de texto)
+
+    Returns:
+        ToolRegistry listo para despachar
+    """
+    registry = ToolRegistry(default_timeout=default_timeout)
+
+    def product_query(message: str, info: Dict[str, Any]) -> str:
+        mentioned = info.get("mentioned_products", [])
+        return mentioned[0] if mentioned else message.lower().strip()
+
+    def search_product(message: str, info: Dict[str, Any]) -> str:
+        return product_tools.search_product(product_query(message, info)).get("message", "")
+
+    def recommend(message: str, info: Dict[str, Any]) -> str:
+        recommendations = product_tools.recommend_products(info.get("mentioned_products", []),
+                                                           info.get("recent_products", []))
+        if not recommendations:
+            return ""
+        lines = [f"- {p['name']}: ${p['price']:,}" for p in recommendations]
+        return "También te pueden interesar:\n" + "\n".join(lines)
+
+    def consult_knowledge(message: str, info: Dict[str, Any]) -> str:
+        fragments = knowledge.search(message, k=knowledge_top_k, min_score=knowledge_min_score)
+        if not fragments:
+            return ""
+        lines = [f"- {f['title']}: {f['text']}" for f in fragments]
+        return "Información de la tienda:\n" + "\n".join(lines)
+
+    # El orden de registro define la prioridad de las palabras clave
+    registry.register(ToolSpec(
+        "BuscarProducto", search_product,
+        keywords=["producto", "cupcake", "torta", "pastel", "galleta", "cheesecake", "pie", "dona"],
+        pure=True, ttl=300, timeout=1.0, cache_key=product_query,
+        description="Buscar información de un producto del catálogo"
+    ))
+    registry.register(ToolSpec(
+        "ConsultarHorario", lambda message, info: business_tools.get_hours(),
+        keywords=["horario", "abierto", "cierra", "disponible", "tiempo"],
+        pure=True, ttl=300, timeout=0.5,
+        description="Horarios de atención"
+    ))
+    registry.register(ToolSpec(
+        "ConsultarContacto", lambda message, info: business_tools.get_contact_info(),
+        keywords=["contacto", "teléfono", "telefono", "dirección", "direccion", "email"],
+        pure=True, ttl=300, timeout=0.5,
+        description="Teléfono, email y dirección"
+    ))
+    if knowledge is not None:
+        registry.register(ToolSpec(
+            "ConsultarConocimiento", consult_knowledge,
+            keywords=["envío", "envio", "entrega", "domicilio", "despacho", "política", "politica",
+                      "devolución", "devolucion", "reembolso", "temporada", "personalizado",
+                      "personalizada", "encargo"],
+            pure=True, ttl=300, timeout=1.0,
+            cache_key=lambda message, info: " ".join(message.lower().split()),
+            description="Políticas, pedidos personalizados y menús de la base de conocimiento"
+        ))
+    if order_tools is not None:
+        # El agente prepara el pedido y lo registra al cerrar el turno: el paso solo lo describe
+        place_order = order_tools.describe
+    else:
+        place_order = lambda message, info: business_tools.format_order_confirmation({"message": f"Pedido: {message}"})
+    registry.register(ToolSpec(
+        "ProcesarPedido", place_order,
+        keywords=["pedido", "orden", "comprar", "quiero", "necesito"],
+        timeout=2.0,
+        description="Registrar un pedido"
+    ))
+    registry.register(ToolSpec(
+        "RecomendarProductos", recommend,
+        pure=True, ttl=300, timeout=1.0,
+        cache_key=lambda message, info: (tuple(info.get("mentioned_products", [])),
+                                         tuple(info.get("recent_products", []))),
+        description="Productos relacionados"
+    ))
+
+    logger.info("🔧 %d herramientas registradas", len(registry.names()))
+    return registry
@@ -0,0 +1,6 @@
+# DulceAI Services - Infraestructura de la aplicación backend
+# Componentes transversales usados por app.py (logging, estado compartido, etc.)
+
+from .logging_setup import setup_logging, shutdown_logging
+
+__all__ = ['setup_logging', 'shutdown_logging']
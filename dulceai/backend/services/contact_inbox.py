@@ -0,0 +1,328 @@
+"""
+Bandeja de mensajes de contacto
+/api/contact solo encola el mensaje (latencia constante aunque llegue una ráfaga de una campaña);
+un hilo escritor lo guarda por lotes en SQLite (solo inserciones, modo WAL) y otro hilo avisa al
+equipo sin frenar la escritura
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import urllib.request
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ContactQueueFull(RuntimeError):
+    """La cola de mensajes está llena: el cliente debe reintentar"""
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contact_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+
+def webhook_notifier(url: str, timeout: float = 5.0) -> Callable[[List[Dict[str, Any]]], None]:
+    """
+    Aviso al equipo por webhook (formato {"text": ...} de Slack, Teams o Google Chat)
+
+    Args:
+        url: URL del webhook
+        timeout: Segundos máximos por aviso
+
+    Returns:
+        Función que recibe los mensajes recién guardados
+    """
+    def notify(messages: List[Dict[str, Any]]):
+        lines = [f"• {m['name']} <{m['email']}>: {m['message'][:200]}" for m in messages[:10]]
+        if len(messages) > 10:
+            lines.append(f"… y {len(messages) - 10} más")
+        body = json.dumps({"text": f"📬 {len(messages)} mensaje(s) de contacto nuevos\n" + "\n".join(lines)})
+        request = urllib.request.Request(url, data=body.encode("utf-8"),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+    return notify
+
+
+def log_notifier(messages: List[Dict[str, Any]]):
+    """Aviso por defecto: una línea de log por lote"""
+    logger.info("📬 %d mensaje(s) de contacto nuevos (último de %s)", len(messages), messages[-1]["email"])
+
+
+class ContactInbox:
+    """
+    Mensajes de contacto persistentes
+
+    - submit(): encola sin esperar (si la cola está llena lanza ContactQueueFull de inmediato)
+    - El escritor inserta lo que haya en la cola (hasta `batch_size`) en una sola transacción
+    - Tras cada commit el lote pasa al hilo de avisos, que junta en un aviso los lotes acumulados;
+      si el aviso se atrasa demasiado se descartan avisos, nunca mensajes
+    - page(): lista por cursor (id del último mensaje visto), sin OFFSET
+    """
+
+    def __init__(self, path: str, batch_size: int = 200, queue_size: int = 5000,
+                 notifier: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 notify_queue_size: int = 100):
+        """
+        Args:
+            path: Archivo SQLite (se crea con su carpeta si no existe)
+            batch_size: Mensajes máximos por transacción
+            queue_size: Mensajes máximos pendientes de escribir
+            notifier: Función que avisa al equipo con cada lote guardado (por defecto, un log)
+            notify_queue_size: Lotes pendientes de aviso antes de descartar avisos
+        """
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.notifier = notifier or log_notifier
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._notify_queue: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=notify_queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._notifier_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.write_errors = 0
+        self.notified = 0
+        self.notify_errors = 0
+        self.notify_dropped = 0
+        self._commit_seconds = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def start(self) -> "ContactInbox":
+        """Arrancar los hilos de escritura y de avisos"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer, name="contact-writer", daemon=True)
+            self._notifier_thread = threading.Thread(target=self._run_notifier, name="contact-notifier",
+                                                     daemon=True)
+            self._writer.start()
+            self._notifier_thread.start()
+            logger.info("📬 Mensajes de contacto en %s (lotes de hasta %d)", self.path, self.batch_size)
+        return self
+
+    def submit(self, name: str, email: str, message: str, created_at: str):
+        """
+        Encolar un mensaje (se guarda en segundo plano)
+
+        Args:
+            name: Nombre del remitente
+            email: Email del remitente
+            message: Texto del mensaje
+            created_at: Fecha de recepción (ISO 8601)
+
+        Raises:
+            ContactQueueFull: El escritor no da abasto; no se espera para no frenar la petición
+        """
+        try:
+            self._queue.put_nowait({"name": name, "email": email, "message": message, "created_at": created_at})
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise ContactQueueFull("Cola de mensajes de contacto llena") from None
+        with self._lock:
+            self.submitted += 1
+
+    def _run_writer(self):
+        conn = self._connect()
+        try:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    return
+                batch = [entry]
+                stop = False
+                # Lo que llegó mientras se escribía el lote anterior va en este commit
+                while len(batch) < self.batch_size:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is None:
+                        stop = True
+                        break
+                    batch.append(entry)
+                try:
+                    saved = self._write(conn, batch)
+                    if saved:
+                        self._notify(saved)
+                except Exception as e:
+                    # El escritor no puede morir: submit() seguiría aceptando y flush() no terminaría
+                    logger.error("❌ Error inesperado escribiendo %d mensajes de contacto: %s", len(batch), e)
+                    with self._lock:
+                        self.write_errors += len(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            self._queue.task_done()  # el marcador de cierre (o el último get)
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        saved: List[Dict[str, Any]] = []
+        try:
+            with conn:
+                for entry in batch:
+                    saved.append(dict(entry, id=self._insert(conn, entry)))
+        except Exception as e:
+            # Un mensaje inválido (o mal armado) no debe perder el resto del lote: reintentar uno por uno
+            logger.error("❌ Error escribiendo lote de %d mensajes de contacto: %s", len(batch), e)
+            saved = []
+            for entry in batch:
+                try:
+                    with conn:
+                        saved.append(dict(entry, id=self._insert(conn, entry)))
+                except Exception as e:
+                    logger.error("❌ Mensaje de contacto de %s no guardado: %s", entry.get("email"), e)
+            with self._lock:
+                self.write_errors += len(batch) - len(saved)
+                self.written += len(saved)
+                self.batches += 1
+            return saved
+        with self._lock:
+            self.written += len(saved)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(saved))
+            self._commit_seconds += time.perf_counter() - start
+        return saved
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, entry: Dict[str, Any]) -> int:
+        cursor = conn.execute(
+            "INSERT INTO contact_messages (name, email, message, created_at) VALUES (?, ?, ?, ?)",
+            (entry["name"], entry["email"], entry["message"], entry["created_at"]))
+        return cursor.lastrowid
+
+    def _notify(self, saved: List[Dict[str, Any]]):
+        try:
+            self._notify_queue.put_nowait(saved)
+        except queue.Full:
+            with self._lock:
+                self.notify_dropped += 1
+            logger.warning("⚠️ Avisos de contacto atrasados: lote de %d sin aviso (quedan guardados)", len(saved))
+
+    def _run_notifier(self):
+        while True:
+            batch = self._notify_queue.get()
+            if batch is None:
+                return
+            stop = False
+            # Los lotes que se juntaron mientras el aviso anterior tardaba van en un solo aviso
+            while True:
+                try:
+                    more = self._notify_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                batch = batch + more
+            try:
+                self.notifier(batch)
+                with self._lock:
+                    self.notified += len(batch)
+            except Exception as e:
+                with self._lock:
+                    self.notify_errors += 1
+                logger.error("❌ Error avisando %d mensaje(s) de contacto: %s", len(batch), e)
+            if stop:
+                return
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Esperar a que lo encolado quede escrito (True si se vació a tiempo)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Escribir lo pendiente y detener los hilos (los avisos pendientes se intentan hasta `timeout`)"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=timeout)
+        try:
+            self._notify_queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._notifier_thread.join(timeout=timeout)
+        self._writer = None
+        self._notifier_thread = None
+        logger.info("📬 Bandeja de contacto detenida (%d guardados)", self.written)
+
+    def page(self, limit: int = 100, cursor: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Mensajes del más reciente al más antiguo
+
+        Args:
+            limit: Mensajes por página (1-500)
+            cursor: next_cursor de la página anterior (None para la primera)
+
+        Returns:
+            {"messages": [...], "next_cursor": id o None si no hay más}
+        """
+        limit = max(1, min(500, limit))
+        with closing(self._connect()) as conn:
+            if cursor is None:
+                rows = conn.execute("SELECT * FROM contact_messages ORDER BY id DESC LIMIT ?",
+                                    (limit + 1,)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM contact_messages WHERE id < ? ORDER BY id DESC LIMIT ?",
+                                    (cursor, limit + 1)).fetchall()
+        messages = [dict(row) for row in rows[:limit]]
+        return {
+            "messages": messages,
+            "next_cursor": messages[-1]["id"] if len(rows) > limit else None
+        }
+
+    def count(self) -> int:
+        """Mensajes guardados (incluye los de otros workers)"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM contact_messages").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "written": self.written,
+                "pending": self._queue.qsize(),
+                "batches": self.batches,
+                "avg_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+                "max_batch": self.max_batch,
+                "avg_commit_ms": round(self._commit_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+                "write_errors": self.write_errors,
+                "notified": self.notified,
+                "notify_errors": self.notify_errors,
+                "notify_dropped": self.notify_dropped
+            }
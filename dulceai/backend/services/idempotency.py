@@ -0,0 +1,208 @@
+"""
+Claves de idempotencia para /api/chat
+Un reintento con la misma Idempotency-Key se une a la generación en curso o recibe la respuesta
+guardada, sin volver a llamar al LLM ni escribir dos veces en la memoria
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflict(Exception):
+    """La clave ya se usó con un mensaje distinto"""
+
+
+class _Entry:
+    """Petición registrada con una clave: el future se resuelve con la respuesta (dict JSON)"""
+
+    __slots__ = ("fingerprint", "future", "cancel", "expires_at", "joiners")
+
+    def __init__(self, fingerprint: str, future: asyncio.Future, cancel=None):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.cancel = cancel
+        self.expires_at: Optional[float] = None  # se fija al completarse
+        self.joiners = 0
+
+
+class IdempotencyTable:
+    """
+    Tabla acotada (LRU + TTL) de peticiones en curso y completadas por clave
+
+    Se usa solo desde el event loop (sin locks). Las respuestas completadas también se guardan
+    en el backend de estado, así un reintento que llega a otro worker recibe la misma respuesta;
+    las peticiones en curso solo se comparten dentro del worker. Las lecturas y escrituras del
+    backend de estado (Redis) van en un hilo para no bloquear el event loop
+    """
+
+    KEY_MAX_LENGTH = 255
+
+    def __init__(self, ttl: int = 600, max_entries: int = 10000, store=None, prefix: str = "idem:"):
+        """
+        Args:
+            ttl: Segundos que se guarda una respuesta completada
+            max_entries: Claves máximas en memoria
+            store: StateBackend para compartir respuestas entre workers (opcional)
+            prefix: Prefijo de las claves en el backend de estado
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store
+        self.prefix = prefix
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.claimed = 0
+        self.joined = 0
+        self.replayed = 0
+        self.conflicts = 0
+        self.evicted = 0
+
+    @staticmethod
+    def fingerprint(message: str) -> str:
+        """Huella del cuerpo: la misma clave con otro mensaje es un error del cliente"""
+        return hashlib.sha256(message.encode("utf-8")).hexdigest()[:32]
+
+    async def lookup(self, key: str, fingerprint: str) -> Optional[asyncio.Future]:
+        """
+        Buscar una petición previa con la clave
+
+        Args:
+            key: Clave ya acotada a la sesión
+            fingerprint: Huella del mensaje
+
+        Returns:
+            Future con la respuesta (en curso o ya resuelto) o None si hay que procesarla
+
+        Raises:
+            IdempotencyConflict: La clave se usó con otro mensaje
+        """
+        future = self._lookup_local(key, fingerprint)
+        if future is not None or self.store is None:
+            return future
+        stored = await asyncio.to_thread(self._load, key)
+        # Mientras se leía el backend pudo registrarse la misma clave en este worker
+        future = self._lookup_local(key, fingerprint)
+        if future is not None or stored is None:
+            return future
+        if stored.get("fingerprint") != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict(key)
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(stored["response"])
+        self.replayed += 1
+        return future
+
+    def _lookup_local(self, key: str, fingerprint: str) -> Optional[asyncio.Future]:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            elif entry.cancel is not None and entry.cancel.cancelled and not entry.future.done():
+                # Su cliente se fue y la generación ya se está cancelando: este reintento la rehace
+                entry = None
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                raise IdempotencyConflict(key)
+            self._entries.move_to_end(key)
+            if entry.future.done():
+                self.replayed += 1
+            else:
+                entry.joiners += 1
+                self.joined += 1
+                logger.info("🔁 Reintento con clave en curso: se espera la misma generación")
+            return entry.future
+        return None
+
+    def claim(self, key: str, fingerprint: str, cancel=None) -> _Entry:
+        """
+        Registrar una petición nueva con la clave
+
+        Args:
+            key: Clave ya acotada a la sesión
+            fingerprint: Huella del mensaje
+            cancel: CancelToken de la petición (una entrada cancelada no acepta reintentos)
+
+        Returns:
+            Entrada a completar con complete() o fail()
+        """
+        future = asyncio.get_running_loop().create_future()
+        # Nadie más puede esperar el error: evitar el aviso de excepción no recuperada
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        entry = _Entry(fingerprint, future, cancel)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self.claimed += 1
+        self._evict(time.monotonic())
+        return entry
+
+    def has_joiners(self, entry: _Entry) -> bool:
+        """¿Algún reintento espera esta petición? (entonces no se cancela si su cliente se va)"""
+        return entry.joiners > 0
+
+    async def complete(self, key: str, entry: _Entry, response: Dict[str, Any]):
+        """Guardar la respuesta (dict serializable) y entregarla a los reintentos en espera"""
+        entry.expires_at = time.monotonic() + self.ttl
+        if not entry.future.done():
+            entry.future.set_result(response)
+        if self.store is not None:
+            await asyncio.to_thread(self._save, key, entry.fingerprint, response)
+
+    def fail(self, key: str, entry: _Entry, error: BaseException):
+        """Propagar el error a los reintentos en espera y liberar la clave para uno nuevo"""
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        if entry.future.done():
+            return
+        if isinstance(error, Exception):
+            entry.future.set_exception(error)
+        else:
+            # Handler cancelado por el servidor (CancelledError): los reintentos no reciben respuesta
+            entry.future.cancel()
+
+    def _save(self, key: str, fingerprint: str, response: Dict[str, Any]):
+        try:
+            payload = json.dumps({"fingerprint": fingerprint, "response": response})
+            self.store.set_many({self.prefix + key: payload}, ttl=self.ttl)
+        except Exception as e:
+            logger.warning("⚠️ No se pudo compartir la respuesta idempotente: %s", e)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self.store.get_many([self.prefix + key]).get(self.prefix + key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning("⚠️ No se pudo leer la respuesta idempotente: %s", e)
+            return None
+
+    def _evict(self, now: float):
+        # Primero las completadas y vencidas más antiguas; luego LRU si se pasa del límite
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at is not None and entry.expires_at <= now:
+                del self._entries[key]
+            elif len(self._entries) > self.max_entries:
+                del self._entries[key]
+                self.evicted += 1
+            else:
+                break
+
+    def get_stats(self) -> Dict[str, Any]:
+        in_flight = sum(1 for entry in self._entries.values() if not entry.future.done())
+        return {
+            "keys": len(self._entries),
+            "in_flight": in_flight,
+            "claimed": self.claimed,
+            "joined": self.joined,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "evicted": self.evicted
+        }
@@ -0,0 +1,178 @@
+"""
+Configuración de logging para el backend
+Mueve la escritura de logs fuera del hilo de la petición y muestrea eventos frecuentes
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, TextIO
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Tasa por defecto (registros/segundo por logger) para eventos INFO/DEBUG
+DEFAULT_SAMPLE_RATE = 50.0
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+# Handlers del logger raíz antes de setup_logging (se restauran al apagar)
+_previous_handlers: List[logging.Handler] = []
+_setup_lock = threading.Lock()
+
+
+class RateSampler(logging.Filter):
+    """
+    Filtro de muestreo por logger basado en token bucket
+    Los registros WARNING o superiores siempre pasan
+    """
+
+    def __init__(self, rate: float = DEFAULT_SAMPLE_RATE, burst: Optional[float] = None,
+                 per_logger: Optional[Dict[str, float]] = None, max_level: int = logging.INFO):
+        """
+        Inicializar muestreador
+
+        Args:
+            rate: Registros por segundo permitidos por logger
+            burst: Capacidad máxima del bucket (por defecto igual a rate)
+            per_logger: Tasas específicas por nombre de logger
+            max_level: Nivel máximo sujeto a muestreo
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.per_logger = per_logger or {}
+        self.max_level = max_level
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def _rate_for(self, name: str) -> float:
+        return self.per_logger.get(name, self.rate)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+
+        rate = self._rate_for(record.name)
+        if rate <= 0:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                # [tokens, último instante, descartados]
+                bucket = self._buckets[record.name] = [self.burst, now, 0]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                bucket[2] += 1
+                return False
+            bucket[0] = tokens - 1.0
+            dropped, bucket[2] = bucket[2], 0
+
+        if dropped:
+            record.msg = "%s (+%d registros omitidos por muestreo)" % (record.msg, dropped)
+        return True
+
+    def dropped_counts(self) -> Dict[str, int]:
+        """Registros descartados pendientes de reportar por logger"""
+        with self._lock:
+            return {name: b[2] for name, b in self._buckets.items() if b[2]}
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo llamador
+    La cola es en memoria, así que el registro no necesita ser serializable
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: Optional[str] = None, stream: Optional[TextIO] = None,
+                  log_file: Optional[str] = None, sample_rate: Optional[float] = None,
+                  per_logger_rates: Optional[Dict[str, float]] = None) -> logging.handlers.QueueListener:
+    """
+    Configurar logging asíncrono con QueueHandler/QueueListener
+
+    Args:
+        level: Nivel del logger raíz (por defecto LOG_LEVEL o INFO)
+        stream: Stream de salida (por defecto stdout)
+        log_file: Archivo de log opcional (por defecto LOG_FILE)
+        sample_rate: Registros/segundo por logger (por defecto LOG_SAMPLE_RATE)
+        per_logger_rates: Tasas específicas por logger
+
+    Returns:
+        QueueListener activo
+    """
+    global _listener, _queue_handler, _previous_handlers
+
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        level = level or os.getenv("LOG_LEVEL", "INFO")
+        log_file = log_file or os.getenv("LOG_FILE")
+        if sample_rate is None:
+            sample_rate = float(os.getenv("LOG_SAMPLE_RATE", DEFAULT_SAMPLE_RATE))
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = []
+
+        stream_handler = logging.StreamHandler(stream or sys.stdout)
+        stream_handler.setFormatter(formatter)
+        handlers.append(stream_handler)
+
+        if log_file:
+            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = _DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(RateSampler(rate=sample_rate, per_logger=per_logger_rates))
+
+        root = logging.getLogger()
+        _previous_handlers = list(root.handlers)
+        for handler in _previous_handlers:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+        _queue_handler = queue_handler
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.unregister(shutdown_logging)
+        atexit.register(shutdown_logging)
+
+        return _listener
+
+
+def shutdown_logging():
+    """
+    Vaciar la cola, detener el listener y devolver al logger raíz sus handlers originales
+    (lo que se registre después no queda en una cola sin lector)
+    """
+    global _listener, _queue_handler, _previous_handlers
+
+    with _setup_lock:
+        if _listener is None:
+            return
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        for handler in _previous_handlers:
+            root.addHandler(handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.flush()
+            handler.close()
+        _listener = None
+        _queue_handler = None
+        _previous_handlers = []
@@ -0,0 +1,241 @@
+"""
+Control de admisión para /api/chat con token buckets
+Límites por usuario, por IP y un presupuesto global de generaciones
+"""
+
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, List
+
+logger = logging.getLogger(__name__)
+
+
+class BucketStore(ABC):
+    """Almacenamiento de token buckets (local o compartido)"""
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Consumir tokens de un bucket
+
+        Returns:
+            (permitido, segundos hasta que haya tokens suficientes)
+        """
+
+    @abstractmethod
+    def refund(self, key: str, capacity: float, cost: float = 1.0):
+        """Devolver tokens consumidos (cuando otro límite rechazó la petición)"""
+
+
+class InMemoryBucketStore(BucketStore):
+    """Buckets locales al proceso, acotados con LRU para no crecer con cada IP"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # clave -> [tokens, último instante]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return True, 0.0
+            bucket[0] = tokens
+            return False, (cost - tokens) / rate
+
+    def refund(self, key: str, capacity: float, cost: float = 1.0):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(capacity, bucket[0] + cost)
+
+
+class RedisBucketStore(BucketStore):
+    """
+    Buckets compartidos entre workers/hosts
+    La recarga y el consumo se hacen atómicamente en un script Lua con el reloj de Redis
+    """
+
+    TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1])
+local ts = tonumber(data[2])
+if tokens == nil or ts == nil then
+  tokens = capacity
+  ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(retry)}
+"""
+
+    # Solo si el bucket sigue vivo: uno vencido ya está lleno (el siguiente take lo recrea)
+    REFUND_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens == nil then
+  return 0
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tonumber(ARGV[1]), tokens + tonumber(ARGV[2]))))
+return 1
+"""
+
+    def __init__(self, client, prefix: str = "dulceai:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(self.TAKE_SCRIPT)
+        self._refund = client.register_script(self.REFUND_SCRIPT)
+
+    def take(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, retry = self._take(keys=[self.prefix + key], args=[capacity, rate, cost])
+        return bool(int(allowed)), float(retry)
+
+    def refund(self, key: str, capacity: float, cost: float = 1.0):
+        # HINCRBYFLOAT sobre una clave vencida crearía un hash sin 'ts'
+        self._refund(keys=[self.prefix + key], args=[capacity, cost])
+
+
+class AdmissionDecision:
+    """Resultado del control de admisión"""
+
+    __slots__ = ("allowed", "retry_after", "scope")
+
+    def __init__(self, allowed: bool, retry_after: float = 0.0, scope: Optional[str] = None):
+        self.allowed = allowed
+        self.retry_after = retry_after
+        self.scope = scope
+
+    @property
+    def retry_after_header(self) -> str:
+        """Valor de Retry-After en segundos enteros (redondeado hacia arriba)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    """
+    Control de admisión por usuario, IP y presupuesto global
+    Cada límite es (capacidad de ráfaga, tokens por segundo)
+
+    - check(): usuario e IP, al recibir el mensaje (429 si se superan)
+    - admit_generation(): presupuesto global, justo antes de llamar al LLM; las respuestas que no
+      generan (camino rápido, modo básico) no lo gastan
+    """
+
+    def __init__(self, store: BucketStore, per_user: Tuple[float, float],
+                 per_ip: Tuple[float, float], global_budget: Tuple[float, float],
+                 enabled: bool = True):
+        self.store = store
+        self.limits = {"user": per_user, "ip": per_ip, "global": global_budget}
+        self.enabled = enabled
+        self.admitted = 0
+        self.generations = 0
+        self.rejections: Dict[str, int] = {"user": 0, "ip": 0, "global": 0}
+        self._lock = threading.Lock()
+
+    def check(self, user_id: Optional[str], client_ip: Optional[str]) -> AdmissionDecision:
+        """
+        Decidir si se admite un mensaje (límites por usuario e IP)
+
+        Args:
+            user_id: Identificador del usuario (opcional)
+            client_ip: IP del cliente (opcional)
+
+        Returns:
+            AdmissionDecision con el límite que rechazó y el Retry-After
+        """
+        if not self.enabled:
+            return AdmissionDecision(True)
+
+        checks: List[Tuple[str, str]] = []
+        if user_id:
+            checks.append(("user", "user:" + user_id))
+        if client_ip:
+            checks.append(("ip", "ip:" + client_ip))
+
+        taken: List[Tuple[str, str]] = []
+        for scope, key in checks:
+            capacity, rate = self.limits[scope]
+            allowed, retry_after = self.store.take(key, capacity, rate)
+            if not allowed:
+                # No cobrar a los buckets anteriores una petición que no se atiende
+                for prev_scope, prev_key in taken:
+                    self.store.refund(prev_key, self.limits[prev_scope][0])
+                with self._lock:
+                    self.rejections[scope] += 1
+                logger.warning("🚦 Petición rechazada por límite %s (%s), reintentar en %.1fs",
+                               scope, key, retry_after)
+                return AdmissionDecision(False, retry_after, scope)
+            taken.append((scope, key))
+
+        with self._lock:
+            self.admitted += 1
+        return AdmissionDecision(True)
+
+    def admit_generation(self) -> AdmissionDecision:
+        """Consumir un token del presupuesto global de generaciones (compartido entre workers)"""
+        if not self.enabled:
+            return AdmissionDecision(True)
+        capacity, rate = self.limits["global"]
+        allowed, retry_after = self.store.take("global", capacity, rate)
+        if not allowed:
+            with self._lock:
+                self.rejections["global"] += 1
+            logger.warning("🚦 Presupuesto global de generaciones agotado, disponible en %.1fs", retry_after)
+            return AdmissionDecision(False, retry_after, "global")
+        with self._lock:
+            self.generations += 1
+        return AdmissionDecision(True)
+
+    def get_stats(self) -> Dict:
+        """Métricas para el endpoint de estado"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "backend": self.store.__class__.__name__,
+                "admitted": self.admitted,
+                "generations": self.generations,
+                "rejected": sum(self.rejections.values()),
+                "rejections_by_scope": dict(self.rejections),
+                "limits": {scope: {"burst": cap, "per_second": rate}
+                           for scope, (cap, rate) in self.limits.items()}
+            }
+
+
+def build_bucket_store(state_backend=None) -> BucketStore:
+    """Usar Redis si el backend de estado es compartido; si no, memoria local"""
+    client = getattr(state_backend, "client", None)
+    if client is not None:
+        return RedisBucketStore(client)
+    return InMemoryBucketStore()
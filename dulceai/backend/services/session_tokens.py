@@ -0,0 +1,114 @@
+"""
+Sesiones de chat emitidas por el servidor
+Tokens firmados con HMAC-SHA256: verificar un token es O(1) y no requiere buscar en una tabla de sesiones
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionTokens:
+    """
+    Emisor y verificador de tokens de sesión
+
+    Formato: "<session_id>.<emitido_en>.<firma>"; la firma cubre el id y la fecha de emisión,
+    así que el cliente no puede elegir ni falsificar el id de otra sesión
+    """
+
+    SESSION_PREFIX = "s_"
+
+    SECRET_KEY = "session_secret"
+
+    def __init__(self, secret: str = "", ttl: int = 7 * 24 * 3600, store=None):
+        """
+        Args:
+            secret: Clave de firma (compartida entre workers); vacía = clave generada
+            ttl: Segundos de validez de un token desde su emisión
+            store: StateBackend compartido (Redis) donde guardar la clave generada para que la usen
+                   todos los workers (opcional; sin él la clave solo vale en este proceso)
+        """
+        if not secret:
+            secret = secrets.token_hex(32)
+            if getattr(store, "client", None) is not None:
+                # El primer worker en arrancar fija la clave; los demás (y los reinicios) la reutilizan
+                secret = store.set_default(self.SECRET_KEY, secret)
+                logger.info("🔑 SESSION_SECRET no configurado: clave de sesiones compartida en el backend de estado")
+            else:
+                logger.warning("⚠️ SESSION_SECRET no configurado: los tokens solo valen en este proceso "
+                               "(con varios workers configúralo o usa un backend de estado compartido)")
+        self._key = secret.encode("utf-8")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.refreshed = 0
+        self.rejected = 0
+
+    def _sign(self, session_id: str, issued_at: int) -> str:
+        digest = hmac.new(self._key, f"{session_id}.{issued_at}".encode("utf-8"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest[:18]).decode("ascii")
+
+    def _token(self, session_id: str) -> Dict[str, Any]:
+        issued_at = int(time.time())
+        return {
+            "session_id": session_id,
+            "token": f"{session_id}.{issued_at}.{self._sign(session_id, issued_at)}",
+            "expires_in": self.ttl
+        }
+
+    def issue(self) -> Dict[str, Any]:
+        """Nueva sesión con id aleatorio"""
+        with self._lock:
+            self.issued += 1
+        return self._token(self.SESSION_PREFIX + secrets.token_urlsafe(16))
+
+    def verify(self, token: Optional[str]) -> Optional[str]:
+        """
+        Validar un token
+
+        Returns:
+            El id de sesión, o None si el token es inválido o expiró
+        """
+        session_id = self._parse(token)
+        if session_id is None:
+            with self._lock:
+                self.rejected += 1
+        return session_id
+
+    def _parse(self, token: Optional[str]) -> Optional[str]:
+        if not token or token.count(".") != 2:
+            return None
+        session_id, issued_at, signature = token.split(".")
+        if not session_id.startswith(self.SESSION_PREFIX) or not issued_at.isdigit():
+            return None
+        if not hmac.compare_digest(signature, self._sign(session_id, int(issued_at))):
+            return None
+        if time.time() - int(issued_at) > self.ttl:
+            return None
+        return session_id
+
+    def resume(self, token: Optional[str]) -> Dict[str, Any]:
+        """
+        Continuar la sesión de un token válido (con un token renovado) o abrir una nueva
+
+        Returns:
+            {"session_id", "token", "expires_in", "resumed"}
+        """
+        session_id = self.verify(token) if token else None
+        if session_id is None:
+            return dict(self.issue(), resumed=False)
+        with self._lock:
+            self.refreshed += 1
+        return dict(self._token(session_id), resumed=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"issued": self.issued, "resumed": self.refreshed, "rejected": self.rejected,
+                    "ttl_seconds": self.ttl}
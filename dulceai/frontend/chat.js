@@ -8,12 +8,105 @@ let aiStatus = null;
 // Configuración del backend
 const BACKEND_URL = 'http://localhost:8000';
 
+// Sesión emitida por el servidor (se reutiliza entre mensajes y recargas de página)
+const SESSION_STORAGE_KEY = 'dulceai_session_token';
+let sessionToken = localStorage.getItem(SESSION_STORAGE_KEY);
+let sessionRequest = null;
+
 // Inicialización del chatbot cuando el DOM esté listo
 document.addEventListener('DOMContentLoaded', function() {
     initializeChatbot();
     checkAISystemStatus();
+    ensureSession();
 });
 
+// Obtener (o renovar) la sesión de chat; las llamadas concurrentes comparten la misma petición
+function ensureSession(forceNew = false) {
+    if (forceNew) {
+        sessionToken = null;
+        localStorage.removeItem(SESSION_STORAGE_KEY);
+        sessionRequest = null;
+    }
+    if (!sessionRequest) {
+        sessionRequest = fetch(`${BACKEND_URL}/api/session`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ token: sessionToken })
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(session => {
+                sessionToken = session.token;
+                localStorage.setItem(SESSION_STORAGE_KEY, sessionToken);
+                console.log(session.resumed ? '🔑 Sesión reanudada' : '🔑 Nueva sesión', session.session_id);
+                return sessionToken;
+            })
+            .catch(error => {
+                console.error('❌ Error obteniendo sesión:', error);
+                sessionRequest = null;
+                return sessionToken;
+            });
+    }
+    return sessionRequest;
+}
+
+// Reintentos ante errores de red: la misma Idempotency-Key hace que el servidor no genere dos veces
+const CHAT_NETWORK_RETRIES = 2;
+const CHAT_RETRY_DELAY_MS = 1000;
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// Enviar un mensaje con el token de sesión; si el servidor lo rechaza se pide una sesión nueva y se reintenta una vez
+async function postChatMessage(message) {
+    const idempotencyKey = newIdempotencyKey();
+    const timestamp = new Date().toISOString();
+    let renewedSession = false;
+    let networkRetries = 0;
+    while (true) {
+        const token = await ensureSession(renewedSession && networkRetries === 0);
+        const headers = {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': idempotencyKey
+        };
+        if (token) {
+            headers['X-Session-Token'] = token;
+        }
+        let response;
+        try {
+            response = await fetch(`${BACKEND_URL}/api/chat`, {
+                method: 'POST',
+                headers: headers,
+                body: JSON.stringify({
+                    message: message,
+                    timestamp: timestamp
+                })
+            });
+        } catch (error) {
+            if (networkRetries >= CHAT_NETWORK_RETRIES) {
+                throw error;
+            }
+            networkRetries++;
+            console.warn(`🔁 Error de red, reintentando (${networkRetries}/${CHAT_NETWORK_RETRIES})`);
+            await new Promise(resolve => setTimeout(resolve, CHAT_RETRY_DELAY_MS * networkRetries));
+            continue;
+        }
+        if (response.status !== 401 || renewedSession) {
+            return response;
+        }
+        renewedSession = true;
+        networkRetries = 0;
+    }
+}
+
 // Función principal de inicialización del chatbot
 function initializeChatbot() {
     const chatIcon = document.getElementById('chatbot-icon');
@@ -66,15 +159,23 @@ async function checkAISystemStatus() {
         aiStatus = status;
         console.log('📊 Estado del sistema de IA:', status);
         
-        // Solo permitir chat si la IA está disponible Y inicializada
-        if (status.ai_available && status.initialized && status.dependencies_available) {
+        // Solo permitir chat si la IA está disponible, inicializada y Ollama responde
+        if (status.ai_available && status.initialized && status.dependencies_available && status.ready !== false) {
             console.log('✅ Sistema de IA completamente operativo');
             updateChatbotStatus('active');
             enableChat();
+        } else if (status.degraded_mode) {
+            // Sin LLM el servidor responde con el catálogo: el chat sigue activo
+            console.log('🛟 IA en modo degradado (respuestas del catálogo)');
+            updateChatbotStatus('degraded');
+            enableChat();
+            setTimeout(checkAISystemStatus, 5000);
         } else {
             console.log('❌ Sistema de IA no disponible o no inicializado');
             updateChatbotStatus('unavailable');
             disableChat('Sistema de IA no disponible. El chatbot está deshabilitado.');
+            // El estado es una instantánea del servidor: consultarlo de nuevo es barato
+            setTimeout(checkAISystemStatus, 5000);
         }
         
     } catch (error) {
@@ -103,6 +204,11 @@ function updateChatbotStatus(status, error = null) {
             chatHeader.style.background = 'linear-gradient(135deg, #f59e0b, #d97706)';
             console.error('❌ Error del sistema de IA:', error);
             break;
+        case 'degraded':
+            chatIcon.innerHTML = '🛟';
+            chatHeader.textContent = 'DulceAI Asistente (Modo Básico)';
+            chatHeader.style.background = 'linear-gradient(135deg, #f59e0b, #d97706)';
+            break;
         case 'unavailable':
             chatIcon.innerHTML = '💬';
             chatHeader.textContent = 'DulceAI Asistente';
@@ -227,7 +333,7 @@ async function sendMessage() {
     if (!message) return;
     
     // Verificar que la IA esté disponible antes de enviar
-    if (!aiStatus || !aiStatus.initialized || !aiStatus.dependencies_available) {
+    if (!aiStatus || (!aiStatus.degraded_mode && (!aiStatus.initialized || !aiStatus.dependencies_available))) {
         addMessage('El sistema de IA no está disponible. El chatbot está deshabilitado.', 'bot');
         return;
     }
@@ -245,21 +351,23 @@ async function sendMessage() {
         // Enviar mensaje al backend con IA
         console.log('📤 Enviando mensaje al backend:', message);
         
-        const response = await fetch(`${BACKEND_URL}/api/chat`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                message: message,
-                user_id: 'user_' + Date.now(),
-                timestamp: new Date().toISOString()
-            })
-        });
-        
+        const response = await postChatMessage(message);
+
+        // 409: el servidor canceló esta respuesta porque llegó un mensaje más nuevo
+        if (response.status === 409) {
+            removeTypingIndicator(typingIndicator);
+            return;
+        }
+
         if (!response.ok) {
             const errorData = await response.json().catch(() => ({ detail: response.statusText }));
             
+            // Si es 429, el servidor limita la frecuencia de mensajes
+            if (response.status === 429) {
+                const retryAfter = response.headers.get('Retry-After') || '5';
+                throw new Error(`429: ${retryAfter}`);
+            }
+            
             // Si es 503, la IA no está disponible - deshabilitar chat
             if (response.status === 503) {
                 disableChat('Sistema de IA no disponible');
@@ -288,7 +396,10 @@ async function sendMessage() {
         // Mostrar mensaje de error
         let errorMessage = 'Lo siento, hubo un error procesando tu mensaje.';
         
-        if (error.message.includes('503')) {
+        if (error.message.startsWith('429')) {
+            const retryAfter = error.message.split(': ')[1];
+            errorMessage = `Estás enviando mensajes muy rápido. Intenta de nuevo en ${retryAfter} segundos.`;
+        } else if (error.message.includes('503')) {
             errorMessage = 'Sistema de IA no disponible. El chatbot está deshabilitado.';
             disableChat('Sistema de IA no disponible');
             // Re-verificar estado después de un momento
@@ -1,290 +1,468 @@
 """
 Script para iniciar Backend y Frontend simultáneamente
-Con logs detallados para debugging
+Launcher de producción (Linux primero):
+- N workers de uvicorn compartiendo un mismo socket (por defecto, uno por núcleo si el estado
+  es compartido en Redis; uno solo con el estado en memoria)
+- Arranque condicionado a que /health responda
+- Supervisor asyncio: lee la salida de todos los procesos en paralelo,
+  reinicia los que fallan con backoff exponencial y cuenta los reinicios
+- Reinicio escalonado de workers con SIGHUP, estado con SIGUSR1
+- Drenado ordenado con SIGTERM/SIGINT para que terminen las generaciones en curso
 """
 
-import subprocess
-import sys
+import argparse
+import asyncio
+import logging
+import logging.handlers
 import os
+import secrets
+import signal
+import socket
+import sys
 import time
-import logging
+import urllib.request
 from pathlib import Path
+from typing import Callable, Dict, List, Optional
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('services.log', encoding='utf-8')
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# Línea que uvicorn imprime cuando el worker terminó su arranque
+READY_MARKER = "Application startup complete"
+
+# Backoff de reinicio: base * 2^(fallos-1), acotado
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = 60.0
+# Un proceso que vivió más que esto se considera estable y reinicia el backoff
+STABLE_UPTIME = 30.0
+
+# Esquemas de STATE_BACKEND_URL compartidos entre procesos (misma regla que build_state_backend)
+SHARED_STATE_SCHEMES = ("redis://", "rediss://", "unix://")
+
+
+def setup_logging(log_file: str, max_bytes: int, backup_count: int):
+    """Configurar logging a consola y archivo rotado por tamaño"""
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    file_handler.setFormatter(formatter)
+    logging.basicConfig(level=logging.INFO, handlers=[stream_handler, file_handler])
+
+
 def get_project_root():
     """Obtener ruta raíz del proyecto"""
     return Path(__file__).parent.absolute()
 
-def check_ports():
+
+def find_python() -> str:
+    """Buscar el intérprete del entorno virtual (Linux/macOS primero, luego Windows)"""
+    project_root = get_project_root()
+    candidates = [
+        project_root / "venv" / "bin" / "python",
+        project_root.parent / "venv" / "bin" / "python",
+        project_root / "venv" / "Scripts" / "python.exe",
+        project_root.parent / "venv" / "Scripts" / "python.exe",
+    ]
+    for candidate in candidates:
+        if candidate.exists():
+            return str(candidate)
+    return sys.executable
+
+
+def state_backend_shared() -> bool:
+    """¿Sesiones, idempotencia y límites se comparten entre workers? (STATE_BACKEND_URL en Redis)"""
+    url = os.getenv("STATE_BACKEND_URL", os.getenv("REDIS_URL", "memory://"))
+    return url.startswith(SHARED_STATE_SCHEMES)
+
+
+def default_workers() -> int:
+    """WEB_CONCURRENCY, o un worker por núcleo si el estado es compartido y uno solo si no"""
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.getenv("WEB_CONCURRENCY"))
+    return (os.cpu_count() or 1) if state_backend_shared() else 1
+
+
+def check_ports(ports: List[int]):
     """Verificar si los puertos están disponibles"""
-    import socket
-    
-    ports = [8000, 3000]
     available = []
-    
+
     for port in ports:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         result = sock.connect_ex(('127.0.0.1', port))
         sock.close()
-        
+
         if result != 0:
             available.append(port)
-            logger.info(f"✅ Puerto {port} disponible")
+            logger.info("✅ Puerto %d disponible", port)
         else:
-            logger.warning(f"⚠️ Puerto {port} está en uso")
-    
+            logger.warning("⚠️ Puerto %d está en uso", port)
+
     return available
 
-def start_backend():
-    """Iniciar servidor backend con uvicorn"""
-    project_root = get_project_root()
-    venv_python = project_root / "venv" / "Scripts" / "python.exe"
-    backend_dir = project_root / "dulceai" / "backend"
-    
-    if not venv_python.exists():
-        logger.error(f"❌ No se encuentra venv: {venv_python}")
-        logger.error(f"   Ruta buscada: {venv_python.absolute()}")
-        return None
-    
-    if not backend_dir.exists():
-        logger.error(f"❌ No se encuentra directorio backend: {backend_dir}")
-        return None
-    
-    logger.info("🚀 Iniciando Backend FastAPI con UVICORN...")
-    logger.info(f"   Directorio de trabajo: {backend_dir.absolute()}")
-    logger.info(f"   Python: {venv_python.absolute()}")
-    logger.info(f"   Comando: uvicorn app:app --host 0.0.0.0 --port 8000")
-    logger.info(f"   Puerto: 8000")
-    
-    try:
-        # Usar uvicorn con módulo Python
-        cmd = [str(venv_python), "-m", "uvicorn", "app:app", "--host", "0.0.0.0", "--port", "8000", "--log-level", "info"]
-        logger.info(f"   Comando completo: {' '.join(cmd)}")
-        
-        process = subprocess.Popen(
-            cmd,
-            cwd=str(backend_dir),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
-            creationflags=subprocess.CREATE_NEW_CONSOLE if sys.platform == 'win32' else 0
-        )
-        
-        logger.info(f"✅ Backend iniciado con UVICORN (PID: {process.pid})")
-        return process
-    except Exception as e:
-        logger.error(f"❌ Error iniciando backend: {e}")
-        import traceback
-        logger.error(f"   Traceback: {traceback.format_exc()}")
-        return None
-
-def start_frontend():
-    """Iniciar servidor frontend con http.server"""
-    project_root = get_project_root()
-    frontend_dir = project_root / "dulceai" / "frontend"
-    
-    if not frontend_dir.exists():
-        logger.error(f"❌ No se encuentra directorio frontend: {frontend_dir}")
-        logger.error(f"   Ruta buscada: {frontend_dir.absolute()}")
-        return None
-    
-    logger.info("🚀 Iniciando Frontend HTTP Server...")
-    logger.info(f"   Directorio: {frontend_dir.absolute()}")
-    logger.info(f"   Comando: python -m http.server 3000")
-    logger.info(f"   Puerto: 3000")
-    
-    try:
-        cmd = [sys.executable, "-m", "http.server", "3000"]
-        logger.info(f"   Comando completo: {' '.join(cmd)}")
-        
-        process = subprocess.Popen(
-            cmd,
-            cwd=str(frontend_dir),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
-            creationflags=subprocess.CREATE_NEW_CONSOLE if sys.platform == 'win32' else 0
+
+class ManagedProcess:
+    """Proceso hijo con lectura asíncrona de su salida"""
+
+    def __init__(self, name: str, process: asyncio.subprocess.Process, ready_marker: Optional[str]):
+        self.name = name
+        self.process = process
+        self.started_at = time.monotonic()
+        self.ready = asyncio.Event()
+        if ready_marker is None:
+            self.ready.set()
+        self._reader = asyncio.create_task(self._relay_output(ready_marker))
+
+    async def _relay_output(self, ready_marker: Optional[str]):
+        async for raw in self.process.stdout:
+            line = raw.decode("utf-8", errors="replace").rstrip()
+            if not line:
+                continue
+            logger.info("[%s] %s", self.name, line)
+            if ready_marker and ready_marker in line:
+                self.ready.set()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def uptime(self) -> float:
+        return time.monotonic() - self.started_at
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Esperar a que esté listo; falla si el proceso termina antes"""
+        ready = asyncio.create_task(self.ready.wait())
+        exited = asyncio.create_task(self.process.wait())
+        await asyncio.wait({ready, exited}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        ready.cancel()
+        exited.cancel()
+        return self.ready.is_set() and self.process.returncode is None
+
+    def terminate(self):
+        """Enviar SIGTERM (uvicorn deja de aceptar y drena las peticiones en curso)"""
+        if self.process.returncode is None:
+            self.process.terminate()
+
+    async def wait(self) -> int:
+        """Esperar a que termine y a que se haya leído toda su salida"""
+        returncode = await self.process.wait()
+        await self._reader
+        return returncode
+
+    async def stop(self, timeout: float) -> int:
+        """Terminar y esperar; forzar con SIGKILL al agotar el tiempo"""
+        self.terminate()
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.wait()), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ %s no terminó en %.0fs, forzando cierre", self.name, timeout)
+            self.process.kill()
+            return await self.wait()
+
+
+class SupervisedService:
+    """
+    Servicio supervisado
+    Reinicia el proceso si termina inesperadamente, con backoff exponencial
+    """
+
+    def __init__(self, name: str, build_command: Callable[[int], Dict], cwd: Path,
+                 ready_marker: Optional[str] = None, drain_timeout: float = 10.0):
+        """
+        Args:
+            name: Nombre del servicio para los logs
+            build_command: Función(generación) -> {"cmd": [...], "env": {...}, "pass_fds": (...)}
+            cwd: Directorio de trabajo
+            ready_marker: Línea de salida que indica que el proceso está listo
+            drain_timeout: Segundos para drenar al detener
+        """
+        self.name = name
+        self.build_command = build_command
+        self.cwd = cwd
+        self.ready_marker = ready_marker
+        self.drain_timeout = drain_timeout
+        self.current: Optional[ManagedProcess] = None
+        self.restarts = 0
+        self.generation = 0
+        self.stopping = False
+        self._stop_event = asyncio.Event()
+
+    async def _spawn(self) -> ManagedProcess:
+        self.generation += 1
+        spec = self.build_command(self.generation)
+        proc_name = f"{self.name}#{self.generation}"
+        process = await asyncio.create_subprocess_exec(
+            *spec["cmd"],
+            cwd=str(self.cwd),
+            env=spec.get("env"),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            pass_fds=spec.get("pass_fds", ()),
         )
-        
-        logger.info(f"✅ Frontend iniciado (PID: {process.pid})")
-        return process
-    except Exception as e:
-        logger.error(f"❌ Error iniciando frontend: {e}")
-        import traceback
-        logger.error(f"   Traceback: {traceback.format_exc()}")
-        return None
-
-def monitor_processes(backend_proc, frontend_proc):
-    """Monitorear procesos y mostrar logs"""
-    logger.info("=" * 60)
-    logger.info("📊 Monitoreando servicios...")
-    logger.info("=" * 60)
-    logger.info("🔗 URLs:")
-    logger.info("   Backend (UVICORN):  http://localhost:8000")
-    logger.info("   Frontend:           http://localhost:3000")
-    logger.info("   API Docs:           http://localhost:8000/docs")
-    logger.info("   Health Check:        http://localhost:8000/health")
-    logger.info("   AI Status:          http://localhost:8000/api/ai/status")
-    logger.info("=" * 60)
-    logger.info("💡 Presiona Ctrl+C para detener todos los servicios")
-    logger.info("=" * 60)
-    
-    backend_buffer = []
-    frontend_buffer = []
-    
-    try:
-        # Monitorear ambos procesos
+        logger.info("✅ %s iniciado (PID: %d)", proc_name, process.pid)
+        return ManagedProcess(proc_name, process, self.ready_marker)
+
+    async def run(self):
+        """Bucle de supervisión del servicio"""
+        failures = 0
+        self.current = await self._spawn()
+
         while True:
-            # Verificar estado backend
-            if backend_proc and backend_proc.poll() is not None:
-                logger.error("❌ Backend (UVICORN) se detuvo inesperadamente")
-                if backend_proc.stdout:
-                    try:
-                        remaining = backend_proc.stdout.read()
-                        if remaining:
-                            logger.error(f"Backend output: {remaining}")
-                    except:
-                        pass
-                break
-            
-            # Verificar estado frontend
-            if frontend_proc and frontend_proc.poll() is not None:
-                logger.error("❌ Frontend se detuvo inesperadamente")
-                if frontend_proc.stdout:
-                    try:
-                        remaining = frontend_proc.stdout.read()
-                        if remaining:
-                            logger.error(f"Frontend output: {remaining}")
-                    except:
-                        pass
-                break
-            
-            # Leer logs de backend (UVICORN)
-            if backend_proc and backend_proc.stdout:
-                try:
-                    import select
-                    import sys
-                    # En Windows, usar threading para leer buffers
-                    import threading
-                    
-                    # Leer línea por línea
-                    line = backend_proc.stdout.readline()
-                    if line:
-                        line_clean = line.strip()
-                        if line_clean:
-                            logger.info(f"[BACKEND-UVICORN] {line_clean}")
-                            backend_buffer.append(line_clean)
-                            # Mostrar errores críticos inmediatamente
-                            if "ERROR" in line_clean or "CRITICAL" in line_clean:
-                                logger.error(f"⚠️ {line_clean}")
-                except Exception as e:
-                    # Silenciar errores de lectura
-                    pass
-            
-            # Leer logs de frontend
-            if frontend_proc and frontend_proc.stdout:
-                try:
-                    line = frontend_proc.stdout.readline()
-                    if line:
-                        line_clean = line.strip()
-                        if line_clean:
-                            logger.info(f"[FRONTEND] {line_clean}")
-                            frontend_buffer.append(line_clean)
-                except Exception as e:
-                    # Silenciar errores de lectura
-                    pass
-            
-            time.sleep(0.1)
-            
-    except KeyboardInterrupt:
-        logger.info("\n🛑 Deteniendo servicios...")
-        
-        if backend_proc:
-            logger.info("   Deteniendo Backend...")
-            backend_proc.terminate()
-            try:
-                backend_proc.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                backend_proc.kill()
-        
-        if frontend_proc:
-            logger.info("   Deteniendo Frontend...")
-            frontend_proc.terminate()
+            proc = self.current
+            returncode = await proc.wait()
+            if self.stopping:
+                return
+            if proc is not self.current:
+                # Reemplazado intencionalmente (reinicio escalonado)
+                continue
+
+            if proc.uptime >= STABLE_UPTIME:
+                failures = 0
+            failures += 1
+            self.restarts += 1
+            delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * 2 ** (failures - 1))
+            logger.error("❌ %s terminó inesperadamente (código %s); reinicio #%d en %.0fs",
+                         proc.name, returncode, self.restarts, delay)
+
             try:
-                frontend_proc.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                frontend_proc.kill()
-        
-        logger.info("✅ Todos los servicios detenidos")
+                await asyncio.wait_for(self._stop_event.wait(), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            self.current = await self._spawn()
+
+    async def replace(self, ready_timeout: float) -> bool:
+        """Lanzar un proceso nuevo y drenar el actual cuando el nuevo esté listo"""
+        new = await self._spawn()
+        if not await new.wait_ready(ready_timeout):
+            logger.error("❌ %s no quedó listo; se conserva %s", new.name, self.current.name)
+            await new.stop(self.drain_timeout)
+            return False
+
+        old, self.current = self.current, new
+        logger.info("   %s listo, drenando %s", new.name, old.name)
+        await old.stop(self.drain_timeout + 5)
+        return True
+
+    async def stop(self):
+        """Detener el servicio drenando el proceso actual"""
+        self.stopping = True
+        self._stop_event.set()
+        if self.current:
+            await self.current.stop(self.drain_timeout + 5)
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "pid": self.current.pid if self.current else None,
+            "uptime": round(self.current.uptime, 1) if self.current else 0.0,
+            "restarts": self.restarts,
+        }
+
+
+def bind_backend_socket(host: str, port: int) -> socket.socket:
+    """Socket de escucha compartido por todos los workers"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def backend_command(python: str, fd: int, drain_timeout: float, slot: int):
+    """Constructor del comando de un worker de uvicorn"""
+    def build(generation: int) -> Dict:
+        return {
+            "cmd": [
+                python, "-m", "uvicorn", "app:app",
+                "--fd", str(fd),
+                "--log-level", "info",
+                "--timeout-graceful-shutdown", str(int(drain_timeout)),
+            ],
+            "env": dict(os.environ, DULCEAI_WORKER_ID=f"{slot}.{generation}"),
+            "pass_fds": (fd,),
+        }
+    return build
+
+
+def frontend_command(python: str, host: str, port: int):
+    """Constructor del comando del frontend (http.server usa ThreadingHTTPServer desde 3.7)"""
+    def build(generation: int) -> Dict:
+        return {"cmd": [python, "-m", "http.server", str(port), "--bind", host]}
+    return build
+
+
+def check_backend_health(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+async def wait_for_backend(url: str, timeout: float) -> bool:
+    """Esperar a que el endpoint de salud del backend responda 200"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await asyncio.to_thread(check_backend_health, url):
+            return True
+        await asyncio.sleep(0.25)
+    return False
+
+
+def log_status(services: List[SupervisedService]):
+    """Reportar estado y número de reinicios de cada servicio"""
+    total = sum(s.restarts for s in services)
+    logger.info("📊 Estado de servicios (reinicios totales: %d)", total)
+    for service in services:
+        status = service.status()
+        logger.info("   %-12s pid=%-7s uptime=%7.1fs reinicios=%d",
+                    status["name"], status["pid"], status["uptime"], status["restarts"])
+
+
+async def monitor_processes(args) -> int:
+    """Arrancar y supervisar todos los servicios hasta recibir SIGTERM/SIGINT"""
+    backend_dir = get_project_root() / "backend"
+    if not backend_dir.exists():
+        logger.error("❌ No se encuentra directorio backend: %s", backend_dir)
+        return 1
+
+    python = find_python()
+    logger.info("   Python: %s", python)
 
-def main():
+    # Con el estado en memoria cada worker tiene sus propias sesiones y el kernel reparte las
+    # conexiones entre ellos: la conversación de un usuario cambia de un mensaje a otro
+    if args.workers > 1 and not state_backend_shared():
+        logger.error("=" * 60)
+        logger.error("⚠️ %d workers con STATE_BACKEND_URL en memoria: cada worker tiene sus propias sesiones,",
+                     args.workers)
+        logger.error("⚠️ claves de idempotencia y límites. Configure STATE_BACKEND_URL=redis://... o use --workers 1")
+        logger.error("=" * 60)
+
+    # Todos los workers deben firmar las sesiones con la misma clave
+    if not os.getenv("SESSION_SECRET"):
+        os.environ["SESSION_SECRET"] = secrets.token_hex(32)
+        logger.info("🔑 SESSION_SECRET generado para esta ejecución (las sesiones no sobreviven a un reinicio del launcher)")
+
+    sock = bind_backend_socket(args.host, args.port)
+    workers = [
+        SupervisedService(f"BACKEND-{slot}", backend_command(python, sock.fileno(), args.drain_timeout, slot),
+                          backend_dir, ready_marker=READY_MARKER, drain_timeout=args.drain_timeout)
+        for slot in range(1, max(1, args.workers) + 1)
+    ]
+    services: List[SupervisedService] = list(workers)
+    tasks = []
+
+    stop = asyncio.Event()
+    reload_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum, callback in ((signal.SIGTERM, stop.set), (signal.SIGINT, stop.set),
+                             (getattr(signal, "SIGHUP", None), reload_requested.set),
+                             (getattr(signal, "SIGUSR1", None), lambda: log_status(services))):
+        if signum is None:
+            continue
+        try:
+            loop.add_signal_handler(signum, callback)
+        except NotImplementedError:
+            signal.signal(signum, lambda *_, cb=callback: loop.call_soon_threadsafe(cb))
+
+    logger.info("🚀 Iniciando Backend FastAPI con %d workers en %s:%d", len(workers), args.host, args.port)
+    tasks.extend(asyncio.create_task(w.run()) for w in workers)
+
+    health_url = f"http://127.0.0.1:{args.port}/health"
+    logger.info("⏳ Esperando a que el backend responda en %s...", health_url)
+    exit_code = 0
+    if not await wait_for_backend(health_url, args.ready_timeout):
+        logger.error("❌ El backend no quedó listo en %.0fs", args.ready_timeout)
+        stop.set()
+        exit_code = 1
+    else:
+        logger.info("✅ Backend listo")
+        if not args.no_frontend:
+            frontend_dir = get_project_root() / "frontend"
+            if frontend_dir.exists():
+                frontend = SupervisedService("FRONTEND", frontend_command(python, args.host, args.frontend_port),
+                                             frontend_dir, drain_timeout=5.0)
+                services.append(frontend)
+                tasks.append(asyncio.create_task(frontend.run()))
+            else:
+                logger.error("❌ No se encuentra directorio frontend: %s", frontend_dir)
+
+        logger.info("=" * 60)
+        logger.info("📊 Monitoreando servicios...")
+        logger.info("   Backend:  http://localhost:%d (%d workers)", args.port, len(workers))
+        logger.info("   API Docs: http://localhost:%d/docs", args.port)
+        logger.info("💡 kill -HUP %d reinicio escalonado, -USR1 estado, Ctrl+C detener", os.getpid())
+        logger.info("=" * 60)
+
+    while not stop.is_set():
+        stop_wait = asyncio.create_task(stop.wait())
+        reload_wait = asyncio.create_task(reload_requested.wait())
+        await asyncio.wait({stop_wait, reload_wait}, return_when=asyncio.FIRST_COMPLETED)
+        stop_wait.cancel()
+        reload_wait.cancel()
+
+        if reload_requested.is_set() and not stop.is_set():
+            reload_requested.clear()
+            logger.info("🔄 Reinicio escalonado de %d workers...", len(workers))
+            for worker in workers:
+                if not await worker.replace(args.ready_timeout):
+                    logger.error("❌ Reinicio escalonado abortado")
+                    break
+            else:
+                logger.info("✅ Reinicio escalonado completado")
+
+    logger.info("🛑 Drenando servicios (máx %.0fs)...", args.drain_timeout)
+    frontends = [s for s in services if s not in workers]
+    await asyncio.gather(*(s.stop() for s in frontends))
+    await asyncio.gather(*(w.stop() for w in workers))
+    await asyncio.gather(*tasks, return_exceptions=True)
+    sock.close()
+
+    log_status(services)
+    logger.info("✅ Todos los servicios detenidos")
+    return exit_code
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Launcher de servicios DulceAI")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="Número de workers de uvicorn (por defecto, núcleos disponibles con "
+                             "STATE_BACKEND_URL en Redis; 1 con el estado en memoria)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--frontend-port", type=int, default=3000)
+    parser.add_argument("--no-frontend", action="store_true", help="No servir el frontend")
+    parser.add_argument("--ready-timeout", type=float, default=60.0,
+                        help="Segundos máximos para que el backend quede listo")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="Segundos para terminar peticiones en curso al detener")
+    parser.add_argument("--log-file", default="services.log")
+    parser.add_argument("--log-max-bytes", type=int, default=10 * 1024 * 1024,
+                        help="Tamaño máximo del log antes de rotar")
+    parser.add_argument("--log-backups", type=int, default=5, help="Archivos de log rotados a conservar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Función principal"""
+    args = parse_args(argv)
+    setup_logging(args.log_file, args.log_max_bytes, args.log_backups)
+
     logger.info("=" * 60)
     logger.info("🍰 DulceAI - Iniciando Servicios")
     logger.info("=" * 60)
-    
-    # Verificar puertos
-    logger.info("🔍 Verificando puertos...")
-    available_ports = check_ports()
-    
-    if 8000 not in available_ports:
-        logger.error("❌ Puerto 8000 (Backend) no está disponible")
-        logger.error("   Detén cualquier proceso que esté usando el puerto 8000")
-        return
-    
-    if 3000 not in available_ports:
-        logger.error("❌ Puerto 3000 (Frontend) no está disponible")
-        logger.error("   Detén cualquier proceso que esté usando el puerto 3000")
-        return
-    
-    # Iniciar servicios
-    backend_proc = start_backend()
-    time.sleep(2)  # Esperar un poco antes de iniciar frontend
-    
-    frontend_proc = start_frontend()
-    time.sleep(2)  # Esperar a que ambos servicios inicien
-    
-    # Verificar que ambos estén corriendo
-    if backend_proc and backend_proc.poll() is None:
-        logger.info("✅ Backend está corriendo")
-    else:
-        logger.error("❌ Backend no está corriendo")
-        if backend_proc:
-            output = backend_proc.stdout.read() if backend_proc.stdout else ""
-            logger.error(f"Backend error: {output}")
-    
-    if frontend_proc and frontend_proc.poll() is None:
-        logger.info("✅ Frontend está corriendo")
-    else:
-        logger.error("❌ Frontend no está corriendo")
-        if frontend_proc:
-            output = frontend_proc.stdout.read() if frontend_proc.stdout else ""
-            logger.error(f"Frontend error: {output}")
-    
-    # Monitorear procesos
-    if backend_proc and frontend_proc:
-        monitor_processes(backend_proc, frontend_proc)
-    else:
-        logger.error("❌ No se pudieron iniciar todos los servicios")
-        if backend_proc:
-            backend_proc.terminate()
-        if frontend_proc:
-            frontend_proc.terminate()
 
-if __name__ == "__main__":
-    main()
+    ports = [args.port] if args.no_frontend else [args.port, args.frontend_port]
+    if len(check_ports(ports)) != len(ports):
+        logger.error("❌ Hay puertos en uso; detén los procesos que los ocupan")
+        return 1
 
+    return asyncio.run(monitor_processes(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+# Los tests importan los módulos del backend igual que app.py (desde backend/)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
@@ -0,0 +1,24 @@
+"""
+Bandeja de mensajes de contacto
+Un mensaje mal armado se descarta y cuenta como error sin detener al escritor
+"""
+
+from services.contact_inbox import ContactInbox
+
+
+def test_malformed_message_does_not_stop_the_writer(tmp_path):
+    notified = []
+    inbox = ContactInbox(str(tmp_path / "contact.db"), notifier=notified.extend).start()
+    try:
+        inbox._queue.put({"name": "Ana", "message": "sin email"})
+        inbox.submit("Luis", "luis@example.com", "Hola", "2026-01-01T10:00:00")
+        assert inbox.flush(2)
+
+        inbox.submit("Eva", "eva@example.com", "¿Hacen envíos?", "2026-01-01T10:01:00")
+        assert inbox.flush(2)
+        assert inbox._writer.is_alive()
+        assert [m["email"] for m in inbox.page()["messages"]] == ["eva@example.com", "luis@example.com"]
+        assert inbox.get_stats()["write_errors"] == 1
+    finally:
+        inbox.close()
+    assert {m["email"] for m in notified} == {"luis@example.com", "eva@example.com"}
@@ -0,0 +1,139 @@
+"""
+Generaciones compartidas entre peticiones idénticas
+Quien espera una generación ajena la abandona con su propia cancelación o plazo, y la generación
+se corta cuando ya nadie usará su resultado
+"""
+
+import threading
+import time
+
+import pytest
+
+import rag.agent as agent_module
+from rag.agent import DulceAIAgent
+from rag.llm.cancellation import CancelToken, GenerationCancelled
+from rag.memory.state_backend import InMemoryStateBackend
+from rag.planning.deadline import Deadline
+
+MESSAGE = "me recomiendas algo dulce para un cumpleaños"
+CHUNKS = 400
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+    def __add__(self, other: "FakeMessage") -> "FakeMessage":
+        return FakeMessage(self.content + other.content)
+
+
+class SlowStreamingLLM:
+    """Genera CHUNKS fragmentos de a uno cada 10 ms (unos 4 s si nadie la corta)"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.generations = 0
+        self.chunks = 0
+
+    def invoke(self, messages):
+        return FakeMessage("Hola")
+
+    def stream(self, messages):
+        self.generations += 1
+        self.started.set()
+        for _ in range(CHUNKS):
+            time.sleep(0.01)
+            self.chunks += 1
+            yield FakeMessage("a")
+
+
+@pytest.fixture
+def llm():
+    return SlowStreamingLLM()
+
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path, llm):
+    monkeypatch.setattr(agent_module, "DEPENDENCIES_AVAILABLE", True)
+    for name in ("HumanMessage", "AIMessage", "SystemMessage"):
+        monkeypatch.setattr(agent_module, name, FakeMessage)
+    monkeypatch.setattr(DulceAIAgent, "_create_llm", lambda self, profile, base_url=None: llm)
+
+    agent = DulceAIAgent(InMemoryStateBackend())
+    agent.config.ORDERS_DB_PATH = str(tmp_path / "orders.db")
+    agent.config.KNOWLEDGE_ENABLED = False
+    agent.config.FAST_PATH_ENABLED = False
+    agent.config.DEGRADED_MAX_GENERATIONS = 0
+    agent.config.DEADLINE_MIN_GENERATION = 0.0
+    assert agent.initialize()
+    yield agent
+    agent.close()
+
+
+def run(results: dict, name: str, agent: DulceAIAgent, **kwargs) -> threading.Thread:
+    def target():
+        started = time.monotonic()
+        try:
+            results[name] = agent.process_message(MESSAGE, name, **kwargs)
+        except GenerationCancelled as e:
+            results[name] = e
+        results[name + "_seconds"] = time.monotonic() - started
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def wait_for_follower(agent: DulceAIAgent, llm: SlowStreamingLLM):
+    assert llm.started.wait(2)
+    deadline = time.monotonic() + 2
+    while agent.generations.get_stats()["coalesced"] < 1:
+        assert time.monotonic() < deadline, "la segunda petición no se unió a la generación en curso"
+        time.sleep(0.005)
+
+
+def test_follower_disconnect_then_leader_cancel_stops_generation(agent, llm):
+    results = {}
+    leader_cancel, follower_cancel = CancelToken(), CancelToken()
+    leader = run(results, "lider", agent, cancel=leader_cancel)
+    assert llm.started.wait(2)
+    follower = run(results, "seguidor", agent, cancel=follower_cancel)
+    wait_for_follower(agent, llm)
+
+    follower_cancel.cancel("disconnect")
+    follower.join(1)
+    assert not follower.is_alive(), "la petición desconectada sigue esperando la generación"
+    assert isinstance(results["seguidor"], GenerationCancelled)
+
+    leader_cancel.cancel("disconnect")
+    leader.join(1)
+    assert not leader.is_alive(), "la generación abandonada por todos siguió en curso"
+    assert isinstance(results["lider"], GenerationCancelled)
+    assert llm.generations == 1
+    assert llm.chunks < CHUNKS
+    assert agent.generations.get_stats()["abandoned"] == 1
+
+
+def test_follower_deadline_expires_while_waiting(agent, llm):
+    results = {}
+    leader_cancel = CancelToken()
+    leader = run(results, "lider", agent, cancel=leader_cancel)
+    assert llm.started.wait(2)
+    follower_deadline = Deadline(0.5)
+    follower = run(results, "seguidor", agent, deadline=follower_deadline)
+    wait_for_follower(agent, llm)
+
+    follower.join(2)
+    assert not follower.is_alive(), "la petición siguió esperando después de su plazo"
+    assert results["seguidor_seconds"] < 1.5
+    assert follower_deadline.degraded == "generation_timeout"
+    assert isinstance(results["seguidor"], str) and results["seguidor"]
+
+    # La generación continúa para quien la inició
+    chunks = llm.chunks
+    time.sleep(0.1)
+    assert leader.is_alive() and llm.chunks > chunks
+    leader_cancel.cancel("disconnect")
+    leader.join(1)
+    assert isinstance(results["lider"], GenerationCancelled)
+    assert llm.generations == 1
@@ -0,0 +1,45 @@
+"""
+Ingesta incremental de la base de conocimiento
+La poda de documentos eliminados no debe borrar fragmentos que siguen en otro documento
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from rag.knowledge.ingest import ingest
+from rag.knowledge.store import KnowledgeIndex
+
+SHARED = "# Envíos\n\nHacemos envíos a domicilio de martes a sábado dentro de la ciudad.\n"
+
+
+def test_prune_missing_keeps_chunk_shared_with_remaining_document(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text(SHARED, encoding="utf-8")
+    (docs / "b.md").write_text(SHARED, encoding="utf-8")
+    index = KnowledgeIndex(str(tmp_path / "index"))
+    ingest([str(docs)], index)
+    assert index.search("envíos a domicilio", k=1)
+
+    (docs / "a.md").unlink()
+    stats = ingest([str(docs)], index, prune_missing=True)
+
+    assert stats["removed"] == 0
+    assert index.search("envíos a domicilio", k=1)
+
+
+def test_prune_missing_removes_chunks_only_in_deleted_document(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text("# Tortas\n\nLa torta de chocolate lleva tres capas de bizcocho.\n",
+                               encoding="utf-8")
+    (docs / "b.md").write_text(SHARED, encoding="utf-8")
+    index = KnowledgeIndex(str(tmp_path / "index"))
+    ingest([str(docs)], index)
+
+    (docs / "a.md").unlink()
+    stats = ingest([str(docs)], index, prune_missing=True)
+
+    assert stats["removed"] == 1
+    assert len(index) == 1
@@ -0,0 +1,40 @@
+"""
+Logging asíncrono
+Al apagar, el logger raíz recupera sus handlers y un nuevo setup no duplica la cola
+"""
+
+import io
+import logging
+import logging.handlers
+
+from services.logging_setup import setup_logging, shutdown_logging
+
+
+def queue_handlers(root: logging.Logger) -> list:
+    return [h for h in root.handlers if isinstance(h, logging.handlers.QueueHandler)]
+
+
+def test_shutdown_restores_root_handlers_and_setup_can_run_again():
+    root = logging.getLogger()
+    original_handlers, original_level = list(root.handlers), root.level
+    stream = io.StringIO()
+    try:
+        setup_logging(level="INFO", stream=stream, log_file="", sample_rate=0)
+        logging.getLogger("prueba").info("antes de apagar")
+        shutdown_logging()
+
+        assert "antes de apagar" in stream.getvalue()
+        assert root.handlers == original_handlers
+        logging.getLogger("prueba").info("después de apagar")
+        assert "después de apagar" not in stream.getvalue()
+
+        second = io.StringIO()
+        setup_logging(level="INFO", stream=second, log_file="", sample_rate=0)
+        assert len(queue_handlers(root)) == 1
+        logging.getLogger("prueba").info("segundo setup")
+        shutdown_logging()
+        assert "segundo setup" in second.getvalue()
+        assert root.handlers == original_handlers
+    finally:
+        shutdown_logging()
+        root.setLevel(original_level)
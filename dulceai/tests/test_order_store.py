@@ -0,0 +1,38 @@
+"""
+Escritor de pedidos en segundo plano
+Un pedido mal armado se descarta y cuenta como error sin detener al escritor
+"""
+
+from rag.memory.order_store import OrderStore
+
+ITEMS = [{"product_key": "brownies", "name": "Brownies de Chocolate", "quantity": 2, "unit_price": 3000}]
+
+
+def test_malformed_order_does_not_stop_the_writer(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db")).start()
+    try:
+        broken = store.new_order(ITEMS, session_id="s1")
+        del broken["items"]
+        store.submit(broken)
+        store.submit({"id": "PED-roto", "items": None})
+        assert store.flush(2)
+
+        order = store.submit(store.new_order(ITEMS, session_id="s1"))
+        assert store.flush(2)
+        assert store._thread.is_alive()
+        assert store.get(order["id"])["status"] == order["status"]
+        assert store.get(broken["id"]) is None
+        assert store.get_stats()["write_errors"] == 2
+    finally:
+        store.close()
+
+
+def test_cancel_marks_written_order(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db")).start()
+    try:
+        order = store.submit(store.new_order(ITEMS, session_id="s1"))
+        store.cancel(order["id"])
+        assert store.flush(2)
+        assert store.get(order["id"])["status"] == "cancelado"
+    finally:
+        store.close()
@@ -0,0 +1,55 @@
+"""
+Captura de pedidos desde el chat
+Solo un pedido explícito o confirmado se registra; la charla con "quiero"/"necesito" no es un pedido
+"""
+
+import pytest
+
+from rag.config import AIConfig
+from rag.memory.order_store import OrderStore
+from rag.tools.business_tools import BusinessTools
+from rag.tools.order_tools import OrderTools
+from rag.tools.product_tools import ProductTools
+
+
+@pytest.fixture
+def order_tools(tmp_path):
+    config = AIConfig()
+    store = OrderStore(str(tmp_path / "orders.db"))
+    return OrderTools(ProductTools(config), BusinessTools(config), store)
+
+
+@pytest.mark.parametrize("message", [
+    "quiero hablar con alguien",
+    "necesito 2 horas para pensarlo",
+    "quiero el número de teléfono",
+    "dame un momento",
+    "¿hacen pedidos de brownies?",
+    "quiero saber cuánto cuesta la torta de chocolate",
+    "no quiero brownies",
+])
+def test_messages_that_are_not_orders(order_tools, message):
+    assert order_tools.prepare(message, "s1") is None
+
+
+@pytest.mark.parametrize("message", [
+    "quiero hacer un pedido",
+    "quiero pedir algo",
+    "quiero una torta",
+])
+def test_order_without_recognised_product_asks_for_details(order_tools, message):
+    assert order_tools.prepare(message, "s1")["status"] == "incomplete"
+
+
+def test_explicit_order_with_quantity_is_ready(order_tools):
+    step = order_tools.prepare("quiero 2 tortas de chocolate", "s1")
+    assert step["status"] == "ready"
+    assert [(line["product_key"], line["quantity"]) for line in step["order"]["items"]] == [("torta_chocolate", 2)]
+
+
+def test_order_without_quantity_waits_for_confirmation(order_tools):
+    step = order_tools.prepare("quiero brownies", "s1")
+    assert step["status"] == "confirm"
+
+    assert order_tools.prepare("sí, dale", "s1", step["pending"])["status"] == "ready"
+    assert order_tools.prepare("no, gracias", "s1", step["pending"])["status"] == "declined"
@@ -0,0 +1,84 @@
+"""
+Prueba de concurrencia de los turnos por sesión
+Varios hilos envían mensajes a la misma sesión: el historial debe quedar en pares
+mensaje/respuesta, sin pérdidas y en el orden en que cada hilo los envió
+"""
+
+import random
+import threading
+import time
+
+import pytest
+
+import rag.agent as agent_module
+from rag.agent import DulceAIAgent
+from rag.memory.state_backend import InMemoryStateBackend
+
+SESSIONS = 4
+SENDERS = 3
+MESSAGES = 30
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeLLM:
+    """Responde con eco del mensaje tras una demora aleatoria (favorece el entrelazado)"""
+
+    def invoke(self, messages):
+        time.sleep(random.uniform(0, 0.003))
+        return FakeMessage("Respuesta a: " + messages[-1].content.split("\n")[0])
+
+
+@pytest.fixture
+def agent(monkeypatch, tmp_path):
+    llm = FakeLLM()
+    monkeypatch.setattr(agent_module, "DEPENDENCIES_AVAILABLE", True)
+    for name in ("HumanMessage", "AIMessage", "SystemMessage"):
+        monkeypatch.setattr(agent_module, name, FakeMessage)
+    monkeypatch.setattr(DulceAIAgent, "_create_llm", lambda self, profile, base_url=None: llm)
+
+    agent = DulceAIAgent(InMemoryStateBackend())
+    agent.config.ORDERS_DB_PATH = str(tmp_path / "orders.db")
+    agent.config.KNOWLEDGE_ENABLED = False
+    agent.config.FAST_PATH_ENABLED = False
+    agent.config.DEGRADED_MAX_GENERATIONS = 0
+    agent.config.MEMORY_MAX_MESSAGES = 10 ** 6
+    assert agent.initialize()
+    yield agent
+    agent.close()
+
+
+def test_parallel_messages_keep_session_history_ordered(agent):
+    def send(session: int, sender: int):
+        for i in range(sender, MESSAGES, SENDERS):
+            agent.process_message(f"m{session}-{i} cuanto cuesta", f"u{session}")
+
+    threads = [threading.Thread(target=send, args=(session, sender))
+               for session in range(SESSIONS) for sender in range(SENDERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for session in range(SESSIONS):
+        memory, _ = agent._load_session(f"u{session}")
+        messages = memory.messages
+        assert len(messages) == 2 * MESSAGES
+
+        # Cada respuesta sigue a su mensaje: ningún turno se intercaló con otro
+        for user, answer in zip(messages[::2], messages[1::2]):
+            assert user["role"] == "user"
+            assert answer["role"] == "assistant"
+            assert answer["content"] == "Respuesta a: " + user["content"]
+
+        sent = [int(m["content"].split("-")[1].split()[0]) for m in messages[::2]]
+        assert sorted(sent) == list(range(MESSAGES))
+        for sender in range(SENDERS):
+            own = [i for i in sent if i % SENDERS == sender]
+            assert own == sorted(own)
+
+    stats = agent.session_locks.get_stats()
+    assert stats["active_sessions"] == 0
@@ -0,0 +1,86 @@
+"""
+Coalescencia de generaciones idénticas
+Quien espera una ejecución ajena puede dejar de esperarla sin detenerla para los demás
+"""
+
+import threading
+import time
+
+import pytest
+
+from rag.llm.cancellation import GenerationCancelled
+from rag.llm.single_flight import SingleFlight
+
+
+def start_leader(flight: SingleFlight, release: threading.Event, results: list) -> threading.Thread:
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", lambda: release.wait() and "listo")))
+    leader.start()
+    while not flight.in_flight():
+        time.sleep(0.001)
+    return leader
+
+
+def test_followers_share_the_leader_result():
+    flight, release, results = SingleFlight(), threading.Event(), []
+    leader = start_leader(flight, release, results)
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", lambda: "otro")))
+    follower.start()
+    while not flight.waiters("k"):
+        time.sleep(0.001)
+    release.set()
+    leader.join(1)
+    follower.join(1)
+
+    assert sorted(results) == [("listo", False), ("listo", True)]
+    assert flight.waiters("k") == 0
+    assert flight.get_stats()["executions"] == 1
+
+
+def test_follower_stops_waiting_and_releases_the_execution():
+    flight, release, results = SingleFlight(), threading.Event(), []
+    leader = start_leader(flight, release, results)
+    stop = threading.Event()
+    errors = []
+
+    def follow():
+        try:
+            flight.do("k", lambda: "otro", should_stop=stop.is_set, poll_interval=0.01)
+        except GenerationCancelled as e:
+            errors.append(e)
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    while not flight.waiters("k"):
+        time.sleep(0.001)
+    stop.set()
+    follower.join(1)
+
+    assert not follower.is_alive() and len(errors) == 1
+    assert flight.waiters("k") == 0
+    assert flight.in_flight() == 1
+    release.set()
+    leader.join(1)
+    assert results == [("listo", False)]
+    assert flight.get_stats()["abandoned"] == 1
+
+
+def test_leader_error_reaches_followers():
+    flight, release = SingleFlight(), threading.Event()
+
+    def fail():
+        release.wait()
+        raise RuntimeError("sin respuesta")
+
+    leader = threading.Thread(target=lambda: pytest.raises(RuntimeError, flight.do, "k", fail))
+    leader.start()
+    while not flight.in_flight():
+        time.sleep(0.001)
+    errors = []
+    follower = threading.Thread(target=lambda: errors.append(pytest.raises(RuntimeError, flight.do, "k", fail)))
+    follower.start()
+    while not flight.waiters("k"):
+        time.sleep(0.001)
+    release.set()
+    leader.join(1)
+    follower.join(1)
+    assert len(errors) == 1